@@ -0,0 +1,377 @@
+"""
+Mock OpenAI-compatible chat completions server for offline benchmarks.
+
+Serves `POST /v1/chat/completions` over HTTP/1.1 with keep-alive, using only
+asyncio streams, so no network access or extra dependency is needed.
+Latencies, 429s, malformed outputs and response sizes follow a
+`MockProfile`. Completions are ideology_logits markdown outputs, so the real
+parser and schema validation run on them; `"stream": true` requests get
+SSE chunks spread over the sampled latency.
+
+Run it standalone with:
+
+    python -m benchmarks.mock_server --port 8400 --profile medium
+"""
+
+import re
+import sys
+import json
+import math
+import time
+import random
+import asyncio
+import argparse
+import multiprocessing
+
+
+CATEGORIES = ["Left", "Left-Center", "Center", "Center-Right", "Right"]
+
+FILLER = (
+    "the article frames policy debate coverage with neutral language while "
+    "quoting officials voters critics and analysts on taxation healthcare "
+    "immigration spending courts elections and local government decisions"
+).split()
+
+# Completion sizes in tokens (mean, standard deviation).
+TOKEN_PROFILES = {
+    "short": (120, 20),
+    "medium": (400, 80),
+    "long": (1500, 300),
+}
+
+# Gaps between streamed chunks are kept above this many seconds.
+MIN_CHUNK_INTERVAL = 0.005
+
+REASONS = {200: "OK", 404: "Not Found", 405: "Method Not Allowed", 429: "Too Many Requests"}
+
+
+class MockProfile:
+    """
+    Behaviour of the mock server.
+
+    Args:
+        latency (str): Distribution of the response latency: "lognormal"
+            (median `latency_median`, shape `latency_sigma`), "exponential"
+            (mean `latency_median`), "uniform" (between zero and twice
+            `latency_median`) or "fixed".
+        rate_limit_rate (float): Share of requests answered with a 429.
+        retry_after (float): Retry-After seconds sent with the 429s, if any.
+        malformed_rate (float): Share of completions cut before the label,
+            so they fail to parse.
+        tokens (str): Completion size profile, a key of `TOKEN_PROFILES`.
+        ttft_share (float): Share of the latency spent before the first
+            streamed chunk.
+        seed (int): Seed of the server's random generator.
+    """
+
+    def __init__(
+        self,
+        latency="lognormal",
+        latency_median=0.2,
+        latency_sigma=0.5,
+        rate_limit_rate=0.0,
+        retry_after=None,
+        malformed_rate=0.0,
+        tokens="medium",
+        ttft_share=0.2,
+        seed=None,
+    ):
+        if latency not in ("lognormal", "exponential", "uniform", "fixed"):
+            raise ValueError(f"Unknown latency distribution {latency!r}.")
+        if tokens not in TOKEN_PROFILES:
+            raise ValueError(f"Unknown token profile {tokens!r}.")
+        self.latency = latency
+        self.latency_median = latency_median
+        self.latency_sigma = latency_sigma
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.malformed_rate = malformed_rate
+        self.tokens = tokens
+        self.ttft_share = ttft_share
+        self.seed = seed
+
+    def as_dict(self):
+        return dict(vars(self))
+
+    def sample_latency(self, rng):
+        if self.latency == "lognormal":
+            return rng.lognormvariate(math.log(self.latency_median), self.latency_sigma)
+        if self.latency == "exponential":
+            return rng.expovariate(1.0 / self.latency_median)
+        if self.latency == "uniform":
+            return rng.uniform(0.0, 2.0 * self.latency_median)
+        return self.latency_median
+
+    def sample_tokens(self, rng):
+        mean, deviation = TOKEN_PROFILES[self.tokens]
+        return max(20, int(rng.gauss(mean, deviation)))
+
+
+def completion_text(rng, num_tokens, malformed=False):
+    """Render an ideology_logits markdown output of roughly `num_tokens` tokens."""
+    logits = [round(rng.gauss(0.0, 1.5), 1) for _ in CATEGORIES]
+    exps = [math.exp(logit) for logit in logits]
+    probabilities = [value / sum(exps) for value in exps]
+    label = CATEGORIES[probabilities.index(max(probabilities))].lower()
+
+    # One filler word is about one token; the fields take about 90.
+    words = [rng.choice(FILLER) for _ in range(max(10, num_tokens - 90))]
+    sentences = [" ".join(words[i:i + 20]) + "." for i in range(0, len(words), 20)]
+    reasoning = "\n".join(f"- {sentence.capitalize()}" for sentence in sentences)
+
+    lines = [f"Reasoning:\n\n{reasoning}\n\n---\n", "- **Logit Scores**:"]
+    lines += [f"  - **{name}**: {logit}" for name, logit in zip(CATEGORIES, logits)]
+    if malformed:
+        # A generation cut short, as with a max_tokens or a dropped stream.
+        return "\n".join(lines) + "\n"
+    lines += ["", "- **Softmax Probabilities**:"]
+    lines += [
+        f"  - **{name}**: {probability:.2%}"
+        for name, probability in zip(CATEGORIES, probabilities)
+    ]
+    lines += ["", f"- **Categorical Label**: {label}"]
+    return "\n".join(lines) + "\n"
+
+
+def prompt_tokens(body):
+    chars = sum(len(str(message.get("content") or "")) for message in body.get("messages") or [])
+    return chars // 4
+
+
+class MockServer:
+    """
+    Asyncio HTTP/1.1 server answering chat completion requests per a `MockProfile`.
+
+    `port=0` binds a free port, available as `port` once started.
+    """
+
+    def __init__(self, profile=None, host="127.0.0.1", port=0):
+        self.profile = profile or MockProfile()
+        self.host = host
+        self.port = port
+        self.rng = random.Random(self.profile.seed)
+        self.server = None
+        self.counters = {"requests": 0, "rate_limited": 0, "malformed": 0, "disconnects": 0}
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}"
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+
+    async def handle(self, reader, writer):
+        """Serve the requests of one keep-alive connection."""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode("latin-1").split(" ", 2)
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length") or 0))
+
+                await self.respond(writer, method, path.split("?")[0], body)
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            self.counters["disconnects"] += 1
+        finally:
+            writer.close()
+
+    async def respond(self, writer, method, path, body):
+        if path != "/v1/chat/completions":
+            return await self.send_json(writer, 404, {"error": {"message": "Not found"}})
+        if method != "POST":
+            return await self.send_json(writer, 405, {"error": {"message": "Method not allowed"}})
+
+        request = json.loads(body or b"{}")
+        profile = self.profile
+        self.counters["requests"] += 1
+
+        if self.rng.random() < profile.rate_limit_rate:
+            self.counters["rate_limited"] += 1
+            await asyncio.sleep(0.01)
+            headers = {}
+            if profile.retry_after is not None:
+                headers["Retry-After"] = str(profile.retry_after)
+            return await self.send_json(writer, 429, {
+                "error": {"message": "Rate limit reached", "code": "rate_limit_exceeded"}
+            }, headers)
+
+        malformed = self.rng.random() < profile.malformed_rate
+        if malformed:
+            self.counters["malformed"] += 1
+        latency = profile.sample_latency(self.rng)
+        content = completion_text(self.rng, profile.sample_tokens(self.rng), malformed)
+        usage = {
+            "prompt_tokens": prompt_tokens(request),
+            "completion_tokens": len(content) // 4,
+        }
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        completion_id = f"chatcmpl-mock-{self.counters['requests']}"
+        model = request.get("model", "mock")
+
+        if request.get("stream"):
+            return await self.send_stream(writer, completion_id, model, content, usage, latency)
+
+        await asyncio.sleep(latency)
+        await self.send_json(writer, 200, {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }],
+            "usage": usage,
+        })
+
+    async def send_json(self, writer, status, payload, headers=None):
+        data = json.dumps(payload).encode("utf-8")
+        head = [f"HTTP/1.1 {status} {REASONS.get(status, 'Error')}",
+                "Content-Type: application/json",
+                f"Content-Length: {len(data)}"]
+        head += [f"{name}: {value}" for name, value in (headers or {}).items()]
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + data)
+        await writer.drain()
+
+    async def send_stream(self, writer, completion_id, model, content, usage, latency):
+        """Send the completion as SSE chunks, spread over the sampled latency."""
+        writer.write((
+            "HTTP/1.1 200 OK\r\n"
+            "Content-Type: text/event-stream\r\n"
+            "Transfer-Encoding: chunked\r\n\r\n"
+        ).encode("latin-1"))
+
+        def event(choices, extra=None):
+            chunk = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": choices,
+                **(extra or {}),
+            }
+            data = f"data: {json.dumps(chunk)}\n\n".encode("utf-8")
+            writer.write(f"{len(data):x}\r\n".encode("latin-1") + data + b"\r\n")
+
+        pieces = re.findall(r"\S+\s*|\s+", content)
+        first_delay = latency * self.profile.ttft_share
+        interval = (latency - first_delay) / max(1, len(pieces))
+        # Batch pieces into chunks so the gaps stay measurable sleeps.
+        per_chunk = max(1, math.ceil(MIN_CHUNK_INTERVAL / interval)) if interval > 0 else len(pieces)
+
+        await asyncio.sleep(first_delay)
+        for i in range(0, len(pieces), per_chunk):
+            if i:
+                await asyncio.sleep(interval * per_chunk)
+            event([{
+                "index": 0,
+                "delta": {"content": "".join(pieces[i:i + per_chunk])},
+                "finish_reason": None,
+            }])
+            await writer.drain()
+
+        event([{"index": 0, "delta": {}, "finish_reason": "stop"}])
+        event([], {"usage": usage})
+        done = b"data: [DONE]\n\n"
+        writer.write(f"{len(done):x}\r\n".encode("latin-1") + done + b"\r\n0\r\n\r\n")
+        await writer.drain()
+
+
+async def serve(profile, host="127.0.0.1", port=0, ready=None):
+    """Run a mock server until cancelled, sending its port to the `ready` connection."""
+    server = await MockServer(profile, host, port).start()
+    if ready is not None:
+        ready.send(server.port)
+    print(f"Mock server listening on {server.url}", file=sys.stderr)
+    try:
+        await server.server.serve_forever()
+    finally:
+        await server.close()
+
+
+def _serve_in_process(profile, host, port, ready):
+    try:
+        asyncio.run(serve(profile, host, port, ready))
+    except KeyboardInterrupt:
+        pass
+
+
+def start_in_process(profile, host="127.0.0.1", port=0):
+    """
+    Start a mock server in a child process, so its load does not weigh on the client.
+
+    Returns:
+        tuple: The process, to terminate when done, and the server URL.
+    """
+    context = multiprocessing.get_context("spawn")
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(
+        target=_serve_in_process, args=(profile, host, port, sender), daemon=True)
+    process.start()
+    if not receiver.poll(30):
+        process.terminate()
+        raise RuntimeError("Mock server did not start.")
+    return process, f"http://{host}:{receiver.recv()}"
+
+
+def profile_arguments(parser):
+    """Add the `MockProfile` options to an argparse parser."""
+    parser.add_argument("--latency", default="lognormal",
+                        choices=["lognormal", "exponential", "uniform", "fixed"])
+    parser.add_argument("--latency-median", type=float, default=0.2)
+    parser.add_argument("--latency-sigma", type=float, default=0.5)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=float)
+    parser.add_argument("--malformed-rate", type=float, default=0.0)
+    parser.add_argument("--profile", default="medium", choices=sorted(TOKEN_PROFILES))
+    parser.add_argument("--seed", type=int, default=42)
+
+
+def profile_from_args(args):
+    return MockProfile(
+        latency=args.latency,
+        latency_median=args.latency_median,
+        latency_sigma=args.latency_sigma,
+        rate_limit_rate=args.rate_limit_rate,
+        retry_after=args.retry_after,
+        malformed_rate=args.malformed_rate,
+        tokens=args.profile,
+        seed=args.seed,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock chat completions server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8400)
+    profile_arguments(parser)
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(serve(profile_from_args(args), args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+"""
+Offline load-testing benchmarks of the Extractor against the mock server.
+
+Run from the repository root:
+
+    python -m benchmarks.run_benchmarks --records 2000 --workers 8 32 128 \
+        --rate-limit-rate 0.01 --malformed-rate 0.02 --output output/benchmarks/run.json
+
+A `benchmarks.mock_server` is started in a child process, and each
+`num_workers` value runs in a fresh process of its own, so the peak RSS and
+the event-loop lag measured are those of the extraction alone. Records are
+synthetic ideology_logits inputs, sent through the real prompt template,
+parser and schema validation. The report is JSON with, per scenario,
+records/sec, request latency percentiles, event-loop lag, peak RSS and the
+retry counters, written to `--output` or to stdout. With `--trace-dir`,
+the runs are traced, the time by stage is added to the report and the
+traces are written there.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import importlib
+import argparse
+import platform
+import contextlib
+import multiprocessing
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+from statements.chat_client import ChatClient, ChatModel
+from statements.extractor import Extractor
+from statements.metrics import Metrics
+from statements.tracing import Tracer
+from benchmarks.mock_server import FILLER, start_in_process, profile_arguments, profile_from_args
+
+
+MODULE_NAME = "ideology_logits"
+
+
+def synthetic_records(num_records, text_tokens=800, seed=42):
+    """Records shaped like the topics dataset, with about `text_tokens` words of text."""
+    rng = random.Random(seed)
+    records = []
+    for i in range(num_records):
+        size = max(10, int(rng.gauss(text_tokens, text_tokens / 4)))
+        records.append({
+            "id": i,
+            "url": f"https://example.com/articles/{i}",
+            "title": " ".join(rng.choice(FILLER) for _ in range(8)).title(),
+            "description": " ".join(rng.choice(FILLER) for _ in range(25)),
+            "text": " ".join(rng.choice(FILLER) for _ in range(size)),
+        })
+    return records
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MiB, or None where unsupported."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes.
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+class LoopLagMonitor:
+    """
+    Measure event-loop lag as the overshoot of short sleeps.
+
+    A loop blocked by CPU-bound work (parsing, validation, JSON) wakes the
+    monitor late; the delay beyond `interval` is recorded every tick.
+    """
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.samples = []
+        self.task = None
+
+    def start(self):
+        self.task = asyncio.create_task(self.monitor())
+
+    async def monitor(self):
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, time.perf_counter() - started - self.interval))
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+
+    def summary(self):
+        if not self.samples:
+            return {"loop_lag_p50_ms": None, "loop_lag_p99_ms": None, "loop_lag_max_ms": None}
+        ordered = sorted(self.samples)
+
+        def percentile(q):
+            return ordered[min(len(ordered) - 1, round(q / 100.0 * (len(ordered) - 1)))] * 1000
+
+        return {
+            "loop_lag_p50_ms": percentile(50),
+            "loop_lag_p99_ms": percentile(99),
+            "loop_lag_max_ms": ordered[-1] * 1000,
+        }
+
+
+async def extract(url, scenario):
+    """Run one extraction against the mock server and collect its measurements."""
+    module = importlib.import_module(f"examples.modules.{MODULE_NAME}.ideology")
+    module_path = os.path.join("examples", "modules", MODULE_NAME)
+
+    dataset = synthetic_records(
+        scenario["records"], scenario["text_tokens"], scenario["seed"])
+    metrics = Metrics()
+    tracer = Tracer() if scenario["trace_dir"] else None
+    extractor = Extractor(
+        model=ChatModel("mock-model", [url], api_key="benchmark"),
+        dataset=dataset,
+        client=ChatClient(timeout=scenario["timeout"], metrics=metrics),
+        prompt_template=module.IdeologyPromptTemplate(
+            os.path.join(module_path, "ideology_template.md")),
+        output_parser=module.IdeologyOutputParser(
+            os.path.join(module_path, "ideology_schema.json")),
+        num_workers=scenario["num_workers"],
+        stream=scenario["stream"],
+        postprocess=scenario["postprocess"],
+        tracer=tracer,
+    )
+
+    monitor = LoopLagMonitor()
+    monitor.start()
+    started = time.perf_counter()
+    try:
+        await extractor.run()
+    finally:
+        elapsed = time.perf_counter() - started
+        await monitor.stop()
+        await extractor.close()
+
+    completed = metrics.counters["records_completed"]
+    latency = metrics.histograms.get("request_latency")
+    summary = latency.summary() if latency else {}
+    tokens = metrics.tokens["mock-model"]
+
+    if tracer:
+        prefix = os.path.join(scenario["trace_dir"], f"workers-{scenario['num_workers']}")
+        tracer.export_chrome(f"{prefix}.trace.json")
+        tracer.export_otlp(f"{prefix}.otlp.json")
+
+    return {
+        **scenario,
+        "completed": completed,
+        "failed": metrics.counters["records_failed"],
+        "elapsed_s": elapsed,
+        "records_per_sec": completed / elapsed if elapsed else None,
+        "requests": summary.get("count", 0),
+        "latency_p50_s": summary.get("p50"),
+        "latency_p99_s": summary.get("p99"),
+        **monitor.summary(),
+        "peak_rss_mb": peak_rss_mb(),
+        "retries": metrics.counters["retries"],
+        "rate_limited": metrics.counters["rate_limited"],
+        "parse_failures": metrics.counters["parse_failures"],
+        "prompt_tokens": tokens["prompt"],
+        "completion_tokens": tokens["completion"],
+        "stages": tracer.summary() if tracer else None,
+    }
+
+
+def run_scenario(url, scenario, verbose=False):
+    """Run a scenario, silencing the per-record logs unless `verbose`."""
+    if verbose:
+        return asyncio.run(extract(url, scenario))
+
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        return asyncio.run(extract(url, scenario))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline Extractor load benchmarks.")
+    parser.add_argument("--records", type=int, default=1000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[8, 32, 128])
+    parser.add_argument("--text-tokens", type=int, default=800,
+                        help="Mean size of the synthetic article texts.")
+    parser.add_argument("--stream", action="store_true")
+    parser.add_argument("--postprocess", choices=["thread", "process"])
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--output", help="JSON report path; printed when omitted.")
+    parser.add_argument("--trace-dir",
+                        help="Trace the runs and write Chrome and OTLP traces here.")
+    parser.add_argument("--verbose", action="store_true")
+    profile_arguments(parser)
+    args = parser.parse_args()
+
+    if not args.verbose:
+        # Read by tqdm on import, so set before the scenario processes start.
+        os.environ["TQDM_DISABLE"] = "1"
+
+    profile = profile_from_args(args)
+    server, url = start_in_process(profile)
+
+    results = []
+    context = multiprocessing.get_context("spawn")
+    try:
+        for num_workers in args.workers:
+            scenario = {
+                "num_workers": num_workers,
+                "records": args.records,
+                "text_tokens": args.text_tokens,
+                "stream": args.stream,
+                "postprocess": args.postprocess,
+                "timeout": args.timeout,
+                "seed": args.seed,
+                "trace_dir": args.trace_dir,
+            }
+            # A fresh process per scenario keeps peak RSS per scenario.
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                result = executor.submit(run_scenario, url, scenario, args.verbose).result()
+            results.append(result)
+            print(
+                f"num_workers={num_workers}: {result['records_per_sec']:.1f} records/s, "
+                f"p50 {result['latency_p50_s'] or 0:.3f}s, p99 {result['latency_p99_s'] or 0:.3f}s, "
+                f"loop lag p99 {result['loop_lag_p99_ms'] or 0:.1f}ms, "
+                f"peak RSS {result['peak_rss_mb'] or 0:.0f}MiB",
+                file=sys.stderr)
+    finally:
+        server.terminate()
+        server.join()
+
+    report = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "server": profile.as_dict(),
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        directory = os.path.dirname(args.output)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+        print(f"Report written to {args.output}", file=sys.stderr)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
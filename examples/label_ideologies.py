@@ -9,27 +9,55 @@ import numpy as np
 
 from statements.chat_client import ChatClient, OpenAIChatModel
 from statements.extractor import Extractor
+from statements.datasets import read_records
+from statements.sinks import JsonlResultSink
+from statements.metrics import Metrics
+from statements.tracing import Tracer, SamplingProfiler
+from statements.message_log import MessageLog
 
 
 SEED = 42
 START = 0
 END = 100
 NUM_WORKERS = 10
+# With a bound such as 32, requests in flight adapt up to it, starting from
+# NUM_WORKERS. None keeps NUM_WORKERS fixed.
+MAX_WORKERS = None
 TIMEOUT = 360
+# Skip the records already in the checkpoint, to continue an interrupted run.
+RESUME = False
+# Request JSON matching the module schema instead of parsing markdown.
+STRUCTURED_OUTPUT = False
+# Stream completions and stop once the label has been generated.
+STREAM = False
+# Analyze whole articles chunk by chunk instead of truncating them.
+CHUNKED = False
+# Trace the pipeline stages and sample the event loop, written to output/traces.
+TRACE = False
+# Log prompts and responses to a compressed log storing the template once,
+# instead of keeping and saving the full prompt of every record. The
+# checkpoint then refers to the templates in the log; keep the two together.
+COMPACT_MESSAGES = False
+
+# USD per million tokens, used for cost tracking.
+PRICES = {
+    "gpt-4o-mini": {"prompt": 0.15, "completion": 0.60, "cached": 0.075},
+}
 
 random.seed(SEED)
 np.random.seed(SEED)
 
 
-def save_results(parser, output_dir, prefix="quotations"):
+def save_results(parser, output_dir, prefix="quotations", save_messages=True):
     """Save the results to files."""
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     os.makedirs(output_dir, exist_ok=True)
 
-    messages_file = os.path.join(output_dir, f"{prefix}_messages_{timestamp}.jsonl")
-    with open(messages_file, "w", encoding="utf-8") as file:
-        for record in parser.messages:
-            file.write(json.dumps(record) + "\n")
+    if save_messages:
+        messages_file = os.path.join(output_dir, f"{prefix}_messages_{timestamp}.jsonl")
+        with open(messages_file, "w", encoding="utf-8") as file:
+            for record in parser.messages:
+                file.write(json.dumps(record) + "\n")
 
     # Save the full dataset as JSONL.
     jsonl_file = os.path.join(output_dir, f"{prefix}_{timestamp}.jsonl")
@@ -50,9 +78,10 @@ async def main():
     module_path = os.path.join("examples", "modules", module_name)
     module = importlib.import_module(f"examples.modules.{module_name}.ideology")
     
-    # Prepare the dataset
+    # Stream the dataset in chunks instead of loading the whole file.
     data_file = os.path.join("test_data", "topics_10k.csv")
-    dataset = module.ArticleDataset(data_file=data_file, start=START, end=END)
+    transform = None if CHUNKED else getattr(module, "prepare_article", None)
+    dataset = read_records(data_file, start=START, end=END, transform=transform)
 
     # Initialize the ChatClient and IO classes
     template_file = os.path.join(module_path, "ideology_template.md")
@@ -60,22 +89,51 @@ async def main():
     prompt_template = module.IdeologyPromptTemplate(template_file)
     output_parser = module.IdeologyOutputParser(schema_file)
 
+    # Checkpoint every completed record so an interrupted run can resume.
+    checkpoint_file = os.path.join(
+        "output", f"topics_10k_{module_name}_{START}_{END}_checkpoint.jsonl")
+    # Next to the checkpoint, so a resumed run appends to the same log.
+    message_log = MessageLog(os.path.join(
+        "output", f"topics_10k_{module_name}_{START}_{END}_messages.jsonl.gz")) \
+        if COMPACT_MESSAGES else None
+
+    tracer = Tracer() if TRACE else None
+    profiler = SamplingProfiler() if TRACE else None
+
     # Run the extraction
     extractor = Extractor(
         model=OpenAIChatModel("gpt-4o-mini"),
         dataset=dataset,
-        client=ChatClient(timeout=TIMEOUT),
+        client=ChatClient(timeout=TIMEOUT, metrics=Metrics(prices=PRICES)),
         prompt_template=prompt_template,
         output_parser=output_parser,
-        num_workers=NUM_WORKERS
+        num_workers=NUM_WORKERS,
+        max_workers=MAX_WORKERS,
+        sink=JsonlResultSink(checkpoint_file),
+        resume=RESUME,
+        metrics_dir=os.path.join("output", "metrics"),
+        structured_output=STRUCTURED_OUTPUT,
+        stream=STREAM,
+        chunker=module.make_chunker() if CHUNKED else None,
+        reducer=getattr(module, "REDUCER", None),
+        tracer=tracer,
+        profiler=profiler,
+        message_log=message_log
     )
     await extractor.run()
 
+    if TRACE:
+        trace_dir = os.path.join("output", "traces")
+        tracer.export_chrome(os.path.join(trace_dir, f"{module_name}.trace.json"))
+        tracer.export_otlp(os.path.join(trace_dir, f"{module_name}.otlp.json"))
+        profiler.write_folded(os.path.join(trace_dir, f"{module_name}.folded.txt"))
+
     # Save the results.
     today = datetime.now().strftime("%Y%m%d")
     save_results(output_parser,
                  os.path.join("output", today),
-                 prefix=f"topics_10k_{module_name}")
+                 prefix=f"topics_10k_{module_name}",
+                 save_messages=not COMPACT_MESSAGES)
 
     print("Extraction complete.")
 
@@ -0,0 +1,97 @@
+import os
+import asyncio
+import argparse
+import importlib
+from datetime import datetime
+
+from statements.chat_client import ChatClient, OpenAIChatModel
+from statements.extractor import Extractor
+from statements.datasets import read_records
+from statements.sinks import JsonlResultSink
+from statements.metrics import Metrics
+from statements.sharding import run_sharded, shard_path, merge_shards
+from examples.label_ideologies import START, END, NUM_WORKERS, MAX_WORKERS, TIMEOUT, PRICES
+
+
+NUM_SHARDS = 8
+MODULE_NAME = "ideology_comparison"
+
+# Rate limits are tracked per process, so each shard gets its part of the
+# concurrency bounds (and of any rpm/tpm budget given to the model).
+SHARD_WORKERS = max(1, NUM_WORKERS // NUM_SHARDS)
+SHARD_MAX_WORKERS = max(SHARD_WORKERS, MAX_WORKERS // NUM_SHARDS) if MAX_WORKERS else None
+
+CHECKPOINT_FILE = os.path.join(
+    "output", f"topics_10k_{MODULE_NAME}_{START}_{END}_checkpoint.jsonl")
+
+
+async def extract_shard(shard, num_shards):
+    """Run the extraction over the records of one shard."""
+    module_path = os.path.join("examples", "modules", MODULE_NAME)
+    module = importlib.import_module(f"examples.modules.{MODULE_NAME}.ideology")
+
+    data_file = os.path.join("test_data", "topics_10k.csv")
+    dataset = read_records(data_file, start=START, end=END,
+                           transform=getattr(module, "prepare_article", None),
+                           shard=(shard, num_shards))
+
+    template_file = os.path.join(module_path, "ideology_template.md")
+    schema_file = os.path.join(module_path, "ideology_schema.json")
+
+    extractor = Extractor(
+        model=OpenAIChatModel("gpt-4o-mini"),
+        dataset=dataset,
+        client=ChatClient(timeout=TIMEOUT, metrics=Metrics(prices=PRICES)),
+        prompt_template=module.IdeologyPromptTemplate(template_file),
+        output_parser=module.IdeologyOutputParser(schema_file),
+        num_workers=SHARD_WORKERS,
+        max_workers=SHARD_MAX_WORKERS,
+        sink=JsonlResultSink(shard_path(CHECKPOINT_FILE, shard, num_shards)),
+        resume=True,
+        metrics_dir=os.path.join("output", "metrics", f"shard-{shard:03d}")
+    )
+    await extractor.run()
+    await extractor.close()
+
+
+def run_shard(shard, num_shards):
+    asyncio.run(extract_shard(shard, num_shards))
+
+
+def merge(num_shards):
+    """Merge the shard checkpoints into the final results and messages files."""
+    paths = [shard_path(CHECKPOINT_FILE, shard, num_shards) for shard in range(num_shards)]
+    missing = [path for path in paths if not os.path.exists(path)]
+    if missing:
+        print(f"Missing shard checkpoints: {missing}")
+
+    output_dir = os.path.join("output", datetime.now().strftime("%Y%m%d"))
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    prefix = f"topics_10k_{MODULE_NAME}"
+    count, duplicates = merge_shards(
+        [path for path in paths if os.path.exists(path)],
+        os.path.join(output_dir, f"{prefix}_{timestamp}.jsonl"),
+        os.path.join(output_dir, f"{prefix}_messages_{timestamp}.jsonl"),
+    )
+    print(f"Merged {count} records ({duplicates} duplicates dropped).")
+
+
+def main():
+    # On several hosts sharing the output directory, give each its own
+    # --shards with --no-merge, then run once with --merge-only.
+    parser = argparse.ArgumentParser(description="Sharded ideology labelling.")
+    parser.add_argument("--shards", type=int, nargs="*", help="Shards to run here.")
+    parser.add_argument("--no-merge", action="store_true")
+    parser.add_argument("--merge-only", action="store_true")
+    args = parser.parse_args()
+
+    if not args.merge_only:
+        run_sharded(run_shard, NUM_SHARDS, shards=args.shards)
+    if not args.no_merge:
+        merge(NUM_SHARDS)
+
+    print("Extraction complete.")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,10 +2,10 @@ import json
 from datetime import datetime
 
 import pandas as pd
-from langchain.prompts import PromptTemplate
 
-from statements.utils import validate_json_with_schema
-from examples.modules.ideology.parse_ideology import parse_markdown
+from statements.templates import PrefixCachedPromptTemplate
+from statements.utils import validate_json_with_schema, schema_errors
+from examples.modules.ideology.parse_ideology import parse_markdown, is_complete
 
 
 class ArticleDataset:
@@ -31,7 +31,7 @@ class ArticleDataset:
         return item
 
 
-class IdeologyPromptTemplate:
+class IdeologyPromptTemplate(PrefixCachedPromptTemplate):
     """
     A class to handle the creation of prompt templates for quotations.
     """
@@ -40,25 +40,25 @@ class IdeologyPromptTemplate:
         """Initializes the QuotationPromptTemplate with a template file."""
         with open(template_file, "r", encoding="utf-8") as f:
             template = f.read()
-        self.template = PromptTemplate(
-            input_variables=["current_time", "title", "description", "text"],
-            template=template
+        super().__init__(
+            template,
+            record_variables=["title", "description", "text"],
+            # Frozen per run so every prompt shares the same cacheable prefix.
+            static_values={"current_time": datetime.now().strftime("%b %d, %Y")},
+            split_marker="**USER:**",
         )
 
     def read_text(self, item):
         """Reads the text from the given item."""
         return item["article_text"]
 
-    def format(self, item):
-        """Formats the template with the given item data."""
-        text = item["text"]  # Use the chunked text instead of the full text
-
-        return self.template.format(
-            current_time=datetime.now().strftime("%b %d, %Y %I:%M:%S %p"),
-            title=item["title"],
-            description=item["description"],
-            text=text,
-        )
+    def record_values(self, item):
+        """Maps the given item data to the template variables."""
+        return {
+            "title": item["title"],
+            "description": item["description"],
+            "text": item["text"],  # Use the chunked text instead of the full text
+        }
 
 
 class IdeologyOutputParser:
@@ -77,14 +77,21 @@ class IdeologyOutputParser:
         """Validates the parsed data against the schema."""
         return validate_json_with_schema(parsed_data, self.schema)
 
+    def validation_errors(self, parsed_data):
+        """Lists the schema violations of the parsed data."""
+        return schema_errors(parsed_data, self.schema)
+
     def parse(self, raw_output):
         """Parses the raw output."""
         return parse_markdown(raw_output)
 
+    def is_complete(self, raw_output):
+        """Whether a partial output can be parsed already."""
+        return is_complete(raw_output)
+
     def collate_output(self, item, messages, parsed_data):
         """Collates the parsed data into results."""
         doc_id = item["id"]
-        parsed_data = parsed_data[0]
         data = {
             "doc_id": doc_id,
             "score": parsed_data["score"],
@@ -94,4 +101,4 @@ class IdeologyOutputParser:
         }
         self.results[doc_id] = data
 
-        self.messages.extend([{"doc_id": doc_id, **m} for m in messages])
+        self.messages.append({"doc_id": doc_id, **messages})
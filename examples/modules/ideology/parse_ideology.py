@@ -1,32 +1,24 @@
-import re
 import json
 
+from statements.markdown_parser import Field, MarkdownParser
+
+# Compiled once; the reasoning is the free text before the '---' divider.
+PARSER = MarkdownParser(
+    [
+        Field("score", "Political Compass Score", kind="number", nullable=True),
+        Field("label", "Categorical Label", kind="label"),
+    ],
+    preamble="reasoning",
+)
+
+
 def parse_markdown(markdown_text):
-    pattern = (
-        r'(.*?)\s*'       # Capture reasoning inside square brackets
-        r'---\s*'                          # Separator line with dashes
-        r'- \*\*Political Compass Score\*\*: (.*?)\s*'  # Capture score
-        r'- \*\*Categorical Label\*\*: ([\w-]+)\s*'             # Capture label
-    )
-    
-    match = re.search(pattern, markdown_text.strip(), re.DOTALL)
-    
-    if match:
-        reasoning, score, label = match.groups()
-        score = score.split()[0]  # Extract the first part of the score
-        score = (
-            float(score)
-            if score and score not in ['NA', 'na', 'Na', 'n/a', 'N/A']
-            else None
-        )
-        
-        return {
-            "score": score,
-            "label": label.lower(),
-            "reasoning": reasoning.strip()
-        }
-    
-    raise ValueError(f"Markdown format is incorrect: {markdown_text}")
+    return PARSER.parse(markdown_text)
+
+
+def is_complete(markdown_text):
+    """Whether a streamed output already holds every required field."""
+    return PARSER.is_complete(markdown_text)
 
 # Example markdown input
 if __name__ == "__main__":
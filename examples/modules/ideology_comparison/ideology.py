@@ -1,15 +1,51 @@
+import os
 import json
 from datetime import datetime
 
 import pandas as pd
-from langchain.prompts import PromptTemplate
 import tiktoken
 
-from statements.utils import validate_json_with_schema, truncate_text
-from examples.modules.ideology_comparison.parse_ideology import parse_markdown
+from statements.templates import PrefixCachedPromptTemplate
+from statements.chunking import (
+    Chunker, FieldReducer, concat_lists, join_text, mean_scores,
+    mean_probabilities, majority, label_from_scores
+)
+from statements.utils import (
+    validate_json_with_schema, schema_errors, truncate_text, batch_truncate_text, TokenCountCache
+)
+from examples.modules.ideology_comparison.parse_ideology import parse_markdown, is_complete
 
 CHUNK_SIZE = 8192
 encoder = tiktoken.encoding_for_model("gpt-4o")
+# Token counts of the articles, so repeated runs skip encoding the short ones.
+TOKEN_CACHE_FILE = os.path.join("output", "token_counts.sqlite")
+
+
+def prepare_article(item):
+    """Truncates the article text of a streamed record to the chunk size."""
+    item["article_text"] = truncate_text(item["article_text"], encoder, max_tokens=CHUNK_SIZE)
+    return item
+
+
+def make_chunker():
+    """Splits untruncated articles into chunks of the chunk size for map-reduce runs."""
+    return Chunker(encoder, text_key="article_text", tokens_per_chunk=CHUNK_SIZE,
+                   overlap=256, by_lines=True)
+
+
+# Merges the outputs of an article's chunks: biases are concatenated, scores
+# averaged, and the label taken from the averaged probabilities.
+REDUCER = FieldReducer(
+    {
+        "potential_bias": concat_lists,
+        "overall_assessment": join_text(),
+        "logit_scores": mean_scores,
+        "softmax_probabilities": mean_probabilities,
+        "label": majority,
+    },
+    finalize=label_from_scores("softmax_probabilities"),
+)
+
 
 class ArticleDataset:
     """
@@ -25,9 +61,13 @@ class ArticleDataset:
             raise ValueError("Invalid start or end index for the dataset.")
 
         self.data = self.data[start:end].copy()
-        self.data["article_text"] = self.data["article_text"].apply(
-            lambda x: truncate_text(x, encoder, max_tokens=CHUNK_SIZE)
-        )
+        cache = TokenCountCache(TOKEN_CACHE_FILE)
+        try:
+            self.data["article_text"] = batch_truncate_text(
+                self.data["article_text"].tolist(), encoder, max_tokens=CHUNK_SIZE, cache=cache
+            )
+        finally:
+            cache.close()
 
     def __len__(self):
         return len(self.data)
@@ -37,7 +77,7 @@ class ArticleDataset:
         return item
 
 
-class IdeologyPromptTemplate:
+class IdeologyPromptTemplate(PrefixCachedPromptTemplate):
     """
     A class to handle the creation of prompt templates for quotations.
     """
@@ -46,21 +86,21 @@ class IdeologyPromptTemplate:
         """Initializes the QuotationPromptTemplate with a template file."""
         with open(template_file, "r", encoding="utf-8") as f:
             template = f.read()
-        self.template = PromptTemplate(
-            input_variables=["current_time", "title", "description", "text"],
-            template=template
+        super().__init__(
+            template,
+            record_variables=["title", "description", "text"],
+            # Frozen per run so every prompt shares the same cacheable prefix.
+            static_values={"current_time": datetime.now().strftime("%b %d, %Y")},
+            split_marker="**BIAS FINDER MODEL INPUT**",
         )
 
-    def format(self, item):
-        """Formats the template with the given item data."""
-        text = item["article_text"]  # Use the chunked text instead of the full text
-
-        return self.template.format(
-            current_time=datetime.now().strftime("%b %d, %Y %I:%M:%S %p"),
-            title=item["title"],
-            description=item["description"],
-            text=text,
-        )
+    def record_values(self, item):
+        """Maps the given item data to the template variables."""
+        return {
+            "title": item["title"],
+            "description": item["description"],
+            "text": item["article_text"],  # Use the chunked text instead of the full text
+        }
 
 
 class IdeologyOutputParser:
@@ -79,10 +119,18 @@ class IdeologyOutputParser:
         """Validates the parsed data against the schema."""
         return validate_json_with_schema(parsed_data, self.schema)
 
+    def validation_errors(self, parsed_data):
+        """Lists the schema violations of the parsed data."""
+        return schema_errors(parsed_data, self.schema)
+
     def parse(self, raw_output):
         """Parses the raw output."""
         return parse_markdown(raw_output)
 
+    def is_complete(self, raw_output):
+        """Whether a partial output can be parsed already."""
+        return is_complete(raw_output)
+
     def collate_output(self, item, messages, parsed_data):
         """Collates the parsed data into results."""
         doc_id = item["id"]
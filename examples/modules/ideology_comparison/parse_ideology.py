@@ -1,104 +1,44 @@
-import re
 import json
 
-def parse_markdown(markdown_text):
-    # Split the markdown text into two parts using the divider '---'
-    parts = markdown_text.strip().rsplit('---', 1)
-    if len(parts) < 2:
-        raise ValueError("Markdown format is missing the divider '---'")
-    
-    pre_section = parts[0].strip()
-    post_section = parts[1].strip()
+from statements.markdown_parser import Field, MarkdownParser
+
+CATEGORIES = ["Left", "Left-Center", "Center", "Center-Right", "Right"]
 
-    # Parse the potential bias block from the pre-divider section.
-    # This captures everything between "- **Potential Bias**:" and "- **Overall Assessment**:"
-    potential_bias_match = re.search(
-        r"- \*\*Potential Bias\*\*:\s*\n(.*?)\n- \*\*Overall Assessment\*\*:",
-        pre_section,
-        re.DOTALL
-    )
-    potential_bias_list = []
-    if potential_bias_match:
-        potential_bias_text = potential_bias_match.group(1).strip()
-        # Define a pattern to capture each bias block.
-        bias_block_pattern = re.compile((
-                r"- \*\*Bias\*\*:\s*(.*?)\n\s*"
-                r"- \*\*Bias Type\*\*:\s*(.*?)\n\s*"
-                r"- \*\*News Event\*\*:\s*(.*?)\n\s*"
-                r"- \*\*Left-Wing Perspective\*\*:\s*(.*?)\n\s*"
-                r"- \*\*Right-Wing Perspective\*\*:\s*(.*?)\n\s*"
-                r"- \*\*Bias Analysis\*\*:\s*(.*?)\n\s*"
-                r"- \*\*Bias Favoring\*\*:\s*(.*?)"
-                r"(?=\n\s*- \*\*Potential Bias\*\*:|\Z)"
-            ),
-            re.DOTALL
-        )
-        for match in bias_block_pattern.finditer(potential_bias_text):
-            bias_dict = {
-                "bias": match.group(1).strip(),
-                "bias_type": match.group(2).strip(),
-                "news_event": match.group(3).strip(),
-                "left_wing_perspective": match.group(4).strip(),
-                "right_wing_perspective": match.group(5).strip(),
-                "bias_analysis": match.group(6).strip(),
-                "bias_favoring": match.group(7).strip()
-            }
-            potential_bias_list.append(bias_dict)
+# Compiled once. Nesting comes from the spec rather than indentation, so
+# fields such as an oddly indented "Unbiased" score are still found.
+PARSER = MarkdownParser([
+    Field("potential_bias", "Potential Bias", kind="group", repeated=True, required=False, children=[
+        Field("bias", "Bias"),
+        Field("bias_type", "Bias Type"),
+        Field("news_event", "News Event"),
+        Field("left_wing_perspective", "Left-Wing Perspective"),
+        Field("right_wing_perspective", "Right-Wing Perspective"),
+        Field("bias_analysis", "Bias Analysis"),
+        Field("bias_favoring", "Bias Favoring"),
+    ]),
+    Field("overall_assessment", "Overall Assessment", required=False),
+    Field("logit_scores", "Logit Scores", kind="group", children=[
+        *[Field(category, category, kind="number") for category in CATEGORIES],
+        Field("Unbiased", "Unbiased", kind="number", required=False),
+    ]),
+    Field("softmax_probabilities", "Softmax Probabilities", kind="group", children=[
+        *[Field(category, category, kind="percent") for category in CATEGORIES],
+        Field("Unbiased", "Unbiased", kind="percent", required=False),
+    ]),
+    Field("label", "Categorical Label", kind="label"),
+])
 
-    # Parse the overall assessment from the pre-divider section.
-    overall_assessment_match = re.search(
-        r"- \*\*Overall Assessment\*\*: (.*)",
-        pre_section
-    )
-    overall_assessment = overall_assessment_match.group(1).strip() if overall_assessment_match else ""
 
-    # Parse the logit scores, softmax probabilities, and categorical label from the post-divider section.
-    logit_pattern = (
-        r"- \*\*Logit Scores\*\*:\s*\n"
-        r"\s*- \*\*Left\*\*: ([\d\.\-]+)\s*\n"
-        r"\s*- \*\*Left-Center\*\*: ([\d\.\-]+)\s*\n"
-        r"\s*- \*\*Center\*\*: ([\d\.\-]+)\s*\n"
-        r"\s*- \*\*Center-Right\*\*: ([\d\.\-]+)\s*\n"
-        r"\s*- \*\*Right\*\*: ([\d\.\-]+)\s*\n"
-        r"\s*- \*\*Unbiased\*\*: ([\d\.\-]+)\s*\n"
-        r"- \*\*Softmax Probabilities\*\*:\s*\n"
-        r"\s*- \*\*Left\*\*: ([\d\.\-]+)%\s*\n"
-        r"\s*- \*\*Left-Center\*\*: ([\d\.\-]+)%\s*\n"
-        r"\s*- \*\*Center\*\*: ([\d\.\-]+)%\s*\n"
-        r"\s*- \*\*Center-Right\*\*: ([\d\.\-]+)%\s*\n"
-        r"\s*- \*\*Right\*\*: ([\d\.\-]+)%\s*\n"
-        r"\s*- \*\*Unbiased\*\*: ([\d\.\-]+)%\s*\n"
-        r"- \*\*Categorical Label\*\*: ([\w-]+)"
-    )
-    logit_match = re.search(logit_pattern, post_section, re.DOTALL)
-    if logit_match:
-        logit_scores = {
-            "Left": float(logit_match.group(1)),
-            "Left-Center": float(logit_match.group(2)),
-            "Center": float(logit_match.group(3)),
-            "Center-Right": float(logit_match.group(4)),
-            "Right": float(logit_match.group(5)),
-            "Unbiased": float(logit_match.group(6))
-        }
-        softmax_probabilities = {
-            "Left": float(logit_match.group(7)) / 100.0,
-            "Left-Center": float(logit_match.group(8)) / 100.0,
-            "Center": float(logit_match.group(9)) / 100.0,
-            "Center-Right": float(logit_match.group(10)) / 100.0,
-            "Right": float(logit_match.group(11)) / 100.0,
-            "Unbiased": float(logit_match.group(12)) / 100.0
-        }
-        categorical_label = logit_match.group(13).lower()
-    else:
-        raise ValueError(f"Post-divider markdown format is incorrect: {markdown_text}")
+def parse_markdown(markdown_text):
+    result = PARSER.parse(markdown_text)
+    result.setdefault("potential_bias", [])
+    result.setdefault("overall_assessment", "")
+    return result
+
 
-    return {
-        "potential_bias": potential_bias_list,
-        "overall_assessment": overall_assessment,
-        "logit_scores": logit_scores,
-        "softmax_probabilities": softmax_probabilities,
-        "label": categorical_label
-    }
+def is_complete(markdown_text):
+    """Whether a streamed output already holds every required field."""
+    return PARSER.is_complete(markdown_text)
 
 # Example usage
 if __name__ == "__main__":
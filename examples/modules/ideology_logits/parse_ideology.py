@@ -1,52 +1,31 @@
-import re
 import json
 
-def parse_markdown(markdown_text):
-    pattern = (
-        r"([\s\S]+?)\n---\s*"  # Extracts the reasoning section
-        r"- \**Logit Scores\**:\s*\n"
-        r"\s*- \**Left\**: ([\d\.\-]+)\s*\n"
-        r"\s*- \**Left-Center\**: ([\d\.\-]+)\s*\n"
-        r"\s*- \**Center\**: ([\d\.\-]+)\s*\n"
-        r"\s*- \**Center-Right\**: ([\d\.\-]+)\s*\n"
-        r"\s*- \**Right\**: ([\d\.\-]+)\s*\n"
-        r"- \**Softmax Probabilities\**:\s*\n"
-        r"\s*- \**Left\**: ([\d\.\-]+)%\s*\n"
-        r"\s*- \**Left-Center\**: ([\d\.\-]+)%\s*\n"
-        r"\s*- \**Center\**: ([\d\.\-]+)%\s*\n"
-        r"\s*- \**Center-Right\**: ([\d\.\-]+)%\s*\n"
-        r"\s*- \**Right\**: ([\d\.\-]+)%\s*\n"
-        r"- \**Categorical Label\**: ([\w-]+)"
-    )
+from statements.markdown_parser import Field, MarkdownParser
+
+CATEGORIES = ["Left", "Left-Center", "Center", "Center-Right", "Right"]
 
-    match = re.search(pattern, markdown_text.strip())
+# Compiled once; the reasoning is the free text before the '---' divider.
+PARSER = MarkdownParser(
+    [
+        Field("logit_scores", "Logit Scores", kind="group", children=[
+            Field(category, category, kind="number") for category in CATEGORIES
+        ]),
+        Field("softmax_probabilities", "Softmax Probabilities", kind="group", children=[
+            Field(category, category, kind="percent") for category in CATEGORIES
+        ]),
+        Field("label", "Categorical Label", kind="label"),
+    ],
+    preamble="reasoning",
+)
 
-    if match:
-        reasoning = match.group(1).strip()
-        logit_scores = {
-            "Left": float(match.group(2)),
-            "Left-Center": float(match.group(3)),
-            "Center": float(match.group(4)),
-            "Center-Right": float(match.group(5)),
-            "Right": float(match.group(6))
-        }
-        softmax_probabilities = {
-            "Left": float(match.group(7)) / 100.0,
-            "Left-Center": float(match.group(8)) / 100.0,
-            "Center": float(match.group(9)) / 100.0,
-            "Center-Right": float(match.group(10)) / 100.0,
-            "Right": float(match.group(11)) / 100.0
-        }
-        categorical_label = match.group(12)
 
-        return {
-            "reasoning": reasoning,
-            "logit_scores": logit_scores,
-            "softmax_probabilities": softmax_probabilities,
-            "label": categorical_label
-        }
+def parse_markdown(markdown_text):
+    return PARSER.parse(markdown_text)
+
 
-    raise ValueError(f"Markdown format is incorrect: {markdown_text}")
+def is_complete(markdown_text):
+    """Whether a streamed output already holds every required field."""
+    return PARSER.is_complete(markdown_text)
 
 # Example markdown input
 if __name__ == "__main__":
@@ -0,0 +1,48 @@
+import os
+import sys
+import importlib
+from functools import partial
+from datetime import datetime
+
+from statements.datasets import read_records
+from statements.replay import replay_messages, save_failures
+from examples.label_ideologies import save_results
+
+
+NUM_PROCESSES = 8
+
+
+def main(messages_file):
+    # Define the paths to the data files
+    module_name = "ideology_comparison"
+    module_path = os.path.join("examples", "modules", module_name)
+    module = importlib.import_module(f"examples.modules.{module_name}.ideology")
+
+    # Original records, needed by collate_output for fields such as the url.
+    data_file = os.path.join("test_data", "topics_10k.csv")
+    items = {item["id"]: item for item in read_records(data_file)}
+
+    # Re-parse the stored completions with the current parser.
+    schema_file = os.path.join(module_path, "ideology_schema.json")
+    parser, failures = replay_messages(
+        messages_file,
+        partial(module.IdeologyOutputParser, schema_file),
+        items=items,
+        num_processes=NUM_PROCESSES,
+        reducer=getattr(module, "REDUCER", None),
+    )
+
+    # Save the results.
+    today = datetime.now().strftime("%Y%m%d")
+    output_dir = os.path.join("output", today)
+    prefix = f"topics_10k_{module_name}_replay"
+    save_results(parser, output_dir, prefix=prefix)
+
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    save_failures(failures, os.path.join(output_dir, f"{prefix}_failures_{timestamp}.jsonl"))
+
+    print(f"Replay complete: {len(parser.results)} records, {len(failures)} failures.")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1])
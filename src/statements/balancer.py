@@ -0,0 +1,207 @@
+import time
+import random
+import logging
+
+
+logger = logging.getLogger(__name__)
+
+
+class EndpointState:
+    """
+    Health and load of one endpoint, with a circuit breaker.
+
+    The breaker opens after `failure_threshold` consecutive failures or when
+    the error rate EWMA exceeds `error_rate_threshold`. Once `cooldown`
+    seconds have passed it lets a single probe request through (half-open);
+    a successful probe closes it, a failed one reopens it with a doubled
+    cooldown, and a cancelled one lets the next request probe. The probe is
+    claimed when the endpoint is chosen; a claim not settled within
+    `cooldown` seconds (e.g. a request dropped before it was sent) expires.
+    """
+
+    def __init__(
+        self,
+        endpoint,
+        alpha=0.2,
+        failure_threshold=5,
+        error_rate_threshold=0.5,
+        min_requests=10,
+        cooldown=30.0,
+        max_cooldown=300.0,
+    ):
+        self.endpoint = endpoint
+        self.alpha = alpha
+        self.failure_threshold = failure_threshold
+        self.error_rate_threshold = error_rate_threshold
+        self.min_requests = min_requests
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+
+        self.in_flight = 0
+        self.requests = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.latency = None  # EWMA of successful request latency in seconds
+        self.error_rate = 0.0  # EWMA of the failure indicator
+
+        self.state = "closed"
+        self.opened_at = 0.0
+        self.cooldown = cooldown
+        self.probing = False
+        self.probe_started = 0.0
+
+    def available(self, now):
+        """Whether a request may be routed here, moving open breakers to half-open."""
+        if self.state == "open" and now - self.opened_at >= self.cooldown:
+            self.state = "half_open"
+            self.probing = False
+        if self.state == "half_open":
+            return not self.probing or now - self.probe_started >= self.cooldown
+        return self.state == "closed"
+
+    def claim(self, now):
+        """Reserve the probe of a half-open endpoint for the request routed here."""
+        if self.state == "half_open":
+            self.probing = True
+            self.probe_started = now
+
+    def start(self):
+        self.in_flight += 1
+        self.requests += 1
+        if self.state == "half_open" and not self.probing:
+            self.claim(time.monotonic())
+
+    def finish(self):
+        self.in_flight = max(0, self.in_flight - 1)
+
+    def cancel(self):
+        """Release a request without judging health; a cancelled probe frees the probe."""
+        self.finish()
+        if self.state == "half_open":
+            self.probing = False
+
+    def success(self, latency):
+        self.finish()
+        self.consecutive_failures = 0
+        self.error_rate *= 1.0 - self.alpha
+        if self.latency is None:
+            self.latency = latency
+        else:
+            self.latency += self.alpha * (latency - self.latency)
+
+        if self.state == "half_open":
+            self.state = "closed"
+            self.cooldown = self.base_cooldown
+            self.probing = False
+
+    def failure(self):
+        self.finish()
+        self.failures += 1
+        self.consecutive_failures += 1
+        self.error_rate += self.alpha * (1.0 - self.error_rate)
+
+        if self.state == "half_open":
+            self.cooldown = min(self.max_cooldown, self.cooldown * 2.0)
+            self.trip()
+        elif self.state == "closed" and (
+            self.consecutive_failures >= self.failure_threshold
+            or (self.requests >= self.min_requests
+                and self.error_rate > self.error_rate_threshold)
+        ):
+            self.trip()
+
+    def trip(self):
+        logger.warning(
+            "Circuit opened for %s for %.0f seconds.", self.endpoint, self.cooldown)
+        self.state = "open"
+        self.opened_at = time.monotonic()
+        self.probing = False
+
+    def snapshot(self):
+        return {
+            "state": self.state,
+            "in_flight": self.in_flight,
+            "requests": self.requests,
+            "failures": self.failures,
+            "latency_ewma": self.latency,
+            "error_rate": self.error_rate,
+        }
+
+
+class Balancer:
+    """
+    Base class for endpoint selection with health tracking.
+
+    Subclasses implement `select` to pick among the endpoints whose circuit
+    is not open. If every endpoint is open, the one that tripped first is
+    used rather than failing the request.
+    """
+
+    def __init__(self, **state_args):
+        self.state_args = state_args
+        self.states = {}
+
+    def state(self, endpoint):
+        state = self.states.get(endpoint)
+        if state is None:
+            state = self.states[endpoint] = EndpointState(endpoint, **self.state_args)
+        return state
+
+    def choose(self, endpoints, exclude=()):
+        """Pick an endpoint, avoiding `exclude` and open circuits when possible."""
+        candidates = [e for e in endpoints if e not in exclude] or list(endpoints)
+        now = time.monotonic()
+        healthy = [self.state(e) for e in candidates if self.state(e).available(now)]
+        if not healthy:
+            return min(candidates, key=lambda e: self.state(e).opened_at)
+        chosen = healthy[0] if len(healthy) == 1 else self.select(healthy)
+        # Claimed here, so concurrent requests do not all probe the endpoint.
+        chosen.claim(now)
+        return chosen.endpoint
+
+    def select(self, states):
+        raise NotImplementedError
+
+    def on_start(self, endpoint):
+        self.state(endpoint).start()
+
+    def on_success(self, endpoint, latency):
+        self.state(endpoint).success(latency)
+
+    def on_failure(self, endpoint):
+        self.state(endpoint).failure()
+
+    def on_cancel(self, endpoint):
+        """Release an in-flight slot without judging the endpoint's health."""
+        self.state(endpoint).cancel()
+
+    def snapshot(self):
+        return {endpoint: state.snapshot() for endpoint, state in self.states.items()}
+
+
+def load_score(state):
+    """Expected wait on an endpoint: outstanding requests times typical latency."""
+    latency = state.latency if state.latency is not None else 0.0
+    return (state.in_flight + 1) * (latency + 1e-3)
+
+
+class RandomBalancer(Balancer):
+    """Uniformly random choice among healthy endpoints."""
+
+    def select(self, states):
+        return random.choice(states)
+
+
+class LeastOutstandingBalancer(Balancer):
+    """Route to the endpoint with the fewest in-flight requests, then the lowest latency."""
+
+    def select(self, states):
+        return min(states, key=lambda s: (s.in_flight, load_score(s), random.random()))
+
+
+class PowerOfTwoBalancer(Balancer):
+    """Sample two healthy endpoints and route to the less loaded one."""
+
+    def select(self, states):
+        first, second = random.sample(states, 2)
+        return first if load_score(first) <= load_score(second) else second
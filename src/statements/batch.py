@@ -0,0 +1,132 @@
+import os
+import json
+import asyncio
+
+from statements.exceptions import BadResponseException
+
+
+# Batch states after which polling stops.
+FINAL_STATES = ("completed", "failed", "expired", "cancelled")
+
+
+def batch_request(custom_id, model, messages, args=None):
+    """Build one line of a batch input file for the chat completions endpoint."""
+    if args is None:
+        args = model.args
+    return {
+        "custom_id": custom_id,
+        "method": "POST",
+        "url": "/v1/chat/completions",
+        "body": {
+            "model": model.name,
+            "messages": messages,
+            **args,  # Additional model-specific arguments
+        },
+    }
+
+
+def read_batch_state(path):
+    """Load the state saved by `write_batch_state`, or None without one."""
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def write_batch_state(path, state):
+    """
+    Save the input files of a run and the batches submitted from them.
+
+    The file is replaced atomically, so an interrupted run leaves either
+    the previous state or the new one.
+    """
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+
+
+class BatchClient:
+    """
+    Client for the OpenAI-compatible `/v1/files` and `/v1/batches` endpoints.
+
+    All calls for a batch go to the first endpoint in `model.proxies`, since
+    uploaded files and batches live on a single server.
+    """
+
+    def __init__(self, client):
+        self.client = client  # A shared httpx.AsyncClient
+
+    @staticmethod
+    def endpoint(model):
+        return model.proxies[0]
+
+    @staticmethod
+    def check(response):
+        if response.status_code != 200:
+            raise BadResponseException(
+                f"Batch API error {response.status_code}: {response.text}")
+        return response
+
+    async def upload_file(self, model, path):
+        """Upload a batch input file and return its file id."""
+        headers = {k: v for k, v in model.headers.items() if k != "Content-Type"}
+        with open(path, "rb") as file:
+            content = file.read()
+        response = await self.client.post(
+            f"{self.endpoint(model)}/v1/files",
+            data={"purpose": "batch"},
+            files={"file": (os.path.basename(path), content, "application/jsonl")},
+            headers=headers,
+        )
+        return self.check(response).json()["id"]
+
+    async def create_batch(self, model, input_file_id, completion_window="24h"):
+        """Create a chat completions batch from an uploaded file."""
+        response = await self.client.post(
+            f"{self.endpoint(model)}/v1/batches",
+            json={
+                "input_file_id": input_file_id,
+                "endpoint": "/v1/chat/completions",
+                "completion_window": completion_window,
+            },
+            headers=model.headers,
+        )
+        return self.check(response).json()
+
+    async def retrieve_batch(self, model, batch_id):
+        """Fetch the current state of a batch."""
+        response = await self.client.get(
+            f"{self.endpoint(model)}/v1/batches/{batch_id}",
+            headers=model.headers,
+        )
+        return self.check(response).json()
+
+    async def download_file(self, model, file_id):
+        """Download the content of a file as text."""
+        response = await self.client.get(
+            f"{self.endpoint(model)}/v1/files/{file_id}/content",
+            headers=model.headers,
+        )
+        return self.check(response).text
+
+    async def wait(self, model, batch_id, poll_interval=30.0):
+        """Poll a batch until it reaches a final state."""
+        while True:
+            batch = await self.retrieve_batch(model, batch_id)
+            if batch.get("status") in FINAL_STATES:
+                return batch
+            await asyncio.sleep(poll_interval)
+
+    async def results(self, model, batch):
+        """Yield the output lines of a finished batch, followed by its error lines."""
+        for key in ("output_file_id", "error_file_id"):
+            file_id = batch.get(key)
+            if not file_id:
+                continue
+            content = await self.download_file(model, file_id)
+            for line in content.splitlines():
+                if line.strip():
+                    yield json.loads(line)
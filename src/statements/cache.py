@@ -0,0 +1,176 @@
+import os
+import json
+import time
+import asyncio
+import hashlib
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+
+
+class ResponseCache:
+    """
+    Content-addressed on-disk cache of chat completion responses.
+
+    Responses are keyed by a hash of the model name, the model arguments and
+    the prompt messages, and stored in a SQLite file. Entries older than
+    `max_age` seconds are treated as misses, and the least recently used
+    entries are evicted once the cache grows beyond `max_bytes`. A read-only
+    cache serves hits but never writes or evicts.
+
+    `lookup` and `store` run `get` and `put` on a dedicated thread, so the
+    event loop never waits on SQLite. Reads do not write: the access times
+    of hits are kept in memory and saved with the next `put` or on close.
+    """
+
+    def __init__(self, path, max_bytes=None, max_age=None, read_only=False):
+        directory = os.path.dirname(path)
+        if directory and not read_only:
+            os.makedirs(directory, exist_ok=True)
+
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.read_only = read_only
+
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+        self.accessed = {}  # Key -> access time of hits not saved yet
+
+        # Every call after this one runs on the executor's single thread.
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="response-cache")
+        if read_only:
+            self.connection = sqlite3.connect(
+                f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+        else:
+            self.connection = sqlite3.connect(path, check_same_thread=False)
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, model TEXT, response TEXT NOT NULL, "
+                "size INTEGER NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)"
+            )
+            self.connection.execute(
+                "CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+            self.connection.commit()
+
+        self.size = self.connection.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    @staticmethod
+    def key(model_name, args, messages):
+        """Hash the request content into a cache key."""
+        payload = json.dumps(
+            {"model": model_name, "args": args or {}, "messages": messages},
+            sort_keys=True,
+            ensure_ascii=False,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """Return the cached response for `key`, or None on a miss."""
+        row = self.connection.execute(
+            "SELECT response, created FROM responses WHERE key = ?", (key,)
+        ).fetchone()
+
+        now = time.time()
+        if row is None or (self.max_age is not None and now - row[1] > self.max_age):
+            self.misses += 1  # Expired entries are dropped by the next eviction
+            return None
+
+        if not self.read_only:
+            self.accessed[key] = now
+
+        self.hits += 1
+        return json.loads(row[0])
+
+    async def lookup(self, key):
+        """`get` on the cache thread."""
+        return await asyncio.get_running_loop().run_in_executor(self.executor, self.get, key)
+
+    async def store(self, key, model_name, response):
+        """`put` on the cache thread."""
+        await asyncio.get_running_loop().run_in_executor(
+            self.executor, self.put, key, model_name, response)
+
+    def put(self, key, model_name, response):
+        """Store a response and evict old entries beyond the size budget."""
+        if self.read_only:
+            return
+
+        data = json.dumps(response, ensure_ascii=False)
+        size = len(data.encode("utf-8"))
+        now = time.time()
+
+        self.delete(key)
+        self.connection.execute(
+            "INSERT INTO responses (key, model, response, size, created, accessed) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (key, model_name, data, size, now, now),
+        )
+        self.size += size
+        self.writes += 1
+
+        self.save_accessed()
+        self.evict()
+        self.connection.commit()
+
+    def save_accessed(self):
+        """Write the access times of recent hits, without committing."""
+        if self.accessed:
+            self.connection.executemany(
+                "UPDATE responses SET accessed = ? WHERE key = ?",
+                [(accessed, key) for key, accessed in self.accessed.items()])
+            self.accessed = {}
+
+    def delete(self, key):
+        row = self.connection.execute(
+            "SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is not None:
+            self.connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self.size -= row[0]
+
+    def evict(self):
+        """Drop expired entries, then least recently used ones until under budget."""
+        if self.max_age is not None:
+            expired = self.connection.execute(
+                "SELECT key, size FROM responses WHERE created < ?",
+                (time.time() - self.max_age,),
+            ).fetchall()
+            for key, size in expired:
+                self.connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self.size -= size
+                self.evictions += 1
+
+        if self.max_bytes is None or self.size <= self.max_bytes:
+            return
+
+        for key, size in self.connection.execute(
+                "SELECT key, size FROM responses ORDER BY accessed").fetchall():
+            if self.size <= self.max_bytes:
+                break
+            self.connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self.size -= size
+            self.evictions += 1
+
+    def stats(self):
+        """Return the hit, miss, write and eviction counters."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "writes": self.writes,
+            "evictions": self.evictions,
+            "size_bytes": self.size,
+        }
+
+    def close(self):
+        self.executor.shutdown()
+        if self.connection is not None:
+            if not self.read_only and self.accessed:
+                self.save_accessed()
+                self.connection.commit()
+            self.connection.close()
+            self.connection = None
@@ -1,7 +1,9 @@
 import os
-import random
-import json
 import time
+import json
+import asyncio
+import logging
+import warnings
 
 import httpx
 
@@ -10,8 +12,15 @@ from statements.exceptions import (
     CensoredResponseException,
     TooManyRequestsException
 )
+from statements.rate_limiter import RateLimiterRegistry
+from statements.metrics import Metrics, TOKEN_LATENCY_BUCKETS
+from statements.balancer import PowerOfTwoBalancer
+from statements.tracing import NULL_TRACER
+from statements.utils import strict_json_schema
 
 
+logger = logging.getLogger(__name__)
+
 HEADERS = {"Content-Type": "application/json", "Authorization": ""}
 
 # Default mapping of platform names to their API endpoints.
@@ -23,15 +32,51 @@ ENDPOINT_PROXIES = {
 }
 
 
+def estimate_tokens(messages, args=None):
+    """Rough token estimate of a request, used to reserve tokens-per-minute budget."""
+    chars = sum(len(str(m.get("content") or "")) for m in messages)
+    args = args or {}
+    max_tokens = args.get("max_completion_tokens") or args.get("max_tokens") or 0
+    return chars // 4 + max_tokens
+
+
+def cached_tokens(usage):
+    """Prompt tokens served from the provider's prefix cache (OpenAI, vLLM or DeepSeek style)."""
+    details = usage.get("prompt_tokens_details") or {}
+    return details.get("cached_tokens") or usage.get("prompt_cache_hit_tokens") or 0
+
+
+async def iter_sse_data(response):
+    """Yield the data payloads of a server-sent events stream until [DONE]."""
+    async for line in response.aiter_lines():
+        if not line.startswith("data:"):
+            continue  # Blank separators, comments and keep-alives
+        data = line[5:].strip()
+        if data == "[DONE]":
+            return
+        if data:
+            yield data
+
+
 def debug_context(completion, res):
+    try:
+        raw = completion.text if completion else "None"
+    except httpx.ResponseNotRead:
+        raw = "(streamed)"
     context = f"Response Code: {completion.status_code if completion else 'None'}\n"
-    context += f"Raw Response: {completion.text if completion else 'None'}\n"
+    context += f"Raw Response: {raw}\n"
     context += f"Response: {res if res else 'None'}"
     return context
 
 
 class ChatModel():
-    def __init__(self, name, proxies, api_key=None, **args):
+    provider = "custom"  # Scopes rate limit state together with the model and endpoint
+    # Whether the backend constrains decoding to the schema given to
+    # `structured_output_args`, so its outputs need no format retries. Off
+    # for generic OpenAI-compatible servers, which may ignore response_format.
+    guarantees_schema = False
+
+    def __init__(self, name, proxies, api_key=None, rpm=None, tpm=None, **args):
         if not isinstance(proxies, list) or len(proxies) == 0:
             raise ValueError(
                 "Cannot initialize ChatModel with empty proxies list.")
@@ -43,11 +88,41 @@ class ChatModel():
         self.proxies = proxies
         self.args = args or {}
 
+        # Optional per-endpoint budgets in requests and tokens per minute.
+        self.rpm = rpm
+        self.tpm = tpm
+
     def __repr__(self):
         return f"ChatModel({self.name})"
 
+    def rate_limit_key(self, endpoint):
+        """Key of the rate limit state shared by requests to `endpoint` for this model."""
+        return (self.provider, self.name, endpoint)
+
+    def structured_output_args(self, schema, name="output"):
+        """Request arguments constraining the completion to JSON matching `schema`."""
+        return {
+            "response_format": {
+                "type": "json_schema",
+                "json_schema": {
+                    "name": name,
+                    "schema": strict_json_schema(schema),
+                    "strict": True,
+                },
+            }
+        }
+
+    def choice_args(self, choices, token_ids=None):
+        """Request arguments restricting a one-token completion to `choices`."""
+        if not token_ids:
+            return {}
+        return {"logit_bias": {str(token_id): 100 for token_id in token_ids}}
+
 
 class OpenAIChatModel(ChatModel):
+    provider = "openai"
+    guarantees_schema = True  # Strict json_schema response format
+
     def __init__(self, name, proxies=None, api_key=None, **args):
         proxies = proxies or ENDPOINT_PROXIES["openai"]
         api_key = api_key or os.getenv("OPENAI_API_KEY")
@@ -55,28 +130,96 @@ class OpenAIChatModel(ChatModel):
 
 
 class DeepSeekChatModel(ChatModel):
+    provider = "deepseek"
+    guarantees_schema = False  # JSON mode only; the schema is not enforced
+
     def __init__(self, name, proxies=None, api_key=None, **args):
         proxies = proxies or ENDPOINT_PROXIES["deepseek"]
         api_key = api_key or os.getenv("DEEPSEEK_API_KEY")
         super().__init__(name, proxies, api_key, **args)
 
+    def structured_output_args(self, schema, name="output"):
+        """DeepSeek supports JSON mode; the prompt must describe the schema."""
+        return {"response_format": {"type": "json_object"}}
+
 
 class LocalChatModel(ChatModel):
+    provider = "local"
+    guarantees_schema = True  # vLLM guided decoding
+
     def __init__(self, name, proxies=None, api_key=None, **args):
         proxies = proxies or ENDPOINT_PROXIES["local"]
         super().__init__(name, proxies, api_key, **args)
 
+    def structured_output_args(self, schema, name="output"):
+        """Guided decoding on vLLM, which accepts the full JSON schema."""
+        return {"guided_json": schema}
+
+    def choice_args(self, choices, token_ids=None):
+        return {"guided_choice": list(choices)}
+
 
 class ChatClient():
-    def __init__(self, timeout=120.0):
-        self.backoff = 0.0
+    def __init__(
+        self,
+        timeout=120.0,
+        limiters=None,
+        cache=None,
+        metrics=None,
+        balancer=None,
+        idle_timeout=30.0,
+        concurrency=None,
+        hedging=None,
+        tracer=None,
+    ):
+        self.timeout = timeout
+        # Longest silence allowed between streamed chunks.
+        self.idle_timeout = idle_timeout
         client_timeout = httpx.Timeout(timeout, connect=10.0)
         self.client = httpx.AsyncClient(http2=True, timeout=client_timeout)
 
+        # Adaptive rate limiters, one per (provider, model, endpoint).
+        self.limiters = limiters or RateLimiterRegistry()
+
+        # Optional statements.cache.ResponseCache consulted before each call.
+        self.cache = cache
+
+        # Token, latency and error metrics shared with the Extractor.
+        self.metrics = metrics or Metrics()
+
+        # Endpoint selection with health tracking (see statements.balancer).
+        self.balancer = balancer or PowerOfTwoBalancer()
+
+        # Optional statements.concurrency.AdaptiveConcurrency bounding the
+        # requests in flight.
+        self.concurrency = concurrency
+
+        # Optional statements.hedging.HedgePolicy for backup requests to
+        # another endpoint when a request is slow.
+        self.hedging = hedging
+
+        # Optional statements.tracing.Tracer timing each request's stages.
+        self.tracer = tracer or NULL_TRACER
+
+    @property
+    def backoff(self):
+        """Deprecated: the largest backoff of the per-endpoint rate limiters."""
+        warnings.warn(
+            "ChatClient.backoff is deprecated; backoff is kept per endpoint in "
+            "ChatClient.limiters.", DeprecationWarning, stacklevel=2)
+        return max((limiter.backoff for limiter in self.limiters.limiters.values()), default=0.0)
+
+    @backoff.setter
+    def backoff(self, backoff):
+        self.set_backoff(backoff)
+
     def set_backoff(self, backoff):
-        self.backoff = backoff
-        self.backoff = max(0.0, self.backoff)
-        self.backoff = min(32.0, self.backoff)
+        """Deprecated: set the backoff of every per-endpoint rate limiter."""
+        warnings.warn(
+            "ChatClient.set_backoff is deprecated; backoff is kept per endpoint in "
+            "ChatClient.limiters.", DeprecationWarning, stacklevel=2)
+        for limiter in self.limiters.limiters.values():
+            limiter.set_backoff(backoff)
 
     async def chat_completions(
         self,
@@ -84,100 +227,383 @@ class ChatClient():
         context=None,
         model=None,
         debug=False,
+        args=None,
+        stream=False,
+        stop_when=None,
+        endpoint=None,
     ):
+        """
+        Send a chat completion request and return the response JSON.
+
+        `args` replaces `model.args` for this request, e.g. to add structured
+        output arguments. With `stream=True` the completion is streamed (see
+        `stream_chat`) and `stop_when(text)` may end it early. The endpoint
+        is picked by the balancer unless given, and with a hedging policy
+        slow requests are hedged (see `hedged_completions`). With
+        `debug="usage"`, the token usage of every response is logged at
+        INFO level on this module's logger.
+        """
+        if self.hedging and endpoint is None and isinstance(model, ChatModel) \
+                and len(set(model.proxies)) > 1:
+            return await self.hedged_completions(
+                message, context, model, debug, args, stream, stop_when)
+
         completion = None
         res = None
-
-        try:
-            if not isinstance(model, ChatModel):
-                raise ValueError("Chat Model must be specified.")
-
-            if self.backoff > 1.0:
-                print(f"Calling LLM with backoff: {self.backoff} seconds.")
-            time.sleep(self.backoff + random.random() * 0.3)
-
-            messages = context or []
-            if message:  # If a string prompt message is provided by the user
-                messages.append({"role": "user", "content": message})
-
-            if not messages:
-                raise ValueError("No prompt messages provided")
-
-            completion = await self.client.post(
-                f"{random.choice(model.proxies)}/v1/chat/completions",
-                json={
+        limiter = None
+
+        with self.tracer.span("chat_completion", model=getattr(model, "name", None)) as span:
+            try:
+                if not isinstance(model, ChatModel):
+                    raise ValueError("Chat Model must be specified.")
+
+                messages = context or []
+                if message:  # If a string prompt message is provided by the user
+                    messages.append({"role": "user", "content": message})
+
+                if not messages:
+                    raise ValueError("No prompt messages provided")
+
+                if args is None:
+                    args = model.args
+
+                if self.cache:
+                    cache_key = self.cache.key(model.name, args, messages)
+                    cached = await self.cache.lookup(cache_key)
+                    if cached is not None:
+                        self.metrics.increment("cache_hits")
+                        span.set(cache_hit=True)
+                        return cached
+
+                if endpoint is None:
+                    endpoint = self.balancer.choose(model.proxies)
+                span.set(endpoint=endpoint, stream=stream)
+                limiter = self.limiters.get(
+                    model.rate_limit_key(endpoint), rpm=model.rpm, tpm=model.tpm)
+                estimated_tokens = estimate_tokens(messages, args)
+
+                if limiter.backoff > 1.0:
+                    logger.info("Calling LLM with backoff: %s seconds.", limiter.backoff)
+                with self.tracer.span("rate_limit_wait"):
+                    await limiter.acquire(estimated_tokens)
+
+                if self.concurrency:
+                    with self.tracer.span("concurrency_wait"):
+                        await self.concurrency.acquire()
+                    self.metrics.set_gauge("concurrency_limit", self.concurrency.limit)
+                    self.metrics.set_gauge("in_flight", self.concurrency.in_flight)
+
+                self.metrics.increment("requests")
+                self.balancer.on_start(endpoint)
+                body = {
                     "model": model.name,
                     "messages": messages,
-                    **model.args,  # Additional model-specific arguments
-                },
-                headers=model.headers,
-            )
-
-            if completion.status_code == 429:
-                self.set_backoff(self.backoff * 2.0 + 1.0)
-                raise TooManyRequestsException(
-                    "API rate limit exceeded. Retrying after backoff.")
-
-            if completion.status_code != 200:
-                res = completion.json()
-
-                if res.get("error", {}).get("code") == "RequestTimeOut":
-                    self.set_backoff(self.backoff * 2.0 + 1.0)
+                    **args,  # Additional model-specific arguments
+                }
+                started = time.monotonic()
+                try:
+                    with self.tracer.span("http", endpoint=endpoint) as http_span:
+                        if stream:
+                            completion, res = await self.stream_chat(
+                                endpoint, model, body, stop_when)
+                        else:
+                            completion = await self.client.post(
+                                f"{endpoint}/v1/chat/completions",
+                                json=body,
+                                headers=model.headers,
+                            )
+                        http_span.set(status_code=completion.status_code)
+                except httpx.RequestError:
+                    self.balancer.on_failure(endpoint)
+                    if self.concurrency:
+                        self.concurrency.on_failure()
+                    raise
+                except BaseException:
+                    self.balancer.on_cancel(endpoint)
+                    raise
+                finally:
+                    if self.concurrency:
+                        await self.concurrency.release()
+
+                latency = time.monotonic() - started
+                self.metrics.observe("request_latency", latency)
+                if completion.status_code >= 500:
+                    self.balancer.on_failure(endpoint)
+                    if self.concurrency:
+                        self.concurrency.on_failure()
+                elif completion.status_code == 429:
+                    self.balancer.on_cancel(endpoint)  # Throttled, not unhealthy
+                else:
+                    self.balancer.on_success(endpoint, latency)
+
+                if completion.status_code == 429:
+                    self.metrics.increment("rate_limited")
+                    limiter.on_rate_limited(completion.headers)
+                    if self.concurrency:
+                        self.concurrency.on_rate_limited()
                     raise TooManyRequestsException(
                         "API rate limit exceeded. Retrying after backoff.")
 
-                if res.get("error", {}).get("message") == "Content Exists Risk":
-                    raise CensoredResponseException(
-                        "API response content is censored.")
-
-                raise BadResponseException("Unexpected status code.")
-
-            res = completion.json()
-
-            if debug == "usage":
-                print(
-                    f"[DEBUG] Usage: {res.get('usage', 'No usage information found.')}")
-
-            result_content = res.get("choices", [{}])[0] \
-                .get("message", {}) \
-                .get("content", None)
-
-            if not result_content:
+                if completion.status_code != 200:
+                    res = completion.json()
+
+                    if res.get("error", {}).get("code") == "RequestTimeOut":
+                        self.metrics.increment("rate_limited")
+                        limiter.on_rate_limited(completion.headers)
+                        if self.concurrency:
+                            self.concurrency.on_rate_limited()
+                        raise TooManyRequestsException(
+                            "API rate limit exceeded. Retrying after backoff.")
+
+                    if res.get("error", {}).get("message") == "Content Exists Risk":
+                        raise CensoredResponseException(
+                            "API response content is censored.")
+
+                    raise BadResponseException("Unexpected status code.")
+
+                if not stream:
+                    res = completion.json()
+
+                usage = res.get("usage") or {}
+                self.metrics.record_usage(
+                    model.name,
+                    usage.get("prompt_tokens") or 0,
+                    usage.get("completion_tokens") or 0,
+                    cached_tokens(usage),
+                )
+                span.set(
+                    prompt_tokens=usage.get("prompt_tokens"),
+                    completion_tokens=usage.get("completion_tokens"),
+                    cached_tokens=cached_tokens(usage),
+                )
+                if self.concurrency:
+                    self.concurrency.on_success(latency, usage.get("total_tokens"))
+
+                if debug == "usage":
+                    logger.info(
+                        "Usage: %s | Cached prompt tokens: %s",
+                        res.get("usage", "No usage information found."), cached_tokens(usage))
+
+                result_content = res.get("choices", [{}])[0] \
+                    .get("message", {}) \
+                    .get("content", None)
+
+                if not result_content:
+                    raise BadResponseException(
+                        "Missing or malformed content in response.")
+
+                limiter.on_success(completion.headers)
+                limiter.record_usage(
+                    estimated_tokens, usage.get("total_tokens"))
+
+                # An early-stopped stream is cut short of the full completion.
+                if self.cache and res["choices"][0].get("finish_reason") != "early_stop":
+                    await self.cache.store(cache_key, model.name, res)
+                return res
+
+            except TooManyRequestsException as err:
+                raise BadResponseException(
+                    f"TooManyRequestsException: {str(err)} | Current backoff: {limiter.backoff} seconds."
+                ) from err
+            except httpx.RequestError as err:
+                raise BadResponseException(
+                    f"HTTPX RequestError: {str(err)} | Possible network issues or misconfiguration."
+                ) from err
+            except json.JSONDecodeError as err:
                 raise BadResponseException(
-                    "Missing or malformed content in response.")
-
-            self.set_backoff(self.backoff / 2.0 - 1.0)
-            return res
-
-        except TooManyRequestsException as err:
-            raise BadResponseException(
-                f"TooManyRequestsException: {str(err)} | Current backoff: {self.backoff} seconds."
-            ) from err
-        except httpx.RequestError as err:
-            raise BadResponseException(
-                f"HTTPX RequestError: {str(err)} | Possible network issues or misconfiguration."
-            ) from err
-        except json.JSONDecodeError as err:
-            raise BadResponseException(
-                f"JSON Decode Error: {str(err)} | {debug_context(completion, res)}"
-            ) from err
-        except ValueError as err:
-            raise BadResponseException(
-                f"ValueError: {str(err)} | {debug_context(completion, res)}"
-            ) from err
-        except KeyError as err:
-            raise BadResponseException(
-                f"KeyError: {str(err)} | {debug_context(completion, res)}"
-            ) from err
-        except CensoredResponseException as err:
-            raise CensoredResponseException(
-                f"CensoredResponseException: {str(err)} | {debug_context(completion, res)}"
-            ) from err
-        except Exception as err:
-            raise BadResponseException(
-                f"Unexpected Error: {str(err)} | {debug_context(completion, res)}"
-            ) from err
+                    f"JSON Decode Error: {str(err)} | {debug_context(completion, res)}"
+                ) from err
+            except ValueError as err:
+                raise BadResponseException(
+                    f"ValueError: {str(err)} | {debug_context(completion, res)}"
+                ) from err
+            except KeyError as err:
+                raise BadResponseException(
+                    f"KeyError: {str(err)} | {debug_context(completion, res)}"
+                ) from err
+            except CensoredResponseException as err:
+                raise CensoredResponseException(
+                    f"CensoredResponseException: {str(err)} | {debug_context(completion, res)}"
+                ) from err
+            except Exception as err:
+                raise BadResponseException(
+                    f"Unexpected Error: {str(err)} | {debug_context(completion, res)}"
+                ) from err
+
+    async def hedged_completions(self, message, context, model, debug, args, stream, stop_when):
+        """
+        Send a request, and a backup to another endpoint if it is slow.
+
+        The backup is sent once the request has run longer than the
+        policy's latency percentile, if the hedge rate cap allows it. The
+        first successful response wins and the other request is cancelled.
+        The tokens the loser spent are counted in `hedge_duplicate_tokens`:
+        its usage if it completed, or its estimated size if it was cancelled,
+        since a cancelled request may still be billed.
+        """
+        def attempt(endpoint):
+            return asyncio.ensure_future(self.chat_completions(
+                message=message, context=list(context or []), model=model,
+                debug=debug, args=args, stream=stream, stop_when=stop_when,
+                endpoint=endpoint))
+
+        delay = self.hedging.delay(self.metrics)
+        first = self.balancer.choose(model.proxies)
+        primary = attempt(first)
+        if delay is None:
+            return await primary
+
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=delay)
+        except BaseException:
+            primary.cancel()
+            raise
+        if done or not self.hedging.allow():
+            return await primary
+
+        self.metrics.increment("hedged_requests")
+        backup = attempt(self.balancer.choose(model.proxies, exclude=(first,)))
+        tasks = {primary, backup}
+        pending = set(tasks)
+        winner = None
+        try:
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        winner = task
+                        break
+                    error = task.exception()
+                if winner:
+                    break
+            if winner is None:
+                raise error
+
+            if winner is backup:
+                self.metrics.increment("hedge_wins")
+            return winner.result()
+
+        finally:
+            for task in tasks - {winner}:
+                if not task.done():
+                    task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+            if winner is not None:
+                loser = (tasks - {winner}).pop()
+                if loser.cancelled():
+                    messages = list(context or []) + (
+                        [{"role": "user", "content": message}] if message else [])
+                    spent = estimate_tokens(messages, model.args if args is None else args)
+                elif loser.exception() is None:
+                    spent = (loser.result().get("usage") or {}).get("total_tokens") or 0
+                else:
+                    spent = 0  # Failed requests are not billed
+                self.metrics.increment("hedge_duplicate_tokens", spent)
+
+    async def stream_chat(self, endpoint, model, body, stop_when=None):
+        """
+        Stream a chat completion over SSE and assemble a regular response JSON.
+
+        The read timeout applies between chunks, so long generations only
+        fail when the server goes silent for `idle_timeout` seconds. The time
+        to the first token and the gaps between tokens are recorded in the
+        metrics. Each time a line of content completes, `stop_when(text)` is
+        called with the content so far; when it returns True the stream is
+        closed, which stops the generation, and the finish reason is
+        "early_stop". Usage is then estimated, since providers only send it
+        in the last chunk.
+
+        Returns:
+            tuple: The httpx response and the assembled response JSON, which
+            is None when the status code is not 200 (the body is read).
+        """
+        body = {**body, "stream": True, "stream_options": {"include_usage": True}}
+        timeout = httpx.Timeout(self.timeout, connect=10.0, read=self.idle_timeout)
+
+        started = time.monotonic()
+        async with self.client.stream(
+            "POST",
+            f"{endpoint}/v1/chat/completions",
+            json=body,
+            headers=model.headers,
+            timeout=timeout,
+        ) as completion:
+            if completion.status_code != 200:
+                await completion.aread()
+                return completion, None
+
+            content = []
+            reasoning = []
+            logprobs = []
+            first = None
+            last = None
+            finish_reason = None
+            usage = None
+            res = {}
+
+            async for data in iter_sse_data(completion):
+                chunk = json.loads(data)
+                if not res:
+                    res = {key: chunk.get(key) for key in ("id", "created", "model")}
+                usage = chunk.get("usage") or usage
+
+                for choice in chunk.get("choices") or []:
+                    finish_reason = choice.get("finish_reason") or finish_reason
+                    logprobs.extend((choice.get("logprobs") or {}).get("content") or [])
+                    delta = choice.get("delta") or {}
+                    text = delta.get("content")
+                    thought = delta.get("reasoning_content")  # DeepSeek reasoner
+                    if not text and not thought:
+                        continue
+
+                    now = time.monotonic()
+                    if first is None:
+                        first = now
+                        self.metrics.observe("time_to_first_token", now - started)
+                    else:
+                        self.metrics.observe(
+                            "inter_token_latency", now - last, TOKEN_LATENCY_BUCKETS)
+                    last = now
+
+                    if thought:
+                        reasoning.append(thought)
+                    if text:
+                        content.append(text)
+                        if stop_when and "\n" in text and stop_when("".join(content)):
+                            finish_reason = "early_stop"
+
+                if finish_reason == "early_stop":
+                    self.metrics.increment("early_stops")
+                    break
+
+        message = {"role": "assistant", "content": "".join(content)}
+        if reasoning:
+            message["reasoning_content"] = "".join(reasoning)
+
+        if usage is None:
+            prompt_tokens = estimate_tokens(body["messages"])
+            completion_tokens = (len(message["content"]) + len("".join(reasoning))) // 4
+            usage = {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+                "estimated": True,
+            }
+
+        choice = {"index": 0, "message": message, "finish_reason": finish_reason}
+        if logprobs:
+            choice["logprobs"] = {"content": logprobs}
+        res.update({
+            "object": "chat.completion",
+            "choices": [choice],
+            "usage": usage,
+        })
+        return completion, res
 
     async def close(self):
         """Close httpx client"""
         await self.client.aclose()
+        if self.cache:
+            self.cache.close()
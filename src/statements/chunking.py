@@ -0,0 +1,119 @@
+from statements.utils import text_chunks, text_chunks_by_lines
+
+
+class Chunker:
+    """
+    Split a record whose text is longer than the context budget into chunk records.
+
+    Each chunk record is a copy of the record with `text_key` replaced by one
+    chunk of the text, and with `chunk_index` and `num_chunks` set. Records
+    that fit in one chunk are returned unchanged.
+    """
+
+    def __init__(self, encoder, text_key="text", tokens_per_chunk=4096, overlap=256, by_lines=False):
+        self.encoder = encoder
+        self.text_key = text_key
+        self.tokens_per_chunk = tokens_per_chunk
+        self.overlap = overlap
+        self.by_lines = by_lines
+
+    def split(self, item):
+        text = item.get(self.text_key)
+        if not isinstance(text, str):
+            return [item]
+
+        if self.by_lines:
+            chunks = text_chunks_by_lines(text, self.encoder, self.tokens_per_chunk, self.overlap)
+        else:
+            chunks = text_chunks(text, self.encoder, self.tokens_per_chunk, self.overlap)
+        if len(chunks) <= 1:
+            return [item]
+
+        return [
+            {**item, self.text_key: chunk, "chunk_index": i, "num_chunks": len(chunks)}
+            for i, chunk in enumerate(chunks)
+        ]
+
+
+# Field reducers: each merges the values of one field across the chunk
+# outputs, given in chunk order, and skips chunks where it is missing.
+
+def first(values):
+    return values[0]
+
+
+def concat_lists(values):
+    return [element for value in values for element in (value or [])]
+
+
+def join_text(separator="\n\n"):
+    def reduce(values):
+        return separator.join(str(value) for value in values if value)
+    return reduce
+
+
+def mean_scores(values):
+    """Average dicts of numbers key by key."""
+    keys = dict.fromkeys(key for value in values for key in value)
+    return {
+        key: sum(value[key] for value in values if value.get(key) is not None)
+        / max(1, sum(1 for value in values if value.get(key) is not None))
+        for key in keys
+    }
+
+
+def mean_probabilities(values):
+    """Average probability dicts and renormalize them to sum to one."""
+    scores = mean_scores(values)
+    total = sum(scores.values())
+    return {key: score / total for key, score in scores.items()} if total else scores
+
+
+def majority(values):
+    """Most frequent value, ties going to the earliest chunk."""
+    counts = {}
+    for value in values:
+        counts[value] = counts.get(value, 0) + 1
+    return max(counts, key=lambda value: (counts[value], -values.index(value)))
+
+
+class FieldReducer:
+    """
+    Merge the parsed outputs of a record's chunks into one output.
+
+    Args:
+        fields (dict): Maps a field name to the reducer of its values.
+        default (callable): Reducer of the fields not in `fields`.
+        finalize (callable): Optional function of the merged output returning
+            the final one, e.g. to derive the label from averaged scores.
+    """
+
+    def __init__(self, fields=None, default=first, finalize=None):
+        self.fields = fields or {}
+        self.default = default
+        self.finalize = finalize
+
+    def __call__(self, outputs):
+        if len(outputs) == 1:
+            return outputs[0]
+
+        merged = {}
+        for output in outputs:
+            for name in output:
+                if name not in merged:
+                    values = [o[name] for o in outputs if name in o]
+                    merged[name] = self.fields.get(name, self.default)(values)
+
+        if self.finalize:
+            merged = self.finalize(merged)
+        return merged
+
+
+def label_from_scores(scores_field, label_field="label", format_label=str.lower):
+    """Finalizer setting the label to the highest scoring key of `scores_field`."""
+    def finalize(output):
+        scores = output.get(scores_field)
+        if scores:
+            output[label_field] = format_label(max(scores, key=scores.get))
+        return output
+    return finalize
@@ -0,0 +1,140 @@
+import string
+
+import numpy as np
+
+
+def softmax(logits, axis=-1):
+    """Numerically stable softmax over `axis` of an array of logits."""
+    logits = np.asarray(logits, dtype=np.float64)
+    shifted = logits - logits.max(axis=axis, keepdims=True)
+    exp = np.exp(shifted)
+    return exp / exp.sum(axis=axis, keepdims=True)
+
+
+class LabelClassifier:
+    """
+    Classify a record from the log probabilities of a single label token.
+
+    Each label is given a short answer key ("A", "B", ... by default) that
+    is a single token for common tokenizers. The model is asked for the key
+    with `logprobs` and `top_logprobs`, and the log probabilities of the keys
+    at the answer position become the logit scores. Their softmax over the
+    label set gives the probabilities, so nothing but the key (and optional
+    reasoning) is generated.
+
+    With `reasoning=False` only one token is generated and the prompt must
+    ask for the key alone; the completion is constrained to the keys where
+    the backend allows it (vLLM guided choice, or `logit_bias` when an
+    `encoder` gives the key token ids), and a ValueError is raised by
+    `request_args` for models where it cannot be. With `reasoning=True` the model may
+    explain first and the answer is the token after the last
+    `answer_marker`; the text before it is returned as the reasoning, which
+    is empty otherwise.
+
+    Keys missing from the top log probabilities get the lowest log
+    probability seen there, an upper bound on their real value.
+    """
+
+    def __init__(
+        self,
+        labels,
+        keys=None,
+        label_values=None,
+        reasoning=False,
+        answer_marker="Answer:",
+        top_logprobs=20,
+        encoder=None,
+    ):
+        self.labels = list(labels)
+        self.keys = list(keys or string.ascii_uppercase[:len(self.labels)])
+        # Values of the "label" field, defaults to the labels themselves.
+        self.label_values = list(label_values or self.labels)
+        if not len(self.labels) == len(self.keys) == len(self.label_values):
+            raise ValueError("Labels, keys and label values must have the same length.")
+
+        self.reasoning = reasoning
+        self.answer_marker = answer_marker
+        self.top_logprobs = top_logprobs
+
+        self.token_ids = None
+        if encoder is not None:
+            self.token_ids = []
+            for key in self.keys:
+                tokens = encoder.encode(key)
+                if len(tokens) != 1:
+                    raise ValueError(f"Answer key {key!r} is not a single token.")
+                self.token_ids.append(tokens[0])
+
+    def options(self):
+        """The answer keys and labels as lines for a prompt, e.g. "A: Left"."""
+        return "\n".join(f"{key}: {label}" for key, label in zip(self.keys, self.labels))
+
+    def request_args(self, model):
+        """Request arguments asking `model` for the log probabilities of the answer."""
+        args = {"logprobs": True, "top_logprobs": self.top_logprobs}
+        if not self.reasoning:
+            choice_args = model.choice_args(self.keys, self.token_ids)
+            if not choice_args:
+                # An unconstrained single token is rarely one of the keys.
+                raise ValueError(
+                    f"Classifying without reasoning on {model.name} needs an encoder "
+                    "to restrict the answer to the keys.")
+            args["max_tokens"] = 1
+            args.update(choice_args)
+        return args
+
+    def answer_position(self, content):
+        """Index of the answer token in the logprobs content, or None."""
+        if not self.reasoning:
+            return 0 if content else None
+
+        position = None
+        text = ""
+        for i, entry in enumerate(content):
+            token = entry.get("token") or ""
+            if token.strip() and text.rstrip().endswith(self.answer_marker):
+                position = i
+            text += token
+        return position
+
+    def logprobs(self, entry):
+        """Log probabilities of the answer keys at one position, as an array."""
+        candidates = entry.get("top_logprobs") or [entry]
+        values = np.full(len(self.keys), -np.inf)
+        index = {key: i for i, key in enumerate(self.keys)}
+        for candidate in candidates:
+            i = index.get((candidate.get("token") or "").strip())
+            if i is not None:
+                # Variants such as "A" and " A" are the same answer.
+                values[i] = np.logaddexp(values[i], candidate["logprob"])
+
+        if np.isneginf(values).all():
+            raise ValueError(
+                f"No answer key among the top tokens: {[c.get('token') for c in candidates]}")
+        floor = min(c["logprob"] for c in candidates)
+        return np.where(np.isneginf(values), floor, values)
+
+    def parse(self, res_json):
+        """Turn a chat completion with logprobs into logit scores, probabilities and a label."""
+        choice = res_json["choices"][0]
+        content = (choice.get("logprobs") or {}).get("content")
+        if not content:
+            raise ValueError("The response has no logprobs.")
+
+        position = self.answer_position(content)
+        if position is None:
+            raise ValueError(f"No answer after {self.answer_marker!r} in the response.")
+
+        logits = self.logprobs(content[position])
+        probabilities = softmax(logits)
+        result = {
+            "logit_scores": dict(zip(self.labels, logits.tolist())),
+            "softmax_probabilities": dict(zip(self.labels, probabilities.tolist())),
+            "label": self.label_values[int(probabilities.argmax())],
+            "reasoning": "",
+        }
+
+        if self.reasoning:
+            text = choice["message"].get("content") or ""
+            result["reasoning"] = text[:text.rfind(self.answer_marker)].strip()
+        return result
@@ -0,0 +1,128 @@
+import time
+import asyncio
+
+
+class AdaptiveConcurrency:
+    """
+    AIMD limit on the number of requests in flight.
+
+    The limit grows by `increase` per window of successful requests (about
+    one round trip), and shrinks by `decrease` when the latency EWMA rises
+    above `tolerance` times the baseline latency, or by `throttle_decrease`
+    on a 429 or a failed request. Decreases happen at most once per
+    round trip, so one burst of errors does not collapse the limit.
+
+    The baseline is the lowest latency seen, drifting slowly upwards so it
+    follows lasting changes in the output length. With `rpm` or `tpm`, the
+    limit is also capped by Little's law at the concurrency that spends the
+    budget at the observed latency and tokens per request.
+    """
+
+    def __init__(
+        self,
+        min_limit=1,
+        max_limit=64,
+        initial=None,
+        increase=1.0,
+        decrease=0.9,
+        throttle_decrease=0.5,
+        tolerance=2.0,
+        alpha=0.1,
+        drift=0.01,
+        rpm=None,
+        tpm=None,
+    ):
+        if not 1 <= min_limit <= max_limit:
+            raise ValueError("Concurrency bounds must satisfy 1 <= min_limit <= max_limit.")
+
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.limit = float(min(max_limit, max(min_limit, initial or min_limit)))
+        self.increase = increase
+        self.decrease = decrease
+        self.throttle_decrease = throttle_decrease
+        self.tolerance = tolerance
+        self.alpha = alpha
+        self.drift = drift
+        self.rpm = rpm
+        self.tpm = tpm
+
+        self.in_flight = 0
+        self.latency = None  # EWMA of request latency in seconds
+        self.baseline = None  # Lowest latency seen, with upward drift
+        self.tokens = None  # EWMA of tokens per request
+        self.last_decrease = 0.0
+        self.condition = None  # Created in the running loop
+
+    def slots(self):
+        return max(1, int(self.limit))
+
+    async def acquire(self):
+        """Wait until a request may be sent under the current limit."""
+        if self.condition is None:
+            self.condition = asyncio.Condition()
+        async with self.condition:
+            await self.condition.wait_for(lambda: self.in_flight < self.slots())
+            self.in_flight += 1
+
+    async def release(self):
+        self.in_flight = max(0, self.in_flight - 1)
+        async with self.condition:
+            self.condition.notify_all()
+
+    def on_success(self, latency, tokens=None):
+        if self.latency is None:
+            self.latency = self.baseline = latency
+        else:
+            self.latency += self.alpha * (latency - self.latency)
+            if latency < self.baseline:
+                self.baseline = latency
+            else:
+                self.baseline += self.drift * (latency - self.baseline)
+        if tokens:
+            self.tokens = tokens if self.tokens is None \
+                else self.tokens + self.alpha * (tokens - self.tokens)
+
+        if self.latency > self.tolerance * self.baseline:
+            self.shrink(self.decrease)
+        else:
+            self.set_limit(self.limit + self.increase / self.limit)
+
+    def on_rate_limited(self):
+        self.shrink(self.throttle_decrease)
+
+    def on_failure(self):
+        self.shrink(self.throttle_decrease)
+
+    def shrink(self, factor):
+        now = time.monotonic()
+        if now - self.last_decrease < (self.latency or 0.0):
+            return
+        self.last_decrease = now
+        self.set_limit(self.limit * factor)
+
+    def budget_limit(self):
+        """Concurrency that spends the rpm and tpm budgets at the observed latency."""
+        if self.latency is None:
+            return None
+        caps = []
+        if self.rpm:
+            caps.append(self.rpm / 60.0 * self.latency)
+        if self.tpm and self.tokens:
+            caps.append(self.tpm / 60.0 / self.tokens * self.latency)
+        return min(caps) if caps else None
+
+    def set_limit(self, limit):
+        budget = self.budget_limit()
+        if budget is not None:
+            limit = min(limit, max(budget, 1.0))
+        self.limit = min(float(self.max_limit), max(float(self.min_limit), limit))
+
+    def snapshot(self):
+        return {
+            "limit": self.limit,
+            "in_flight": self.in_flight,
+            "latency_ewma": self.latency,
+            "latency_baseline": self.baseline,
+            "tokens_ewma": self.tokens,
+        }
@@ -0,0 +1,165 @@
+import os
+import json
+import asyncio
+
+from statements.sharding import shard_of
+
+
+FORMATS = {
+    ".csv": "csv",
+    ".jsonl": "jsonl",
+    ".ndjson": "jsonl",
+    ".parquet": "parquet",
+    ".pq": "parquet",
+}
+
+
+class RecordReader:
+    """
+    Chunked reader that streams records from CSV, JSONL or Parquet files.
+
+    Only one chunk of `chunksize` rows is held in memory at a time. The reader
+    can be iterated synchronously, or asynchronously in which case each chunk
+    is read in a worker thread so the event loop is never blocked on disk.
+    """
+
+    def __init__(
+        self,
+        path,
+        file_format=None,
+        chunksize=1000,
+        start=0,
+        end=None,
+        transform=None,
+        shard=None,
+        id_key="id",
+        **read_args
+    ):
+        if file_format is None:
+            extension = os.path.splitext(path)[1].lower()
+            file_format = FORMATS.get(extension)
+        if file_format not in ("csv", "jsonl", "parquet"):
+            raise ValueError(f"Unsupported file format for {path}.")
+        if start < 0 or (end is not None and end < start):
+            raise ValueError("Invalid start or end index for the dataset.")
+
+        self.path = path
+        self.file_format = file_format
+        self.chunksize = chunksize
+        self.start = start
+        self.end = end
+        self.transform = transform  # Optional per-record preprocessing
+        self.shard = shard  # Optional (index, count) of the shard to keep
+        self.id_key = id_key
+        self.read_args = read_args
+
+    def read_chunks(self):
+        """Yield raw chunks of records as lists of dicts."""
+        if self.file_format == "csv":
+            import pandas as pd
+
+            reader = pd.read_csv(
+                self.path, encoding="utf-8", chunksize=self.chunksize, **self.read_args)
+            with reader:
+                for chunk in reader:
+                    yield chunk.to_dict("records")
+
+        elif self.file_format == "parquet":
+            import pyarrow.parquet as pq
+
+            parquet_file = pq.ParquetFile(self.path)
+            for batch in parquet_file.iter_batches(
+                    batch_size=self.chunksize, **self.read_args):
+                yield batch.to_pylist()
+
+        else:
+            chunk = []
+            with open(self.path, "r", encoding="utf-8") as file:
+                for line in file:
+                    if not line.strip():
+                        continue
+                    chunk.append(json.loads(line))
+                    if len(chunk) >= self.chunksize:
+                        yield chunk
+                        chunk = []
+            if chunk:
+                yield chunk
+
+    def iter_chunks(self):
+        """Yield chunks restricted to the [start, end) window and shard, and transformed."""
+        position = 0
+        for chunk in self.read_chunks():
+            chunk_start = position
+            position += len(chunk)
+            if position <= self.start:
+                continue
+
+            chunk = chunk[max(0, self.start - chunk_start):]
+            if self.end is not None:
+                chunk = chunk[:max(0, self.end - max(chunk_start, self.start))]
+            if self.shard is not None:
+                # Before the transform, so each process only prepares its own records.
+                index, count = self.shard
+                chunk = [r for r in chunk if shard_of(r[self.id_key], count) == index]
+            if self.transform:
+                chunk = [self.transform(record) for record in chunk]
+            if chunk:
+                yield chunk
+
+            if self.end is not None and position >= self.end:
+                break
+
+    def __iter__(self):
+        for chunk in self.iter_chunks():
+            yield from chunk
+
+    async def __aiter__(self):
+        loop = asyncio.get_running_loop()
+        chunks = self.iter_chunks()
+        while True:
+            chunk = await loop.run_in_executor(None, next, chunks, None)
+            if chunk is None:
+                break
+            for record in chunk:
+                yield record
+
+
+def read_records(
+    path,
+    file_format=None,
+    chunksize=1000,
+    start=0,
+    end=None,
+    transform=None,
+    shard=None,
+    id_key="id",
+    **read_args
+):
+    """
+    Stream records from a CSV, JSONL or Parquet file.
+
+    Args:
+        path (str): The file to read. The format is inferred from the extension.
+        file_format (str): Override the format ("csv", "jsonl" or "parquet").
+        chunksize (int): The number of rows read from disk at a time.
+        start (int): Index of the first record to yield.
+        end (int): Index after the last record to yield, or None to read to the end.
+        transform (callable): Optional function applied to every record.
+        shard (tuple): Optional (index, count) keeping only the records whose
+            `id_key` hashes to shard `index` of `count` (see `statements.sharding`).
+        id_key (str): The record key holding the doc id.
+
+    Returns:
+        RecordReader: An iterable and async iterable of record dicts.
+    """
+    return RecordReader(
+        path,
+        file_format=file_format,
+        chunksize=chunksize,
+        start=start,
+        end=end,
+        transform=transform,
+        shard=shard,
+        id_key=id_key,
+        **read_args
+    )
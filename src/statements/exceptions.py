@@ -8,3 +8,11 @@ class BadResponseException(Exception):
 
 class CensoredResponseException(Exception):
     "Raised when the api returns with a censored response"
+
+
+class MarkdownParseException(ValueError):
+    "Raised when fields of a markdown output are missing or malformed"
+
+    def __init__(self, message, fields=None):
+        super().__init__(message)
+        self.fields = fields or []
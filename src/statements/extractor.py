@@ -1,9 +1,18 @@
+import os
+import json
+import time
 import asyncio
 
 from tqdm import tqdm
 
 from statements.chat_client import ChatClient
+from statements.concurrency import AdaptiveConcurrency
+from statements.batch import BatchClient, batch_request, read_batch_state, write_batch_state
+from statements.metrics import export_periodically
 from statements.exceptions import CensoredResponseException
+from statements.postprocess import PostProcessor, parse_response
+from statements.chunking import FieldReducer
+from statements.tracing import NULL_TRACER
 
 
 class Extractor:
@@ -15,56 +24,335 @@ class Extractor:
         output_parser,
         num_workers=8,
         client=None,
-        debug=None
+        debug=None,
+        queue_size=None,
+        sink=None,
+        resume=False,
+        id_key="id",
+        metrics_dir=None,
+        metrics_interval=30.0,
+        structured_output=False,
+        stream=False,
+        classifier=None,
+        min_workers=None,
+        max_workers=None,
+        postprocess=None,
+        postprocess_workers=None,
+        chunker=None,
+        reducer=None,
+        tracer=None,
+        profiler=None,
+        message_log=None
     ):
         """
         Initializes the Extractor with the model, prompt template, parser.
+
+        The dataset may be indexable (`__len__` and `__getitem__`), or any
+        iterable or async iterable of records such as
+        `statements.datasets.read_records`. Records are streamed through a
+        bounded queue of `queue_size` entries, so ingestion applies
+        backpressure instead of loading the whole dataset up front.
+
+        When a `sink` from `statements.sinks` is given, every completed record
+        is appended to it as soon as it is collated; its fsyncs and commits
+        run on the sink's own thread, off the event loop. With `resume=True`, the
+        records already in the sink are restored into the parser and their
+        ids (read from `item[id_key]`) are skipped.
+
+        Metrics are collected in the client's `statements.metrics.Metrics`.
+        With a `metrics_dir`, a JSON snapshot and a Prometheus text file are
+        written there every `metrics_interval` seconds.
+
+        With `structured_output=True`, requests carry the model's structured
+        output arguments built from `output_parser.schema` (a JSON schema
+        `response_format`, or guided decoding on vLLM). Responses are then
+        loaded as JSON instead of going through `output_parser.parse`, and are
+        still validated against the schema.
+
+        With `stream=True`, completions are streamed with an idle timeout
+        instead of a total one. If the parser has an `is_complete(text)`
+        method, the stream is stopped as soon as it returns True, saving the
+        output tokens generated after the last required field.
+
+        With a `classifier` from `statements.classification`, the label is
+        read from the log probabilities of the answer token instead of being
+        parsed from the output; its result is validated and collated as
+        usual.
+
+        With `max_workers`, that many workers are started and the number of
+        requests in flight adapts between `min_workers` (default 1) and
+        `max_workers`, starting from `num_workers`, following latency, 429s
+        and the model's rpm and tpm budgets (see
+        `statements.concurrency.AdaptiveConcurrency`).
+
+        With `postprocess="thread"` or `"process"`, parsing and validation
+        run in an executor pool of `postprocess_workers` (see
+        `statements.postprocess.PostProcessor`) so the event loop keeps
+        reading responses meanwhile. Collation stays on the loop: records are
+        written to the sink as they complete, and the parser's results and
+        messages are put back in dataset order at the end of the run.
+
+        With a `chunker` from `statements.chunking`, records longer than its
+        token budget are split and every chunk is sent as its own request,
+        concurrently, with at most `num_workers` requests in flight overall.
+        The parsed chunk outputs are merged by `reducer`, a callable taking
+        them in chunk order (e.g. `statements.chunking.FieldReducer`), before
+        collation; the logged input and output are then lists per chunk.
+
+        With a `tracer` from `statements.tracing`, every record is traced
+        with spans for its queue wait, each attempt, prompt formatting, the
+        request stages in the client (which gets the tracer unless it has
+        one), parsing, validation and collation. A time breakdown by stage
+        is printed after the run, and the spans can be exported with the
+        tracer's `export_chrome` or `export_otlp`. Without a tracer, spans
+        are no-ops. A `statements.tracing.SamplingProfiler` given as
+        `profiler` samples the event loop while the workers run.
+
+        With a `statements.message_log.MessageLog`, the logged messages are
+        compacted before collation, so the parser and the sink keep each
+        template's system message once instead of once per record, and
+        every collated entry is appended to the compressed log, from which
+        it can be expanded back. The sink rows then refer to templates whose
+        text is only in the log, so the two files must be kept together.
         """
         self.model = model
         self.dataset = dataset
         self.prompt_template = prompt_template
         self.parser = output_parser
 
+        self.client = client or ChatClient()
+        if max_workers:
+            if self.client.concurrency is None:
+                self.client.concurrency = AdaptiveConcurrency(
+                    min_limit=min_workers or 1,
+                    max_limit=max_workers,
+                    initial=num_workers,
+                    rpm=model.rpm,
+                    tpm=model.tpm,
+                )
+            num_workers = max_workers
+
         self.num_workers = num_workers
+        self.queue_size = queue_size or num_workers * 2
         self.queue = None
         self.pbar = None
 
-        self.client = client or ChatClient()
+        self.metrics = self.client.metrics
+        self.tracer = tracer or NULL_TRACER
+        if tracer is not None and not self.client.tracer.enabled:
+            self.client.tracer = tracer
+        self.profiler = profiler
         self.debug = debug
-        
+        self.metrics_dir = metrics_dir
+        self.metrics_interval = metrics_interval
+
+        self.sink = sink
+        self.message_log = message_log
+        self.resume = resume
+        self.id_key = id_key
+        self.completed_ids = set()
+
+        if structured_output and classifier:
+            raise ValueError("Structured outputs and classifiers cannot be combined.")
+
+        self.structured_output = structured_output
+        self.classifier = classifier
+        self.request_args = None  # Defaults to model.args
+        self.schema_enforced = structured_output and model.guarantees_schema
+        if structured_output:
+            self.request_args = {
+                **model.args,
+                **model.structured_output_args(output_parser.schema),
+            }
+        elif classifier:
+            self.request_args = {**model.args, **classifier.request_args(model)}
+
+        self.stream = stream
+        self.stop_when = None
+        if stream and not structured_output and not classifier:
+            self.stop_when = getattr(output_parser, "is_complete", None)
+
+        self.chunker = chunker
+        self.reducer = reducer or FieldReducer()
+        self.chunk_slots = None
+
+        self.postprocessor = None
+        self.order = None  # Index and message span of each record collated this run
+        if postprocess:
+            self.postprocessor = PostProcessor(
+                output_parser,
+                kind=postprocess,
+                num_workers=postprocess_workers,
+                structured_output=structured_output,
+                classifier=classifier,
+            )
+
     async def run(self):
         """Spawn workers to extract quotations from the dataset using the LLM model."""
-        # Create an asyncio Queue and add tasks
-        self.queue = asyncio.Queue()
-        len_dataset = len(self.dataset)
-        for idx in range(len_dataset):
-            await self.queue.put((idx, self.dataset[idx]))
+        # Create a bounded asyncio Queue so ingestion waits for the workers.
+        self.queue = asyncio.Queue(maxsize=self.queue_size)
+
+        if self.sink and self.resume:
+            self.restore()
+
+        if self.postprocessor:
+            self.postprocessor.start()
+            self.order = []
+
+        if self.chunker:
+            # Bounds the chunk requests of all workers together.
+            self.chunk_slots = asyncio.Semaphore(self.num_workers)
 
         # Create a shared tqdm progress bar
-        self.pbar = tqdm(total=len_dataset, desc="Processing records", leave=True)
+        total = len(self.dataset) if hasattr(self.dataset, "__len__") else None
+        self.pbar = tqdm(total=total, desc="Processing records", leave=True)
+
+        exporter = None
+        if self.metrics_dir:
+            exporter = asyncio.create_task(export_periodically(
+                self.metrics, self.metrics_dir, self.metrics_interval))
+
+        if self.profiler:
+            self.profiler.start()
 
         # Create worker tasks
         tasks = []
-        for _ in range(self.num_workers):
-            task = asyncio.create_task(self.init_worker())
+        for worker in range(self.num_workers):
+            task = asyncio.create_task(self.init_worker(worker))
             tasks.append(task)
 
-        # Add sentinel values to stop workers.
-        for _ in range(self.num_workers):
-            await self.queue.put(None)
+        # Stream records into the queue while the workers consume them.
+        try:
+            async for idx, item in self.iter_records():
+                if self.completed_ids and item.get(self.id_key) in self.completed_ids:
+                    self.pbar.update(1)  # Completed in a previous run
+                    self.finish(idx, None)
+                    continue
+                await self.queue.put((idx, item, time.perf_counter()))
+                self.metrics.set_gauge("queue_depth", self.queue.qsize())
+        finally:
+            # Add sentinel values to stop workers.
+            for _ in range(self.num_workers):
+                await self.queue.put(None)
 
         # Wait until all tasks are completed.
         await self.queue.join()
+        self.metrics.set_gauge("queue_depth", 0)
         self.pbar.close()
 
         # Wait for all workers to finish.
         await asyncio.gather(*tasks, return_exceptions=True)
 
-    async def init_worker(self):
+        if self.profiler:
+            self.profiler.stop()
+
+        if self.postprocessor:
+            self.postprocessor.shutdown()
+            self.sort_output()
+
+        if self.sink:
+            self.sink.flush()
+
+        if self.message_log:
+            self.message_log.flush(wait=True)
+
+        if exporter:
+            exporter.cancel()
+            await asyncio.gather(exporter, return_exceptions=True)
+
+        self.report_usage()
+
+    def report_usage(self):
+        """Print the token usage, prefix cache share, cost and latency of the run."""
+        for name, tokens in self.metrics.tokens.items():
+            if not tokens["prompt"]:
+                continue
+            share = tokens["cached"] / tokens["prompt"]
+            cost = self.metrics.cost(name)
+            print(
+                f"{name} | Prompt tokens: {tokens['prompt']} "
+                f"(cached: {tokens['cached']}, {share:.1%}) | "
+                f"Completion tokens: {tokens['completion']}"
+                + (f" | Cost: ${cost:.4f}" if cost is not None else ""))
+
+        latency = self.metrics.histograms.get("request_latency")
+        if latency and latency.count:
+            summary = latency.summary()
+            print(
+                f"Request latency p50: {summary['p50']:.2f}s, "
+                f"p95: {summary['p95']:.2f}s, p99: {summary['p99']:.2f}s | "
+                f"Retries: {self.metrics.counters['retries']}, "
+                f"429s: {self.metrics.counters['rate_limited']}, "
+                f"Parse failures: {self.metrics.counters['parse_failures']}")
+
+        hedged = self.metrics.counters.get("hedged_requests")
+        if hedged:
+            print(
+                f"Hedged requests: {hedged} "
+                f"(backup won: {self.metrics.counters['hedge_wins']}, "
+                f"duplicate tokens: {self.metrics.counters['hedge_duplicate_tokens']})")
+
+        stages = self.tracer.summary()
+        if stages:
+            print("Time by stage (spans overlap across workers and nest in their parents):")
+            for name, stats in stages.items():
+                print(
+                    f"  {name}: {stats['total']:.2f}s total, {stats['count']} spans, "
+                    f"mean {stats['mean'] * 1000:.1f}ms, p95 {stats['p95'] * 1000:.1f}ms")
+
+    def restore(self):
+        """Load the records completed in a previous run back into the parser."""
+        for record in self.sink.records():
+            doc_id = record["doc_id"]
+            self.completed_ids.add(doc_id)
+            if record.get("result") is not None:
+                self.parser.results[doc_id] = record["result"]
+            self.parser.messages.extend(record.get("messages") or [])
+
+        if self.completed_ids:
+            print(f"Resuming: skipping {len(self.completed_ids)} completed records.")
+
+    def collate(self, item, messages, parsed_data):
+        """Collate a record into the parser and append it to the sink."""
+        doc_id = item.get(self.id_key)
+        with self.tracer.span("collate", doc_id=doc_id):
+            if self.message_log:
+                messages = self.message_log.compact(messages)
+
+            num_messages = len(self.parser.messages)
+            self.parser.collate_output(item, messages, parsed_data)
+
+            if self.message_log:
+                for entry in self.parser.messages[num_messages:]:
+                    self.message_log.write(entry)
+
+            if self.sink:
+                self.sink.write(
+                    doc_id,
+                    self.parser.results.get(doc_id),
+                    self.parser.messages[num_messages:],
+                )
+
+    async def iter_records(self):
+        """Yield (index, record) pairs from an indexable, iterable or async iterable dataset."""
+        if hasattr(self.dataset, "__aiter__"):
+            idx = 0
+            async for item in self.dataset:
+                yield idx, item
+                idx += 1
+        elif hasattr(self.dataset, "__len__") and hasattr(self.dataset, "__getitem__"):
+            for idx in range(len(self.dataset)):
+                yield idx, self.dataset[idx]
+        else:
+            for idx, item in enumerate(self.dataset):
+                yield idx, item
+
+    async def init_worker(self, worker=0):
         """
         Worker function that processes records from the queue.
-        It splits each document’s text into 4096-token chunks and calls the LLM for each chunk.
+        With a chunker, it splits each document’s text into chunks and calls the LLM for each chunk.
         """
+        self.tracer.set_track(worker + 1, f"worker {worker}")
         while True:
             try:
                 task = await self.queue.get()
@@ -72,71 +360,346 @@ class Extractor:
                     self.queue.task_done()
                     break
 
-                idx, item = task
-            
-                # Replace the text with the current chunk.
-                message, res_json, parsed_data = \
-                    await self.send_message(prompt_vars=item)
+                idx, item, enqueued = task
+                self.metrics.set_gauge("queue_depth", self.queue.qsize())
+
+                with self.tracer.span("record", index=idx, doc_id=item.get(self.id_key)):
+                    self.tracer.record("queue_wait", enqueued)
+
+                    if self.chunker:
+                        message, res_json, parsed_data = await self.send_chunks(item)
+                    else:
+                        message, res_json, parsed_data = \
+                            await self.send_message(prompt_vars=item)
 
-                if not parsed_data:
-                    parsed_data = {}
+                    if not parsed_data:
+                        parsed_data = {}
 
-                messages = {
-                    "input": message,
-                    "output": res_json
-                }
+                    messages = {
+                        "input": message,
+                        "output": res_json
+                    }
 
-                # Collate the results from all chunks.
-                self.parser.collate_output(item, messages, parsed_data)
+                    # Collate the results from all chunks.
+                    self.finish(idx, (item, messages, parsed_data))
 
             except Exception as e:
+                self.metrics.increment("records_failed")
                 print(f"Failed to process record {idx}: {e}")
+                self.finish(idx, None)
 
             # Update progress bar after processing a record.
+            postfix = {"tok_s": f"{self.metrics.tokens_per_second():.0f}"}
+            if self.client.concurrency:
+                postfix["limit"] = self.client.concurrency.slots()
+            self.pbar.set_postfix(postfix, refresh=False)
             self.pbar.update(1)
             self.queue.task_done()
 
+    async def send_chunks(self, item):
+        """
+        Send every chunk of a record concurrently and reduce their parsed outputs.
+
+        A record fails as soon as one of its chunks fails after its retries;
+        the other chunk requests are then cancelled.
+        """
+        loop = asyncio.get_running_loop()
+        with self.tracer.span("split"):
+            chunks = await loop.run_in_executor(None, self.chunker.split, item)
+
+        async def send_chunk(chunk):
+            async with self.chunk_slots:
+                return await self.send_message(prompt_vars=chunk)
+
+        if len(chunks) == 1:
+            return await send_chunk(chunks[0])
+
+        self.metrics.increment("chunked_records")
+        self.metrics.increment("chunks", len(chunks))
+        tasks = [asyncio.ensure_future(send_chunk(chunk)) for chunk in chunks]
+        try:
+            replies = await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+
+        messages = [reply[0] for reply in replies]
+        responses = [reply[1] for reply in replies]
+        parsed_data = self.reducer([reply[2] or {} for reply in replies])
+        return messages, responses, parsed_data
+
+    def finish(self, idx, entry):
+        """
+        Collate a processed record, given as (item, messages, parsed_data).
+
+        Records are collated, and written to the sink, as soon as they
+        complete; with a post-processing stage, their index is kept for
+        `sort_output`. Skipped and failed records are finished with None.
+        """
+        if entry is None:
+            return
+        item, messages, parsed_data = entry
+        num_messages = len(self.parser.messages)
+        try:
+            self.collate(item, messages, parsed_data)
+            self.metrics.increment("records_completed")
+        except Exception as e:
+            self.metrics.increment("records_failed")
+            print(f"Failed to collate record {item.get(self.id_key)}: {e}")
+            return
+        if self.order is not None:
+            self.order.append(
+                (idx, item.get(self.id_key), num_messages, len(self.parser.messages)))
+
+    def sort_output(self):
+        """Put the results and messages collated this run in dataset order, after restored ones."""
+        if not self.order:
+            return
+        self.order.sort(key=lambda entry: entry[0])
+        messages = self.parser.messages
+        first = min(entry[2] for entry in self.order)
+        messages[first:] = [
+            message for _, _, start, end in self.order for message in messages[start:end]]
+
+        positions = {doc_id: position for position, (_, doc_id, _, _) in enumerate(self.order)}
+        results = self.parser.results
+        ordered = sorted(results.items(), key=lambda item: positions.get(item[0], -1))
+        results.clear()
+        results.update(ordered)
+
     async def send_message(self, prompt_vars, history=None):
         """
         Calls the LLM client with retry logic in case of exceptions.
+
+        Failed requests are retried after a delay. Responses that fail to
+        parse or validate are retried at once, since waiting does not help
+        them; with a backend that enforces the schema they are not retried.
         """
         retries = 4
         delay = 4
         for attempt in range(retries):
+            format_failure = False
             try:
-                # Generate the prompt using the template.
-                message = self.prompt_template.format(prompt_vars)
-                if message is None:
-                    return None
+                with self.tracer.span("attempt", attempt=attempt + 1):
+                    # Generate the prompt using the template.
+                    with self.tracer.span("format_prompt"):
+                        message, prompt_messages = self.format_prompt(prompt_vars)
+                    if message is None:
+                        return None
 
-                context = history or []
-                context.append({"role": "user", "content": message})
-                res_json = await self.client.chat_completions(
-                    context=context, model=self.model, debug=self.debug)
+                    if attempt:
+                        self.metrics.increment("retries")
 
-                raw_output = res_json["choices"][0]["message"]["content"]
-                parsed_data = self.parser.parse(raw_output)
+                    context = (history or []) + prompt_messages
+                    try:
+                        res_json = await self.client.chat_completions(
+                            context=context, model=self.model, debug=self.debug,
+                            args=self.request_args, stream=self.stream,
+                            stop_when=self.stop_when)
+                    except Exception:
+                        self.metrics.increment("request_errors")
+                        raise
 
-                # Validate the parsed JSON data
-                if not self.parser.validate_output(parsed_data):
-                    raise ValueError("Validation failed.")
+                    try:
+                        if self.postprocessor:
+                            with self.tracer.span("postprocess"):
+                                parsed_data = await self.postprocessor.run(res_json)
+                        else:
+                            parsed_data = self.process_response(res_json)
+                    except Exception:
+                        self.metrics.increment("parse_failures")
+                        format_failure = True
+                        raise
+                    return message, res_json, parsed_data
 
-                return message, res_json, parsed_data
-            
             except CensoredResponseException as e:
                 raise e
             except Exception as e:
                 print(
                     f"Error calling llm: {e}. Attempt {attempt + 1} of {retries}.")
-                if attempt >= retries - 1:
+                # A schema-constrained output would fail the same way again.
+                if attempt >= retries - 1 or (format_failure and self.schema_enforced):
                     raise e
 
-                await asyncio.sleep(delay) # Backoff
+                if not format_failure:
+                    with self.tracer.span("backoff"):
+                        await asyncio.sleep(delay) # Backoff
+
+    def format_prompt(self, item):
+        """
+        Renders the prompt for a record.
+
+        Templates exposing `format_messages` (see `statements.templates`) are
+        sent as separate system and user messages so the static instructions
+        form a cacheable prefix; their message list is logged as the input.
+        """
+        if hasattr(self.prompt_template, "format_messages"):
+            prompt_messages = self.prompt_template.format_messages(item)
+            return prompt_messages, prompt_messages
+
+        message = self.prompt_template.format(item)
+        if message is None:
+            return None, None
+        return message, [{"role": "user", "content": message}]
+
+    def process_response(self, res_json):
+        """
+        Parses and validates the content of a chat completion response.
+        """
+        return parse_response(
+            self.parser, res_json, self.structured_output, self.classifier, self.tracer)
+
+    async def run_batch(
+        self,
+        batch_dir,
+        batch_size=50000,
+        poll_interval=30.0,
+        completion_window="24h"
+    ):
+        """
+        Run the extraction through the OpenAI-compatible Batch API.
+
+        Prompts are written to JSONL files of at most `batch_size` requests in
+        `batch_dir`, uploaded and submitted as batches, and polled until they
+        finish. The responses then go through the usual parse, validate and
+        collate steps. Records whose request or parsing fails are reported
+        and, with a sink, left for a later resume.
+
+        The input files, and the id of every batch as soon as it is created,
+        are saved to `batches.json` in `batch_dir`, so a restarted run
+        waits for the batches already submitted and only submits the input
+        files left, instead of sending every request again. The file is
+        removed once the results are processed. Chunked records are not
+        supported.
+        """
+        if self.chunker:
+            raise ValueError("Chunked records are not supported by run_batch.")
+
+        os.makedirs(batch_dir, exist_ok=True)
+        batch_client = BatchClient(self.client.client)
+        state_path = os.path.join(batch_dir, "batches.json")
+        state = read_batch_state(state_path)
+
+        if self.sink and self.resume:
+            self.restore()
+
+        # Write the formatted prompts to batch input files.
+        pending = {}
+        input_files = state["input_files"] if state else []
+        file = None
+        async for idx, item in self.iter_records():
+            if self.completed_ids and item.get(self.id_key) in self.completed_ids:
+                continue
+
+            message, prompt_messages = self.format_prompt(item)
+            if message is None:
+                continue
+
+            custom_id = str(idx)
+            if state:
+                # The input files were written by the interrupted run.
+                pending[custom_id] = (item, message)
+                continue
+
+            if len(pending) % batch_size == 0:
+                if file:
+                    file.close()
+                path = os.path.join(batch_dir, f"batch_input_{len(input_files):04d}.jsonl")
+                input_files.append(path)
+                file = open(path, "w", encoding="utf-8")
+
+            pending[custom_id] = (item, message)
+            request = batch_request(
+                custom_id, self.model, prompt_messages, self.request_args)
+            file.write(json.dumps(request) + "\n")
+        if file:
+            file.close()
+
+        # Submit every batch, then wait for all of them.
+        if state:
+            print(f"Resuming {len(state['batches'])} submitted batches from {state_path}.")
+        else:
+            state = {"input_files": input_files, "batches": []}
+            write_batch_state(state_path, state)
+        submitted = state["batches"]
+        sent = {batch["input_file"] for batch in submitted}
+        for path in input_files:
+            if path in sent:
+                continue
+            file_id = await batch_client.upload_file(self.model, path)
+            batch = await batch_client.create_batch(
+                self.model, file_id, completion_window=completion_window)
+            print(f"Submitted batch {batch['id']} from {path}.")
+            submitted.append({"id": batch["id"], "input_file": path})
+            write_batch_state(state_path, state)
+
+        batches = await asyncio.gather(*[
+            batch_client.wait(self.model, batch["id"], poll_interval=poll_interval)
+            for batch in submitted
+        ])
+
+        # Feed the responses back through the parser.
+        self.pbar = tqdm(total=len(pending), desc="Processing records", leave=True)
+        for batch in batches:
+            if batch.get("status") != "completed":
+                print(f"Batch {batch['id']} ended with status {batch.get('status')}.")
+
+            async for line in batch_client.results(self.model, batch):
+                custom_id = line.get("custom_id")
+                if custom_id not in pending:
+                    continue
+                item, message = pending.pop(custom_id)
+
+                try:
+                    response = line.get("response") or {}
+                    if response.get("status_code") != 200:
+                        raise ValueError(
+                            f"Batch request failed: {line.get('error') or response}")
+
+                    res_json = response["body"]
+                    usage = res_json.get("usage") or {}
+                    self.metrics.record_usage(
+                        self.model.name,
+                        usage.get("prompt_tokens") or 0,
+                        usage.get("completion_tokens") or 0,
+                    )
+                    parsed_data = self.process_response(res_json)
+                    messages = {
+                        "input": message,
+                        "output": res_json
+                    }
+                    self.collate(item, messages, parsed_data)
+
+                except Exception as e:
+                    print(f"Failed to process record {custom_id}: {e}")
+
+                self.pbar.update(1)
+
+        if pending:
+            print(f"{len(pending)} records received no batch response.")
+        self.pbar.close()
+
+        if os.path.exists(state_path):
+            os.remove(state_path)
+
+        if self.sink:
+            self.sink.flush()
+
+        if self.message_log:
+            self.message_log.flush(wait=True)
 
     async def close(self):
         """
-        Closes the ChatClient connection.
+        Closes the ChatClient connection, the result sink and the message log.
         """
+        if self.sink:
+            self.sink.close()
+
+        if self.message_log:
+            self.message_log.close()
+
         if self.client:
             await self.client.close()
             self.client = None
@@ -0,0 +1,50 @@
+class HedgePolicy:
+    """
+    When to send a backup copy of a slow request.
+
+    A request still running after the `percentile` of recent request
+    latencies (at least `min_delay` seconds) is hedged, once at least
+    `min_samples` latencies have been observed. Hedges are capped at
+    `max_rate` of all requests, so a general slowdown cannot double the
+    load. The percentile is recomputed every `refresh` requests.
+    """
+
+    def __init__(
+        self,
+        percentile=95,
+        max_rate=0.05,
+        min_delay=1.0,
+        min_samples=50,
+        refresh=50,
+        metric="request_latency",
+    ):
+        self.percentile = percentile
+        self.max_rate = max_rate
+        self.min_delay = min_delay
+        self.min_samples = min_samples
+        self.refresh = refresh
+        self.metric = metric
+
+        self.requests = 0
+        self.hedges = 0
+        self.current_delay = None
+        self.since_refresh = 0
+
+    def delay(self, metrics):
+        """Seconds to wait before hedging a new request, or None to not hedge it."""
+        self.requests += 1
+        self.since_refresh += 1
+        if self.current_delay is None or self.since_refresh >= self.refresh:
+            histogram = metrics.histograms.get(self.metric)
+            if histogram is None or histogram.count < self.min_samples:
+                return None
+            self.current_delay = max(self.min_delay, histogram.percentile(self.percentile))
+            self.since_refresh = 0
+        return self.current_delay
+
+    def allow(self):
+        """Whether one more hedge fits under the rate cap, counting it if so."""
+        if self.hedges + 1 > self.max_rate * self.requests:
+            return False
+        self.hedges += 1
+        return True
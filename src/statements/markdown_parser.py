@@ -0,0 +1,240 @@
+import re
+
+from statements.exceptions import MarkdownParseException
+
+
+# A bullet or plain line of the form "- **Label**: value". Bullets, bold
+# markers and indentation are optional; whether the label is a field is
+# decided by the spec, so other lines are treated as text. Every run of
+# whitespace can only be matched one way, as adjacent optional `\s*` made
+# the pattern backtrack polynomially on long lines that are not labels.
+LABEL_LINE = re.compile(
+    r"^\s*(?:(?:[-*+]|\d+[.)])\s*)?(?:(?:\*\*|__)\s*)?"
+    r"([A-Za-z][\w/&'()-]*(?:\s+[\w/&'()-]+)*)"
+    r"\s*(?:(?:\*\*|__)\s*)?:\s*(?:(?:\*\*|__)\s*)?((?:.*\S)?)\s*$"
+)
+NUMBER = re.compile(r"[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?")
+LABEL_WORD = re.compile(r"[\w-]+")
+FENCE = re.compile(r"^\s*```")
+NA_VALUES = {"na", "n/a", "none", "null"}
+
+
+def normalize_label(label):
+    # A closing "__" bold marker is matched as part of the label's last word.
+    return " ".join(label.lower().replace("*", "").strip("_").split())
+
+
+class Field:
+    """
+    Declarative spec of one field of a structured markdown output.
+
+    Args:
+        name (str): The key of the field in the parsed dict.
+        label (str): The bold label introducing the field, e.g. "Categorical Label".
+        kind (str): "text", "number", "percent" (a number divided by 100),
+            "label" (the first word, lowercased) or "group".
+        children (list): The fields nested under a group.
+        repeated (bool): Whether a group may appear several times, parsed as a list.
+        required (bool): Whether parsing fails when the field is missing.
+        nullable (bool): Whether "NA"-like values parse to None for numbers.
+        aliases (list): Other labels accepted for the field.
+    """
+
+    def __init__(
+        self,
+        name,
+        label,
+        kind="text",
+        children=None,
+        repeated=False,
+        required=True,
+        nullable=False,
+        aliases=(),
+    ):
+        if kind == "group" and not children:
+            raise ValueError(f"Group field {name} needs children.")
+
+        self.name = name
+        self.label = label
+        self.kind = kind
+        self.children = FieldSet(children or [])
+        self.repeated = repeated
+        self.required = required
+        self.nullable = nullable
+        self.labels = [normalize_label(label)] + [normalize_label(a) for a in aliases]
+
+
+class FieldSet:
+    """Fields of one nesting level, looked up by normalized label."""
+
+    def __init__(self, fields):
+        self.fields = list(fields)
+        self.by_label = {}
+        for field in self.fields:
+            for label in field.labels:
+                self.by_label[label] = field
+
+    def get(self, label):
+        return self.by_label.get(label)
+
+
+class MarkdownParser:
+    """
+    Single-pass, line-oriented parser for structured markdown outputs.
+
+    The field specs are compiled once into label lookup tables. Each line is
+    matched against one precompiled pattern and routed by a small state
+    machine: a known label starts a field at the innermost group where it is
+    defined (so indentation does not matter), unknown lines continue the
+    current text field, and text before the first field or divider can be
+    captured as a preamble. Missing or malformed fields are reported by name.
+    """
+
+    def __init__(self, fields, preamble=None, divider="---"):
+        self.fields = FieldSet(fields)
+        self.preamble = preamble  # Name of the field holding text before the first field
+        self.divider = divider
+
+    def parse(self, text):
+        """Parse the text into a dict, raising MarkdownParseException on failure."""
+        raw = self.scan(text)
+        errors = []
+        result = self.convert(self.fields, raw, "", errors)
+
+        if self.preamble:
+            preamble = raw.get(self.preamble, "").strip()
+            if not preamble:
+                errors.append((self.preamble, "missing"))
+            result = {self.preamble: preamble, **result}
+
+        if errors:
+            details = ", ".join(f"{path} ({reason})" for path, reason in errors)
+            raise MarkdownParseException(
+                f"Markdown format is incorrect, failed fields: {details}: {text}",
+                fields=[path for path, _ in errors],
+            )
+        return result
+
+    def is_complete(self, text):
+        """
+        Whether a partial output already holds every required field.
+
+        Only complete lines are considered, and the last field seen must not
+        be free text, which could still be continuing, so a stream can be
+        stopped as soon as this is True.
+        """
+        raw, last = self.scan_fields(text[:text.rfind("\n") + 1])
+        if last is not None and last.kind == "text":
+            return False
+        errors = []
+        self.convert(self.fields, raw, "", errors)
+        return not errors
+
+    def scan(self, text):
+        """Split the text into raw field values without converting them."""
+        return self.scan_fields(text)[0]
+
+    def scan_fields(self, text):
+        """Scan the text, returning the raw values and the last field seen."""
+        root = {}
+        stack = [(self.fields, root)]  # (fields of the level, values of the level)
+        current = None  # (values, name) of the text field receiving continuation lines
+        last = None
+        preamble = [] if self.preamble else None
+        started = False
+
+        for line in text.splitlines():
+            if FENCE.match(line):
+                continue
+
+            if line.strip() == self.divider:
+                started = True
+                current = None
+                continue
+
+            # Most prose lines have no colon and cannot be labels.
+            match = LABEL_LINE.match(line) if ":" in line else None
+            field = None
+            if match:
+                label = normalize_label(match.group(1))
+                for depth in range(len(stack) - 1, -1, -1):
+                    field = stack[depth][0].get(label)
+                    if field is not None:
+                        del stack[depth + 1:]
+                        break
+
+            if field is None:
+                if not started and preamble is not None:
+                    preamble.append(line)
+                elif current is not None and line.strip():
+                    values, name = current
+                    values[name] += "\n" + line.strip()
+                continue
+
+            started = True
+            last = field
+            values = stack[-1][1]
+            if field.kind == "group":
+                group = {}
+                if field.repeated:
+                    values.setdefault(field.name, []).append(group)
+                else:
+                    values[field.name] = group
+                stack.append((field.children, group))
+                current = None
+            else:
+                values[field.name] = match.group(2)
+                current = (values, field.name) if field.kind == "text" else None
+
+        if preamble is not None:
+            root[self.preamble] = "\n".join(preamble)
+        return root, last
+
+    def convert(self, fields, raw, prefix, errors):
+        """Convert raw values of one level and collect the failures."""
+        result = {}
+        for field in fields.fields:
+            path = f"{prefix}{field.name}"
+            if field.name not in raw:
+                if field.required:
+                    errors.append((path, "missing"))
+                continue
+
+            value = raw[field.name]
+            if field.kind == "group":
+                if field.repeated:
+                    result[field.name] = [
+                        self.convert(field.children, group, f"{path}[{i}].", errors)
+                        for i, group in enumerate(value)
+                    ]
+                else:
+                    result[field.name] = self.convert(
+                        field.children, value, f"{path}.", errors)
+                continue
+
+            try:
+                result[field.name] = self.convert_value(field, value)
+            except ValueError as e:
+                errors.append((path, str(e)))
+        return result
+
+    @staticmethod
+    def convert_value(field, value):
+        value = value.strip()
+        if field.kind == "text":
+            return value
+
+        if field.kind == "label":
+            word = LABEL_WORD.search(value.replace("*", "").replace("`", ""))
+            if not word:
+                raise ValueError(f"no label in {value!r}")
+            return word.group(0).lower()
+
+        # Numbers and percentages.
+        if field.nullable and normalize_label(value.split(" ")[0] if value else "") in NA_VALUES:
+            return None
+        number = NUMBER.search(value)
+        if not number:
+            raise ValueError(f"no number in {value!r}")
+        number = float(number.group(0))
+        return number / 100.0 if field.kind == "percent" else number
@@ -0,0 +1,256 @@
+import io
+import os
+import gzip
+import json
+import hashlib
+
+from statements.sinks import DiskThread, json_default
+
+try:
+    import zstandard
+except ImportError:  # zstd logs need the optional zstandard package
+    zstandard = None
+
+
+# Shortest shared start of two plain string prompts stored as a template.
+MIN_TEMPLATE_CHARS = 256
+
+
+def template_id(text):
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=8).hexdigest()
+
+
+def compress_frame(path, data):
+    """Compress one frame; frames appended to a file decompress as one stream."""
+    if path.endswith(".zst"):
+        return zstandard.ZstdCompressor(level=3).compress(data)
+    if path.endswith(".gz"):
+        return gzip.compress(data)
+    return data
+
+
+def open_log(path):
+    """Open a log file for reading as text across all its frames."""
+    if path.endswith(".zst"):
+        if zstandard is None:
+            raise ImportError("Reading .zst message logs requires the zstandard package.")
+        file = open(path, "rb")
+        reader = zstandard.ZstdDecompressor().stream_reader(file, read_across_frames=True)
+        return io.TextIOWrapper(reader, encoding="utf-8")
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8")
+    return open(path, "r", encoding="utf-8")
+
+
+class MessageLog:
+    """
+    Deduplicated, compressed log of the prompts and responses of a run.
+
+    The system message of a prefix-cached template (see
+    `statements.templates`) is the same for every record, so `compact`
+    replaces it by the id of a template entry written once per version;
+    records keep only their own messages, holding the record variables, and
+    the response. Plain string prompts are split the same way: the first
+    `MIN_TEMPLATE_CHARS` or more lines two prompts share become a template,
+    and records keep the rest of their prompt as a suffix. Compacted
+    entries are what the parser keeps in memory and the sink stores, and
+    `expand` rebuilds the full entry on demand.
+
+    The template texts are only in the log, so a sink holding compacted
+    entries must be kept with its log. Opening an existing log loads its
+    templates, so a resumed run can expand the entries restored from the
+    sink, and a new template is written to disk at once, before the sink
+    row that refers to it.
+
+    Entries are written as JSON lines in independent frames of `frame_size`
+    records: gzip members for `.gz` paths, zstd frames for `.zst` paths
+    (with the optional zstandard package) and plain text otherwise. An
+    existing file is appended to, so a resumed run extends its log, and a
+    crash loses at most the unflushed frame. Frames are compressed and
+    written on a background thread, so `write` does not wait for the disk,
+    except for the rare frames holding a new template.
+    """
+
+    def __init__(self, path, frame_size=100):
+        if path.endswith(".zst") and zstandard is None:
+            raise ImportError("Writing .zst message logs requires the zstandard package.")
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.path = path
+        self.frame_size = frame_size
+        self.templates = {}  # Template id -> text
+        self.written = set()  # Template ids already in the file
+        self.prefixes = []  # Template ids of string prompt prefixes
+        self.last_prompt = None  # Last string prompt without a template
+        self.buffer = []
+        self.pending = 0
+        self.disk = DiskThread("message-log")
+
+        if os.path.exists(path):
+            for key, text, prefix in read_templates(path):
+                self.templates[key] = text
+                self.written.add(key)
+                if prefix:
+                    self.prefixes.append(key)
+
+    def compact(self, entry):
+        """Replace the template text in an entry's input by template references."""
+        if "input" not in entry:
+            return entry
+        return {**entry, "input": self.compact_input(entry["input"])}
+
+    def compact_input(self, value):
+        # Message lists, lists of them for chunked records, or a plain prompt.
+        if isinstance(value, list):
+            return [self.compact_input(element) for element in value]
+        if isinstance(value, dict) and value.get("role") == "system" \
+                and isinstance(value.get("content"), str):
+            text = value["content"]
+            key = template_id(text)
+            if key not in self.templates:
+                self.templates[key] = text
+            return {**{k: v for k, v in value.items() if k != "content"}, "template": key}
+        if isinstance(value, str):
+            return self.compact_prompt(value)
+        return value
+
+    def compact_prompt(self, prompt):
+        # A plain string prompt, split into a shared prefix and its own suffix.
+        for key in self.prefixes:
+            if prompt.startswith(self.templates[key]):
+                return {"template": key, "suffix": prompt[len(self.templates[key]):]}
+
+        previous, self.last_prompt = self.last_prompt, prompt
+        if previous is None:
+            return prompt
+        shared = os.path.commonprefix([previous, prompt])
+        shared = shared[:shared.rfind("\n") + 1]  # Cut at a line boundary
+        if len(shared) < MIN_TEMPLATE_CHARS:
+            return prompt
+
+        key = template_id(shared)
+        self.templates[key] = shared
+        self.prefixes.append(key)
+        self.last_prompt = None
+        return {"template": key, "suffix": prompt[len(shared):]}
+
+    def expand(self, entry):
+        """Rebuild the full entry from a compacted one."""
+        if "input" not in entry:
+            return entry
+        return {**entry, "input": expand_input(entry["input"], self.templates)}
+
+    def write(self, entry):
+        """
+        Append a compacted entry, preceded by any template it uses for the first time.
+
+        The frame is flushed right away when it holds a new template.
+        """
+        new_template = False
+        for key in sorted(template_refs(entry.get("input"))):
+            if key not in self.written:
+                template = {"id": key, "text": self.templates[key]}
+                if key in self.prefixes:
+                    template["prefix"] = True
+                self.buffer.append(json.dumps({"template": template}))
+                self.written.add(key)
+                new_template = True
+
+        self.buffer.append(json.dumps({"record": entry}, default=json_default))
+        self.pending += 1
+        if new_template:
+            self.flush(wait=True)
+        elif self.pending >= self.frame_size:
+            self.flush()
+
+    def flush(self, wait=False):
+        """Write the buffered entries as one frame, waiting for the disk if `wait`."""
+        if not self.buffer:
+            return
+        data = ("\n".join(self.buffer) + "\n").encode("utf-8")
+        self.buffer = []
+        self.pending = 0
+        future = self.disk.submit(self.write_frame, data)
+        if wait:
+            future.result()
+
+    def write_frame(self, data):
+        with open(self.path, "ab") as file:
+            file.write(compress_frame(self.path, data))
+            file.flush()
+            os.fsync(file.fileno())
+
+    def close(self):
+        self.flush(wait=True)
+        self.disk.close()
+
+
+def template_refs(value):
+    """Ids of the templates referenced by a compacted input."""
+    if isinstance(value, list):
+        return {key for element in value for key in template_refs(element)}
+    if isinstance(value, dict) and "template" in value:
+        return {value["template"]}
+    return set()
+
+
+def expand_input(value, templates):
+    if isinstance(value, list):
+        return [expand_input(element, templates) for element in value]
+    if isinstance(value, dict) and value.get("template") in templates:
+        if "suffix" in value and "role" not in value:
+            return templates[value["template"]] + value["suffix"]
+        message = {k: v for k, v in value.items() if k != "template"}
+        message["content"] = templates[value["template"]]
+        return message
+    return value
+
+
+def read_templates(path):
+    """Iterate over the (id, text, is_prefix) template entries of a message log."""
+    with open_log(path) as file:
+        try:
+            for line in file:
+                if not line.startswith('{"template"'):
+                    continue
+                try:
+                    template = json.loads(line)["template"]
+                except json.JSONDecodeError:
+                    continue
+                yield template["id"], template["text"], template.get("prefix", False)
+        except (EOFError, gzip.BadGzipFile) + ((zstandard.ZstdError,) if zstandard else ()):
+            return
+
+
+def read_message_log(path, expand=True):
+    """
+    Iterate over the entries of a message log, expanded unless `expand=False`.
+
+    Plain `*_messages_*.jsonl` files, whose lines are the entries
+    themselves, are read as well. A frame torn by a crash ends the
+    iteration, like a torn JSONL line.
+    """
+    templates = {}
+    with open_log(path) as file:
+        try:
+            for line in file:
+                if not line.strip():
+                    continue
+                try:
+                    line = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if "template" in line:
+                    templates[line["template"]["id"]] = line["template"]["text"]
+                elif "record" in line:
+                    record = line["record"]
+                    if expand and "input" in record:
+                        record = {**record, "input": expand_input(record["input"], templates)}
+                    yield record
+                else:
+                    yield line
+        except (EOFError, gzip.BadGzipFile) + ((zstandard.ZstdError,) if zstandard else ()):
+            return
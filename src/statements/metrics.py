@@ -0,0 +1,184 @@
+import os
+import json
+import time
+import asyncio
+from collections import defaultdict, deque
+
+
+# Latency bucket bounds in seconds for the Prometheus histograms.
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+# Finer bounds for the gaps between streamed tokens.
+TOKEN_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram that also keeps a window of recent samples for percentiles.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS, window=10000):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # Last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.samples = deque(maxlen=window)
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        self.samples.append(value)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                return
+        self.counts[-1] += 1
+
+    def percentile(self, q):
+        """Return the q-th percentile (0-100) of the recent samples."""
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, max(0, round(q / 100.0 * (len(ordered) - 1))))
+        return ordered[index]
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "mean": self.sum / self.count if self.count else None,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+        }
+
+
+class Metrics:
+    """
+    Counters, gauges, histograms and per-model token and cost totals.
+
+    A single instance is shared by `ChatClient` and `Extractor`. `prices` maps
+    a model name to USD prices per million tokens, as a dict with `prompt`,
+    `completion` and optionally `cached` keys.
+    """
+
+    def __init__(self, prices=None):
+        self.prices = prices or {}
+        self.started = time.monotonic()
+
+        self.counters = defaultdict(int)
+        self.gauges = {}
+        self.histograms = {}
+        self.tokens = defaultdict(lambda: {"prompt": 0, "completion": 0, "cached": 0})
+
+    def increment(self, name, amount=1):
+        self.counters[name] += amount
+
+    def set_gauge(self, name, value):
+        self.gauges[name] = value
+
+    def observe(self, name, value, buckets=LATENCY_BUCKETS):
+        """Record a value in a histogram; `buckets` applies when it is created."""
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = Histogram(buckets)
+        histogram.observe(value)
+
+    def record_usage(self, model_name, prompt_tokens, completion_tokens, cached_tokens=0):
+        tokens = self.tokens[model_name]
+        tokens["prompt"] += prompt_tokens
+        tokens["completion"] += completion_tokens
+        tokens["cached"] += cached_tokens
+
+    def cost(self, model_name):
+        """Estimated USD cost of the tokens spent on a model."""
+        price = self.prices.get(model_name)
+        if not price:
+            return None
+        tokens = self.tokens[model_name]
+        cached_price = price.get("cached", price["prompt"])
+        return (
+            (tokens["prompt"] - tokens["cached"]) * price["prompt"]
+            + tokens["cached"] * cached_price
+            + tokens["completion"] * price["completion"]
+        ) / 1e6
+
+    def total_tokens(self):
+        return sum(t["prompt"] + t["completion"] for t in self.tokens.values())
+
+    def tokens_per_second(self):
+        elapsed = time.monotonic() - self.started
+        return self.total_tokens() / elapsed if elapsed > 0 else 0.0
+
+    def snapshot(self):
+        """Return every metric as a JSON-serializable dict."""
+        return {
+            "timestamp": time.time(),
+            "elapsed": time.monotonic() - self.started,
+            "tokens_per_second": self.tokens_per_second(),
+            "counters": dict(self.counters),
+            "gauges": dict(self.gauges),
+            "histograms": {
+                name: histogram.summary() for name, histogram in self.histograms.items()
+            },
+            "models": {
+                name: {**tokens, "cost_usd": self.cost(name)}
+                for name, tokens in self.tokens.items()
+            },
+        }
+
+    def to_prometheus(self, prefix="statements"):
+        """Render the metrics in the Prometheus text exposition format."""
+        lines = []
+        for name, value in sorted(self.counters.items()):
+            lines.append(f"# TYPE {prefix}_{name}_total counter")
+            lines.append(f"{prefix}_{name}_total {value}")
+
+        for name, value in sorted(self.gauges.items()):
+            lines.append(f"# TYPE {prefix}_{name} gauge")
+            lines.append(f"{prefix}_{name} {value}")
+
+        for name, histogram in sorted(self.histograms.items()):
+            metric = f"{prefix}_{name}_seconds"
+            lines.append(f"# TYPE {metric} histogram")
+            cumulative = 0
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                cumulative += count
+                lines.append(f'{metric}_bucket{{le="{bound}"}} {cumulative}')
+            lines.append(f'{metric}_bucket{{le="+Inf"}} {histogram.count}')
+            lines.append(f"{metric}_sum {histogram.sum}")
+            lines.append(f"{metric}_count {histogram.count}")
+
+        lines.append(f"# TYPE {prefix}_tokens_total counter")
+        for name, tokens in sorted(self.tokens.items()):
+            for kind, value in tokens.items():
+                lines.append(f'{prefix}_tokens_total{{model="{name}",kind="{kind}"}} {value}')
+
+        costs = [(name, self.cost(name)) for name in sorted(self.tokens)]
+        costs = [(name, cost) for name, cost in costs if cost is not None]
+        if costs:
+            lines.append(f"# TYPE {prefix}_cost_usd_total counter")
+            for name, cost in costs:
+                lines.append(f'{prefix}_cost_usd_total{{model="{name}"}} {cost}')
+
+        return "\n".join(lines) + "\n"
+
+    def export(self, directory):
+        """Write `metrics.json` and `metrics.prom` atomically into `directory`."""
+        os.makedirs(directory, exist_ok=True)
+        for filename, content in (
+            ("metrics.json", json.dumps(self.snapshot(), indent=2)),
+            ("metrics.prom", self.to_prometheus()),
+        ):
+            path = os.path.join(directory, filename)
+            with open(path + ".tmp", "w", encoding="utf-8") as file:
+                file.write(content)
+            os.replace(path + ".tmp", path)
+
+
+async def export_periodically(metrics, directory, interval=30.0):
+    """Export the metrics every `interval` seconds until cancelled."""
+    try:
+        while True:
+            await asyncio.sleep(interval)
+            metrics.export(directory)
+    finally:
+        metrics.export(directory)
@@ -0,0 +1,107 @@
+import copy
+import json
+import asyncio
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+from statements.utils import drop_null_optionals, validation_details
+from statements.tracing import NULL_TRACER
+
+
+def parse_response(parser, res_json, structured_output=False, classifier=None, tracer=NULL_TRACER):
+    """
+    Parse and validate the content of a chat completion response.
+
+    Structured outputs are loaded as JSON, without the nulls that strict
+    mode puts in optional properties, and classifier runs read the
+    label from the logprobs; everything else goes through `parser.parse`.
+    """
+    raw_output = res_json["choices"][0]["message"]["content"]
+    with tracer.span("parse"):
+        if classifier is not None:
+            parsed_data = classifier.parse(res_json)
+        elif structured_output:
+            parsed_data = drop_null_optionals(json.loads(raw_output), parser.schema)
+        else:
+            parsed_data = parser.parse(raw_output)
+
+    # Validate the parsed JSON data
+    with tracer.span("validate"):
+        valid = parser.validate_output(parsed_data)
+    if not valid:
+        raise ValueError(f"Validation failed. {validation_details(parser, parsed_data)}")
+
+    return parsed_data
+
+
+# Parser copy and options owned by each post-processing worker process.
+_parser = None
+_options = {}
+
+
+def _init_process(parser, structured_output=False, classifier=None):
+    global _parser, _options
+    _parser = parser
+    _options = {"structured_output": structured_output, "classifier": classifier}
+
+
+def _parse_in_process(res_json):
+    return parse_response(_parser, res_json, **_options)
+
+
+def stateless_parser(parser):
+    """Shallow copy of a parser without its collated results and messages."""
+    clone = copy.copy(parser)
+    if hasattr(clone, "results"):
+        clone.results = {}
+    if hasattr(clone, "messages"):
+        clone.messages = []
+    return clone
+
+
+class PostProcessor:
+    """
+    Executor stage running `parse_response` off the event loop.
+
+    With `kind="thread"` the parser is shared with the pool threads, which
+    only helps when parsing releases the GIL. With `kind="process"` each
+    worker process gets a pickled copy of the parser without its collated
+    results and messages, so regex parsing and validation scale across
+    cores; only the response and the parsed dict cross process boundaries. Collation is not
+    done here, as it updates the parser in the calling process.
+    """
+
+    def __init__(self, parser, kind="thread", num_workers=None, structured_output=False, classifier=None):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Unknown post-processing executor {kind!r}.")
+        self.parser = parser
+        self.kind = kind
+        self.num_workers = num_workers
+        self.structured_output = structured_output
+        self.classifier = classifier
+        self.executor = None
+
+    def start(self):
+        if self.kind == "process":
+            self.executor = ProcessPoolExecutor(
+                max_workers=self.num_workers,
+                initializer=_init_process,
+                initargs=(stateless_parser(self.parser), self.structured_output, self.classifier),
+            )
+        else:
+            self.executor = ThreadPoolExecutor(
+                max_workers=self.num_workers, thread_name_prefix="postprocess")
+
+    async def run(self, res_json):
+        """Parse and validate a response in the pool."""
+        loop = asyncio.get_running_loop()
+        if self.kind == "process":
+            return await loop.run_in_executor(self.executor, _parse_in_process, res_json)
+        return await loop.run_in_executor(
+            self.executor, parse_response, self.parser, res_json,
+            self.structured_output, self.classifier)
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
@@ -0,0 +1,220 @@
+import asyncio
+import time
+import re
+from email.utils import parsedate_to_datetime
+
+
+DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+DURATION_PATTERN = re.compile(r"(?:\d+(?:\.\d+)?(?:ms|s|m|h))+")
+
+
+def parse_duration(value):
+    """
+    Parse a rate limit duration header into seconds.
+
+    Accepts plain seconds ("20", "0.5"), OpenAI style durations ("1s", "6m0s",
+    "250ms") and HTTP dates as used by the Retry-After header.
+    """
+    if value is None:
+        return None
+
+    value = str(value).strip()
+    if not value:
+        return None
+
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+
+    if DURATION_PATTERN.fullmatch(value):
+        return sum(
+            float(number) * DURATION_UNITS[unit]
+            for number, unit in DURATION_PART.findall(value)
+        )
+
+    try:
+        retry_at = parsedate_to_datetime(value)
+        return max(0.0, retry_at.timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """
+    Token bucket refilled continuously at `rate` units per second.
+
+    Reservations may drive the level below zero, in which case the caller
+    receives the number of seconds to wait before its reservation is covered.
+    Callers are therefore served in the order they reserved.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate * 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def refill(self, rate=None):
+        """Top up the bucket for the time elapsed since the last update."""
+        now = time.monotonic()
+        rate = self.rate if rate is None else rate
+        self.level = min(self.capacity, self.level + (now - self.updated) * rate)
+        self.updated = now
+
+    def reserve(self, amount, rate=None):
+        """Take `amount` units and return the seconds to wait until they are available."""
+        rate = self.rate if rate is None else rate
+        self.refill(rate)
+        amount = min(amount, self.capacity)  # Never wait for more than a full bucket
+        self.level -= amount
+        if self.level >= 0 or rate <= 0:
+            return 0.0
+        return -self.level / rate
+
+    def adjust(self, amount):
+        """Return (positive) or charge (negative) units after the fact."""
+        self.level = min(self.capacity, self.level + amount)
+
+    def drain(self):
+        """Empty the bucket, e.g. when the server reports no remaining quota."""
+        self.level = min(self.level, 0.0)
+
+
+class EndpointRateLimiter:
+    """
+    Asyncio rate limiter for a single API endpoint.
+
+    Enforces optional requests-per-minute and tokens-per-minute budgets with
+    token buckets, and adapts to server feedback with AIMD: every 429 halves
+    the effective rate and doubles the backoff, every success additively
+    restores them. `Retry-After` and `x-ratelimit-*` headers pause the
+    endpoint for as long as the server asks. Waiting is done with
+    `asyncio.sleep`, so other requests keep flowing on the event loop.
+    """
+
+    def __init__(
+        self,
+        rpm=None,
+        tpm=None,
+        max_backoff=32.0,
+        increase=0.05,
+        decrease=0.5,
+        min_scale=0.05,
+    ):
+        self.requests = TokenBucket(rpm / 60.0, rpm) if rpm else None
+        self.tokens = TokenBucket(tpm / 60.0, tpm) if tpm else None
+
+        self.max_backoff = max_backoff
+        self.increase = increase
+        self.decrease = decrease
+        self.min_scale = min_scale
+
+        self.scale = 1.0  # Fraction of the configured rate currently allowed
+        self.backoff = 0.0  # Pause applied after a 429 without Retry-After
+        self.blocked_until = 0.0
+
+    def set_backoff(self, backoff):
+        self.backoff = min(self.max_backoff, max(0.0, backoff))
+
+    async def acquire(self, tokens=0):
+        """Wait until a request of `tokens` estimated tokens may be sent."""
+        wait = max(0.0, self.blocked_until - time.monotonic())
+        if self.requests:
+            wait = max(wait, self.requests.reserve(1, self.requests.rate * self.scale))
+        if self.tokens and tokens:
+            wait = max(wait, self.tokens.reserve(tokens, self.tokens.rate * self.scale))
+
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+    def record_usage(self, estimated, actual):
+        """Reconcile the token bucket once the real token usage is known."""
+        if self.tokens and actual is not None:
+            self.tokens.adjust(estimated - actual)
+
+    def on_success(self, headers=None):
+        """Additively restore the rate after a successful request."""
+        self.scale = min(1.0, self.scale + self.increase)
+        self.set_backoff(self.backoff / 2.0 - 1.0)
+        self.apply_headers(headers)
+
+    def on_rate_limited(self, headers=None):
+        """Multiplicatively back off after a 429 or a provider timeout."""
+        self.scale = max(self.min_scale, self.scale * self.decrease)
+        self.set_backoff(self.backoff * 2.0 + 1.0)
+
+        headers = headers or {}
+        delay = parse_duration(headers.get("retry-after"))
+        if delay is None:
+            delay = self.backoff
+        self.pause(delay)
+        self.apply_headers(headers)
+
+    def pause(self, delay):
+        """Hold back every request to this endpoint for `delay` seconds."""
+        self.blocked_until = max(self.blocked_until, time.monotonic() + delay)
+
+    def apply_headers(self, headers):
+        """Honour `x-ratelimit-*` headers reported by the server."""
+        if not headers:
+            return
+
+        for kind, bucket in (("requests", self.requests), ("tokens", self.tokens)):
+            limit = headers.get(f"x-ratelimit-limit-{kind}")
+            if limit and bucket is None:
+                # Adopt the server's budget when none was configured.
+                try:
+                    limit = float(limit)
+                except ValueError:
+                    continue
+                bucket = TokenBucket(limit / 60.0, limit)
+                setattr(self, kind, bucket)
+
+            remaining = headers.get(f"x-ratelimit-remaining-{kind}")
+            if remaining is None:
+                continue
+            try:
+                remaining = float(remaining)
+            except ValueError:
+                continue
+            if remaining <= 0:
+                if bucket:
+                    bucket.drain()
+                reset = parse_duration(headers.get(f"x-ratelimit-reset-{kind}"))
+                if reset:
+                    self.pause(reset)
+
+
+class RateLimiterRegistry:
+    """
+    Lazily created rate limiters, one per key.
+
+    `ChatClient` keys limiters by (provider, model name, endpoint), so a 429
+    for one model or provider never throttles requests for another.
+    """
+
+    def __init__(self, **defaults):
+        self.defaults = defaults
+        self.limiters = {}
+
+    def get(self, key, rpm=None, tpm=None):
+        """Return the limiter for `key`, creating it on first use."""
+        limiter = self.limiters.get(key)
+        if limiter is None:
+            limiter = EndpointRateLimiter(rpm=rpm, tpm=tpm, **self.defaults)
+            self.limiters[key] = limiter
+        return limiter
+
+    def snapshot(self):
+        """Return the backoff state of every limiter, keyed by its joined key."""
+        return {
+            "/".join(key) if isinstance(key, tuple) else key: {
+                "backoff": limiter.backoff,
+                "scale": limiter.scale,
+                "blocked_for": max(0.0, limiter.blocked_until - time.monotonic()),
+            }
+            for key, limiter in self.limiters.items()
+        }
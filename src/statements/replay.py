@@ -0,0 +1,166 @@
+import json
+from concurrent.futures import ProcessPoolExecutor
+
+from statements.utils import drop_null_optionals, validation_details
+from statements.message_log import read_message_log
+from statements.chunking import FieldReducer
+
+
+# Parser instance owned by each replay worker process.
+_parser = None
+_structured_output = False
+_classifier = None
+
+
+def _init_parser(parser_factory, structured_output=False, classifier=None):
+    global _parser, _structured_output, _classifier
+    _parser = parser_factory()
+    _structured_output = structured_output
+    _classifier = classifier
+
+
+def _parse_record(record):
+    """
+    Parse and validate one stored completion in a worker process.
+
+    Chunked records hold a list of completions, one per chunk; each is
+    parsed and validated, and the list of outputs is returned for the
+    caller to reduce.
+    """
+    doc_id = record.get("doc_id")
+    output = record.get("output")
+    if not isinstance(output, list):
+        return (doc_id, *_parse_output(output))
+
+    outputs = []
+    for i, chunk_output in enumerate(output):
+        parsed_data, stage, error = _parse_output(chunk_output)
+        if stage is not None:
+            return doc_id, parsed_data, stage, f"Chunk {i}: {error}"
+        outputs.append(parsed_data)
+    return doc_id, outputs, None, None
+
+
+def _parse_output(output):
+    try:
+        raw_output = output["choices"][0]["message"]["content"]
+    except (KeyError, IndexError, TypeError) as e:
+        return None, "output", f"Missing completion content: {e!r}"
+
+    try:
+        if _classifier is not None:
+            parsed_data = _classifier.parse(output)
+        elif _structured_output:
+            parsed_data = drop_null_optionals(json.loads(raw_output), _parser.schema)
+        else:
+            parsed_data = _parser.parse(raw_output)
+    except Exception as e:
+        return None, "parse", str(e)
+
+    try:
+        if not _parser.validate_output(parsed_data):
+            return parsed_data, "validate", \
+                f"Validation failed. {validation_details(_parser, parsed_data)}"
+    except Exception as e:
+        return parsed_data, "validate", str(e)
+
+    return parsed_data, None, None
+
+
+def read_messages(messages_file):
+    """
+    Iterate over the records of a saved `*_messages_*.jsonl` file or of a
+    `statements.message_log` log, expanded.
+    """
+    return read_message_log(messages_file)
+
+
+def replay_messages(
+    messages_file,
+    parser_factory,
+    items=None,
+    id_key="id",
+    num_processes=None,
+    chunksize=64,
+    structured_output=False,
+    classifier=None,
+    reducer=None,
+):
+    """
+    Re-run parse, validate and collate over stored completions without calling the LLM.
+
+    Parsing and validation run across a process pool, each process holding
+    its own parser built by `parser_factory` (which must be picklable, e.g. a
+    `functools.partial` of the parser class). Collation runs in the calling
+    process, in file order, on a fresh parser. Records of chunked runs,
+    whose input and output are lists per chunk, have every chunk parsed and
+    validated, and the outputs merged by `reducer` as the Extractor does.
+
+    Args:
+        messages_file (str): A JSONL file of {"doc_id", "input", "output"} records.
+        parser_factory (callable): Returns a new output parser.
+        items (dict): Optional mapping of doc id to the original dataset record,
+            passed to `collate_output`. Defaults to {id_key: doc_id}.
+        id_key (str): The record key holding the doc id.
+        num_processes (int): Size of the process pool; 1 replays inline.
+        chunksize (int): Records sent to a worker process at a time.
+        structured_output (bool): Whether the completions are JSON structured
+            outputs, loaded directly instead of parsed.
+        classifier: The `statements.classification.LabelClassifier` of a
+            classification run, which reads the label from the logprobs.
+        reducer (callable): Merges the parsed chunk outputs of a chunked
+            record, defaults to `statements.chunking.FieldReducer()`.
+
+    Returns:
+        tuple: The parser holding the fresh results, and a list of failures
+        as {"doc_id", "stage", "error"} dicts.
+    """
+    records = list(read_messages(messages_file))
+    parser = parser_factory()
+    items = items or {}
+    reducer = reducer or FieldReducer()
+    failures = []
+
+    if num_processes == 1:
+        _init_parser(parser_factory, structured_output, classifier)
+        outcomes = map(_parse_record, records)
+        executor = None
+    else:
+        executor = ProcessPoolExecutor(
+            max_workers=num_processes,
+            initializer=_init_parser,
+            initargs=(parser_factory, structured_output, classifier),
+        )
+        outcomes = executor.map(_parse_record, records, chunksize=chunksize)
+
+    try:
+        for record, (doc_id, parsed_data, stage, error) in zip(records, outcomes):
+            if stage is not None:
+                failures.append({"doc_id": doc_id, "stage": stage, "error": error})
+                continue
+
+            if isinstance(record.get("output"), list):
+                try:
+                    parsed_data = reducer(parsed_data)
+                except Exception as e:
+                    failures.append({"doc_id": doc_id, "stage": "reduce", "error": str(e)})
+                    continue
+
+            item = items.get(doc_id, {id_key: doc_id})
+            messages = {"input": record.get("input"), "output": record.get("output")}
+            try:
+                parser.collate_output(item, messages, parsed_data)
+            except Exception as e:
+                failures.append({"doc_id": doc_id, "stage": "collate", "error": str(e)})
+    finally:
+        if executor:
+            executor.shutdown()
+
+    return parser, failures
+
+
+def save_failures(failures, path):
+    """Write a replay failure report as JSONL."""
+    with open(path, "w", encoding="utf-8") as file:
+        for failure in failures:
+            file.write(json.dumps(failure) + "\n")
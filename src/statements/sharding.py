@@ -0,0 +1,117 @@
+import os
+import json
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+
+from statements.sinks import json_default, open_sink
+
+
+def shard_of(doc_id, num_shards):
+    """Stable shard index of a doc id, the same in every process and host."""
+    digest = hashlib.blake2b(str(doc_id).encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") % num_shards
+
+
+def shard_records(records, shard, num_shards, id_key="id"):
+    """Yield the records of an iterable that belong to `shard`."""
+    for record in records:
+        if shard_of(record[id_key], num_shards) == shard:
+            yield record
+
+
+def shard_path(path, shard, num_shards):
+    """Per-shard variant of a file path, e.g. `out.shard-002-of-008.jsonl`."""
+    base, extension = os.path.splitext(path)
+    return f"{base}.shard-{shard:03d}-of-{num_shards:03d}{extension}"
+
+
+def run_sharded(run_shard, num_shards, shards=None, num_processes=None):
+    """
+    Run `run_shard(shard, num_shards)` for each shard in its own process.
+
+    `run_shard` must be a picklable top-level function that builds and runs
+    the extraction for one shard, typically with `asyncio.run`. On several
+    hosts sharing a filesystem, give each host its own `shards`.
+
+    Returns:
+        dict: The return value of `run_shard` for each shard.
+    """
+    shards = list(range(num_shards)) if shards is None else list(shards)
+    results = {}
+    failures = {}
+    with ProcessPoolExecutor(max_workers=num_processes or len(shards)) as executor:
+        futures = {
+            shard: executor.submit(run_shard, shard, num_shards) for shard in shards
+        }
+        for shard, future in futures.items():
+            try:
+                results[shard] = future.result()
+            except Exception as e:
+                print(f"Shard {shard} of {num_shards} failed: {e!r}")
+                failures[shard] = e
+
+    if failures:
+        raise RuntimeError(
+            f"Shards {sorted(failures)} failed; rerun them with resume to complete the run.")
+    return results
+
+
+def doc_id_order(doc_id):
+    """Sort key ordering numeric ids numerically and other ids as strings."""
+    if isinstance(doc_id, (int, float)) and not isinstance(doc_id, bool):
+        return (0, doc_id, "")
+    return (1, 0, str(doc_id))
+
+
+def merge_shards(paths, results_file, messages_file=None):
+    """
+    Merge per-shard result sinks into one results file and one messages file.
+
+    Records are deduplicated on `doc_id`: a later record replaces an earlier
+    one, unless it has no result and the earlier one does. The output is
+    sorted by doc id, so it does not depend on the order in which shards or
+    records completed.
+
+    Args:
+        paths (list): JSONL or SQLite result sink files, see `statements.sinks`.
+        results_file (str): JSONL file receiving one result per record.
+        messages_file (str): Optional JSONL file receiving the logged messages.
+
+    Returns:
+        tuple: The number of merged records and of duplicates dropped.
+    """
+    merged = {}
+    duplicates = 0
+    for path in paths:
+        sink = open_sink(path)
+        try:
+            for record in sink.records():
+                doc_id = record["doc_id"]
+                previous = merged.get(doc_id)
+                if previous is not None:
+                    duplicates += 1
+                    if record.get("result") is None and previous.get("result") is not None:
+                        continue
+                merged[doc_id] = record
+        finally:
+            sink.close()
+
+    order = sorted(merged, key=doc_id_order)
+    for path in (results_file, messages_file):
+        directory = os.path.dirname(path) if path else ""
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    with open(results_file, "w", encoding="utf-8") as file:
+        for doc_id in order:
+            result = merged[doc_id].get("result")
+            if result is not None:
+                file.write(json.dumps(result, default=json_default) + "\n")
+
+    if messages_file:
+        with open(messages_file, "w", encoding="utf-8") as file:
+            for doc_id in order:
+                for message in merged[doc_id].get("messages") or []:
+                    file.write(json.dumps(message, default=json_default) + "\n")
+
+    return len(merged), duplicates
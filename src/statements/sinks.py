@@ -0,0 +1,225 @@
+import os
+import json
+import time
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+
+
+def json_default(obj):
+    """Serialize numpy scalars and other stray objects found in records."""
+    if hasattr(obj, "item"):
+        return obj.item()
+    return str(obj)
+
+
+class DiskThread:
+    """
+    Single thread running the blocking disk calls of a store in submission order.
+
+    Writers on the event loop submit fsyncs, commits and frame writes here
+    instead of waiting on them. An error of a background call is raised by
+    the next call.
+    """
+
+    def __init__(self, name):
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=name)
+        self.error = None
+
+    def submit(self, function, *args):
+        self.check()
+        future = self.executor.submit(function, *args)
+        future.add_done_callback(self.record_error)
+        return future
+
+    def call(self, function, *args):
+        """Run a call on the thread and wait for its result."""
+        return self.submit(function, *args).result()
+
+    def record_error(self, future):
+        if future.exception() is not None and self.error is None:
+            self.error = future.exception()
+
+    def check(self):
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise error
+
+    def close(self):
+        self.executor.shutdown()
+        self.check()
+
+
+class ResultSink:
+    """
+    Base class for append-only stores of completed records.
+
+    Each record is a dict with the `doc_id`, the collated `result` and the
+    `messages` entries the parser logged for it.
+    """
+
+    def write(self, doc_id, result, messages):
+        """Persist one completed record."""
+        raise NotImplementedError
+
+    def records(self):
+        """Iterate over every stored record."""
+        raise NotImplementedError
+
+    def completed_ids(self):
+        """Return the set of doc ids already stored."""
+        return {record["doc_id"] for record in self.records()}
+
+    def flush(self):
+        """Force buffered records to durable storage."""
+
+    def close(self):
+        """Flush and release the underlying storage."""
+
+
+class JsonlResultSink(ResultSink):
+    """
+    Append-only JSONL result file.
+
+    Every record is flushed to the OS immediately, so a crashed or interrupted
+    process loses nothing; an fsync is issued every `fsync_every` records or
+    `fsync_interval` seconds to also survive power loss. These periodic
+    fsyncs run on a background thread, so writes do not wait for the disk;
+    `flush` and `close` wait for it.
+    """
+
+    def __init__(self, path, fsync_every=50, fsync_interval=5.0):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.path = path
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+
+        self.file = None
+        self.disk = None
+        self.pending = 0
+        self.last_sync = time.monotonic()
+
+    def open(self):
+        if self.file is None:
+            self.file = open(self.path, "a", encoding="utf-8")
+            self.disk = DiskThread("jsonl-sink")
+        return self.file
+
+    def write(self, doc_id, result, messages):
+        file = self.open()
+        record = {"doc_id": doc_id, "result": result, "messages": messages}
+        file.write(json.dumps(record, default=json_default) + "\n")
+        file.flush()
+
+        self.pending += 1
+        if self.pending >= self.fsync_every or \
+                time.monotonic() - self.last_sync >= self.fsync_interval:
+            self.disk.submit(os.fsync, file.fileno())
+            self.pending = 0
+            self.last_sync = time.monotonic()
+
+    def records(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r", encoding="utf-8") as file:
+            for line in file:
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    # A torn final line from a crash mid-write; skip it.
+                    continue
+
+    def flush(self):
+        if self.file is not None:
+            self.file.flush()
+            self.disk.call(os.fsync, self.file.fileno())
+        self.pending = 0
+        self.last_sync = time.monotonic()
+
+    def close(self):
+        if self.file is not None:
+            self.flush()
+            self.disk.close()
+            self.file.close()
+            self.file = None
+            self.disk = None
+
+
+class SqliteResultSink(ResultSink):
+    """
+    SQLite result store in WAL mode.
+
+    Records are committed every `commit_every` writes or `commit_interval`
+    seconds. Rewriting a doc id replaces its previous record. Inserts and
+    commits run on a background thread in order, so writes do not wait for
+    the disk; reads, `flush` and `close` wait for the queued writes.
+    """
+
+    def __init__(self, path, commit_every=50, commit_interval=5.0):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.path = path
+        self.commit_every = commit_every
+        self.commit_interval = commit_interval
+
+        self.disk = DiskThread("sqlite-sink")
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            "doc_id TEXT PRIMARY KEY, record TEXT NOT NULL)"
+        )
+        self.connection.commit()
+
+        self.pending = 0
+        self.last_commit = time.monotonic()
+
+    def write(self, doc_id, result, messages):
+        record = {"doc_id": doc_id, "result": result, "messages": messages}
+        self.disk.submit(
+            self.connection.execute,
+            "INSERT OR REPLACE INTO results (doc_id, record) VALUES (?, ?)",
+            (json.dumps(doc_id, default=json_default),
+             json.dumps(record, default=json_default)),
+        )
+
+        self.pending += 1
+        if self.pending >= self.commit_every or \
+                time.monotonic() - self.last_commit >= self.commit_interval:
+            self.disk.submit(self.connection.commit)
+            self.pending = 0
+            self.last_commit = time.monotonic()
+
+    def query(self, sql):
+        return self.disk.call(lambda: self.connection.execute(sql).fetchall())
+
+    def records(self):
+        for (record,) in self.query("SELECT record FROM results ORDER BY rowid"):
+            yield json.loads(record)
+
+    def completed_ids(self):
+        return {json.loads(doc_id) for (doc_id,) in self.query("SELECT doc_id FROM results")}
+
+    def flush(self):
+        self.disk.call(self.connection.commit)
+        self.pending = 0
+        self.last_commit = time.monotonic()
+
+    def close(self):
+        if self.connection is not None:
+            self.flush()
+            self.disk.close()
+            self.connection.close()
+            self.connection = None
+
+
+def open_sink(path, **kwargs):
+    """Open a result sink, SQLite for `.db`, `.sqlite` and `.sqlite3` files and JSONL otherwise."""
+    if os.path.splitext(path)[1].lower() in (".db", ".sqlite", ".sqlite3"):
+        return SqliteResultSink(path, **kwargs)
+    return JsonlResultSink(path, **kwargs)
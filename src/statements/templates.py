@@ -0,0 +1,79 @@
+import re
+import string
+
+
+class PrefixCachedPromptTemplate:
+    """
+    Prompt template rendered as a stable system message and a per-record user message.
+
+    Providers and vLLM cache prompts by prefix, so the static instructions
+    are rendered once per run and sent byte-for-byte identical as the system
+    message of every request. Only the part of the template from the first
+    record variable (or from `split_marker`) onwards is rendered per record.
+
+    Volatile values used in the static part, such as the current time, are
+    passed in `static_values` and frozen when the template is created;
+    callables are evaluated once at that point.
+    """
+
+    def __init__(self, template, record_variables, static_values=None, split_marker=None):
+        self.record_variables = list(record_variables)
+        static_values = {
+            key: value() if callable(value) else value
+            for key, value in (static_values or {}).items()
+        }
+        self.static_values = static_values
+
+        split = self.find_split(template, split_marker)
+        system_template, self.user_template = template[:split], template[split:]
+
+        fields = {
+            name for _, name, _, _ in string.Formatter().parse(system_template) if name
+        }
+        if fields & set(self.record_variables):
+            raise ValueError(
+                f"Record variables {sorted(fields & set(self.record_variables))} "
+                "appear before the split point of the template.")
+
+        self.system = system_template.format(**static_values).strip()
+
+    @classmethod
+    def from_file(cls, template_file, record_variables, **kwargs):
+        """Load the template text from a file."""
+        with open(template_file, "r", encoding="utf-8") as f:
+            template = f.read()
+        return cls(template, record_variables, **kwargs)
+
+    def find_split(self, template, split_marker):
+        """Return the offset where the per-record part of the template starts."""
+        if split_marker is not None:
+            split = template.find(split_marker)
+            if split < 0:
+                raise ValueError(f"Split marker {split_marker!r} not found in template.")
+            return split
+
+        positions = [
+            match.start()
+            for name in self.record_variables
+            for match in re.finditer(r"\{" + re.escape(name) + r"\}", template)
+        ]
+        if not positions:
+            return len(template)
+        # Start the user message at the beginning of the line.
+        return template.rfind("\n", 0, min(positions)) + 1
+
+    def record_values(self, item):
+        """Map a dataset record to the template's record variables."""
+        return {name: item[name] for name in self.record_variables}
+
+    def format_messages(self, item):
+        """Render the system and user messages for a record."""
+        values = {**self.static_values, **self.record_values(item)}
+        return [
+            {"role": "system", "content": self.system},
+            {"role": "user", "content": self.user_template.format(**values).strip()},
+        ]
+
+    def format(self, item):
+        """Render the whole prompt for a record as a single string."""
+        return "\n\n".join(m["content"] for m in self.format_messages(item))
@@ -0,0 +1,341 @@
+import os
+import sys
+import json
+import time
+import random
+import threading
+import contextvars
+from collections import defaultdict
+
+
+class Span:
+    """
+    One timed stage of the pipeline, used as a context manager.
+
+    Spans opened inside another one, in the same task or in tasks it
+    creates, become its children. Attributes can be added while the span is
+    open with `set`. A span left by an exception records the exception type
+    as its error.
+    """
+
+    __slots__ = ("tracer", "name", "trace_id", "span_id", "parent_id", "track",
+                 "attributes", "start", "end", "error", "token")
+
+    def __init__(self, tracer, name, trace_id, parent_id, track, attributes, start=None):
+        self.tracer = tracer
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = random.getrandbits(64)
+        self.parent_id = parent_id
+        self.track = track
+        self.attributes = attributes
+        self.start = time.perf_counter() if start is None else start
+        self.end = None
+        self.error = None
+        self.token = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def __enter__(self):
+        self.token = self.tracer.current.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.end = time.perf_counter()
+        if exc_type is not None:
+            self.error = exc_type.__name__
+        self.tracer.current.reset(self.token)
+        self.tracer.finish(self)
+        return False
+
+
+class NullSpan:
+    """Span that records nothing, returned when tracing is disabled."""
+
+    __slots__ = ()
+
+    def set(self, **attributes):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+NULL_SPAN = NullSpan()
+
+
+class UnsampledSpan(NullSpan):
+    """Root span left out by sampling; its children are not recorded either."""
+
+    __slots__ = ("tracer", "token")
+
+    def __init__(self, tracer):
+        self.tracer = tracer
+        self.token = None
+
+    def __enter__(self):
+        self.token = self.tracer.current.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.tracer.current.reset(self.token)
+        return False
+
+
+class NullTracer:
+    """Tracer that records nothing; its spans cost one call and no allocation."""
+
+    enabled = False
+
+    def span(self, name, **attributes):
+        return NULL_SPAN
+
+    def record(self, name, start, end=None, **attributes):
+        pass
+
+    def set_track(self, track, name=None):
+        pass
+
+    def summary(self):
+        return {}
+
+
+NULL_TRACER = NullTracer()
+
+
+class Tracer:
+    """
+    In-memory tracer of the extraction stages.
+
+    Spans are kept in memory until exported with `export_chrome` (trace
+    event JSON for Perfetto or chrome://tracing) or `export_otlp`
+    (OpenTelemetry OTLP/JSON). Each record is one trace. `sample_rate`
+    keeps that share of the records (root spans) with all their children,
+    and at most `max_spans` spans are kept; later ones are counted in
+    `dropped`.
+
+    Spans carry the track of the task that opened them, set with
+    `set_track`, e.g. one per worker; the Chrome export shows each track as
+    a thread. Concurrent requests of one record share its worker's track.
+    """
+
+    enabled = True
+
+    def __init__(self, sample_rate=1.0, max_spans=1000000, service_name="statements"):
+        self.sample_rate = sample_rate
+        self.max_spans = max_spans
+        self.service_name = service_name
+
+        self.current = contextvars.ContextVar("current_span", default=None)
+        self.track = contextvars.ContextVar("trace_track", default=0)
+        self.track_names = {0: "main"}
+
+        self.spans = []
+        self.dropped = 0
+        self.started = time.perf_counter()
+        self.epoch = time.time() - self.started  # Unix time at perf_counter zero
+
+    def span(self, name, **attributes):
+        """Open a span as a child of the current one, or as the root of a new trace."""
+        parent = self.current.get()
+        if parent is None:
+            if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+                return UnsampledSpan(self)
+            return Span(self, name, random.getrandbits(128), None, self.track.get(), attributes)
+        if parent.__class__ is UnsampledSpan:
+            return NULL_SPAN
+        return Span(self, name, parent.trace_id, parent.span_id, self.track.get(), attributes)
+
+    def record(self, name, start, end=None, **attributes):
+        """Record a finished child span of the current one from `time.perf_counter` times."""
+        parent = self.current.get()
+        if parent is None or parent.__class__ is UnsampledSpan:
+            return
+        span = Span(self, name, parent.trace_id, parent.span_id, self.track.get(),
+                    attributes, start=start)
+        span.end = time.perf_counter() if end is None else end
+        self.finish(span)
+
+    def set_track(self, track, name=None):
+        """Put the spans opened from now on in the current task on `track`."""
+        self.track.set(track)
+        if name:
+            self.track_names[track] = name
+
+    def finish(self, span):
+        if len(self.spans) < self.max_spans:
+            self.spans.append(span)
+        else:
+            self.dropped += 1
+
+    def summary(self):
+        """Count, total, mean, p95 and max seconds per span name, by total time."""
+        durations = defaultdict(list)
+        for span in self.spans:
+            durations[span.name].append(span.end - span.start)
+
+        stats = {}
+        for name, values in durations.items():
+            values.sort()
+            stats[name] = {
+                "count": len(values),
+                "total": sum(values),
+                "mean": sum(values) / len(values),
+                "p95": values[min(len(values) - 1, round(0.95 * (len(values) - 1)))],
+                "max": values[-1],
+            }
+        return dict(sorted(stats.items(), key=lambda item: -item[1]["total"]))
+
+    def export_chrome(self, path):
+        """Write the spans as Chrome trace event JSON, viewable in Perfetto."""
+        pid = os.getpid()
+        events = [
+            {"name": "thread_name", "ph": "M", "pid": pid, "tid": track, "args": {"name": name}}
+            for track, name in self.track_names.items()
+        ]
+        for span in self.spans:
+            args = dict(span.attributes)
+            if span.error:
+                args["error"] = span.error
+            events.append({
+                "name": span.name,
+                "cat": "statements",
+                "ph": "X",
+                "ts": (span.start - self.started) * 1e6,
+                "dur": (span.end - span.start) * 1e6,
+                "pid": pid,
+                "tid": span.track,
+                "args": args,
+            })
+
+        write_json(path, {"traceEvents": events, "displayTimeUnit": "ms"})
+
+    def export_otlp(self, path):
+        """
+        Write the spans as an OTLP/JSON export request on one line.
+
+        The file can be loaded by the OpenTelemetry collector's
+        `otlpjsonfile` receiver or posted to an OTLP/HTTP `/v1/traces`
+        endpoint with `Content-Type: application/json`.
+        """
+        spans = []
+        for span in self.spans:
+            otlp_span = {
+                "traceId": f"{span.trace_id:032x}",
+                "spanId": f"{span.span_id:016x}",
+                "name": span.name,
+                "kind": 1,  # SPAN_KIND_INTERNAL
+                "startTimeUnixNano": str(int((self.epoch + span.start) * 1e9)),
+                "endTimeUnixNano": str(int((self.epoch + span.end) * 1e9)),
+                "attributes": otlp_attributes(
+                    {**span.attributes, "track": self.track_names.get(span.track, span.track)}),
+                "status": {"code": 2, "message": span.error} if span.error else {},
+            }
+            if span.parent_id is not None:
+                otlp_span["parentSpanId"] = f"{span.parent_id:016x}"
+            spans.append(otlp_span)
+
+        request = {"resourceSpans": [{
+            "resource": {"attributes": otlp_attributes({
+                "service.name": self.service_name,
+                "process.pid": os.getpid(),
+            })},
+            "scopeSpans": [{"scope": {"name": "statements.tracing"}, "spans": spans}],
+        }]}
+        write_json(path, request)
+
+
+def otlp_attributes(attributes):
+    """Convert a dict to OTLP key-value attributes."""
+    converted = []
+    for key, value in attributes.items():
+        if value is None:
+            continue
+        if isinstance(value, bool):
+            value = {"boolValue": value}
+        elif isinstance(value, int):
+            value = {"intValue": str(value)}
+        elif isinstance(value, float):
+            value = {"doubleValue": value}
+        else:
+            value = {"stringValue": str(value)}
+        converted.append({"key": key, "value": value})
+    return converted
+
+
+def write_json(path, data):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, default=str)
+        f.write("\n")
+
+
+class SamplingProfiler:
+    """
+    Statistical profiler sampling the stack of one thread every `interval` seconds.
+
+    Started from the event loop thread, it samples the loop and so every
+    worker's coroutine. Samples are aggregated as folded stacks, written by
+    `write_folded` for flamegraph.pl or speedscope. Samples ending in the
+    selector's `select` are time the loop spent waiting for I/O.
+    """
+
+    def __init__(self, interval=0.005, max_depth=64):
+        self.interval = interval
+        self.max_depth = max_depth
+        self.stacks = defaultdict(int)
+        self.samples = 0
+        self.thread_id = None
+        self.thread = None
+        self.stopping = threading.Event()
+
+    def start(self, thread_id=None):
+        """Start sampling the given thread, by default the calling one."""
+        self.thread_id = thread_id or threading.get_ident()
+        self.stopping.clear()
+        self.thread = threading.Thread(target=self.run, name="sampling-profiler", daemon=True)
+        self.thread.start()
+
+    def run(self):
+        while not self.stopping.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None and len(stack) < self.max_depth:
+                code = frame.f_code
+                stack.append(
+                    f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def stop(self):
+        if self.thread is not None:
+            self.stopping.set()
+            self.thread.join()
+            self.thread = None
+
+    def top(self, limit=20):
+        """The functions most often on top of the stack, with their share of the samples."""
+        if not self.samples:
+            return []
+        counts = defaultdict(int)
+        for stack, count in self.stacks.items():
+            counts[stack.rsplit(";", 1)[-1]] += count
+        ordered = sorted(counts.items(), key=lambda item: -item[1])[:limit]
+        return [(frame, count / self.samples) for frame, count in ordered]
+
+    def write_folded(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in sorted(self.stacks.items()):
+                f.write(f"{stack} {count}\n")
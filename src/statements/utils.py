@@ -1,10 +1,47 @@
-from jsonschema import validate, ValidationError
+import os
+import json
+import bisect
+import hashlib
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+
+from jsonschema.validators import validator_for
+
+
+# Characters kept between the end of a truncated text and the end of the
+# encoded prefix, so the kept tokens are not affected by where the prefix was cut.
+PREFIX_MARGIN = 256
+
+
+def token_offsets(encoder, tokens):
+    """
+    Return the character offset in the decoded text at which each token starts.
+
+    Uses `decode_with_offsets` where the encoder provides it (tiktoken), and
+    falls back to decoding tokens one by one otherwise.
+    """
+    if hasattr(encoder, "decode_with_offsets"):
+        try:
+            return encoder.decode_with_offsets(tokens)[1]
+        except UnicodeDecodeError:
+            pass
+
+    offsets = []
+    position = 0
+    for token in tokens:
+        offsets.append(position)
+        position += len(encoder.decode([token]))
+    return offsets
 
 
 def text_chunks(text, encoder, tokens_per_chunk=4096, overlap=256):
     """
     Split a long text into chunks of a given size, ensuring continuity between chunks by overlapping tokens.
 
+    The text is encoded once, and each chunk is sliced from the original text
+    at the character offsets of its first and last token instead of being
+    decoded again.
+
     Args:
         text (str): The text to split into chunks.
         encoder (Encoder): The encoder used to encode the text.
@@ -15,11 +52,15 @@ def text_chunks(text, encoder, tokens_per_chunk=4096, overlap=256):
         list: A list of text chunks.
     """
     tokens = encoder.encode(text)
+    if len(tokens) <= tokens_per_chunk:
+        return [text] if tokens else []
+
+    offsets = token_offsets(encoder, tokens) + [len(text)]
     chunks = []
-    
+
     for i in range(0, len(tokens), tokens_per_chunk - overlap):
-        chunk_tokens = tokens[i:i + tokens_per_chunk]
-        chunks.append(encoder.decode(chunk_tokens))
+        end = min(i + tokens_per_chunk, len(tokens))
+        chunks.append(text[offsets[i]:offsets[end]])
 
         if i + tokens_per_chunk >= len(tokens):  # Stop if the last chunk reaches the end
             break
@@ -27,7 +68,103 @@ def text_chunks(text, encoder, tokens_per_chunk=4096, overlap=256):
     return chunks
 
 
-def text_chunks_by_lines(text, encoder, tokens_per_chunk=4096):
+def iter_text_chunks_by_lines(text, encoder, tokens_per_chunk=4096, overlap=0):
+    """
+    Lazily split a long text into chunks by linebreaks, keeping each chunk under a given size.
+
+    The whole text is encoded once and token offsets are mapped back to line
+    boundaries, so the cost is linear in the length of the text. Chunks are
+    slices of the original text, with line endings preserved. A line longer
+    than `tokens_per_chunk` is split at token boundaries into chunks of its own.
+
+    Args:
+        text (str): The text to split into chunks.
+        encoder (Encoder): The encoder used to encode the text.
+        tokens_per_chunk (int): The maximum number of tokens per chunk.
+        overlap (int): The maximum number of tokens of whole lines repeated
+            from the end of the previous chunk.
+
+    Every chunk is re-encoded before it is yielded: a token spanning a
+    linebreak, or a hard split inside a multibyte character, can make a
+    slice encode to a few more tokens than counted, and such a chunk is
+    split again with the excess taken off the limit. With `overlap=0` the
+    chunks concatenate back to the text.
+
+    Yields:
+        str: The text chunks.
+    """
+    for chunk in _line_chunks(text, encoder, tokens_per_chunk, overlap):
+        excess = len(encoder.encode(chunk)) - tokens_per_chunk
+        if excess <= 0 or excess >= tokens_per_chunk:
+            yield chunk
+        else:
+            yield from iter_text_chunks_by_lines(chunk, encoder, tokens_per_chunk - excess)
+
+
+def _line_chunks(text, encoder, tokens_per_chunk, overlap):
+    if not text:
+        return
+
+    tokens = encoder.encode(text)
+    offsets = token_offsets(encoder, tokens)
+
+    # Character span of every line, including its trailing linebreak.
+    starts = [0]
+    position = text.find("\n")
+    while position != -1 and position + 1 < len(text):
+        starts.append(position + 1)
+        position = text.find("\n", position + 1)
+    ends = starts[1:] + [len(text)]
+
+    # Index of the first token starting in each line; a token spanning a
+    # linebreak belongs to the line it starts in.
+    first_token = [bisect.bisect_left(offsets, start) for start in starts]
+    first_token.append(len(tokens))
+    sizes = [first_token[i + 1] - first_token[i] for i in range(len(starts))]
+
+    chunk_lines = []
+    chunk_tokens = 0
+    for i, size in enumerate(sizes):
+        if size > tokens_per_chunk:
+            if chunk_lines:
+                yield text[starts[chunk_lines[0]]:ends[chunk_lines[-1]]]
+                chunk_lines, chunk_tokens = [], 0
+
+            # Hard split the oversized line at token boundaries.
+            step = tokens_per_chunk - overlap if overlap < tokens_per_chunk else tokens_per_chunk
+            for j in range(first_token[i], first_token[i + 1], step):
+                end = min(j + tokens_per_chunk, first_token[i + 1])
+                start_char = starts[i] if j == first_token[i] else offsets[j]
+                end_char = ends[i] if end == first_token[i + 1] else offsets[end]
+                yield text[start_char:end_char]
+                if end == first_token[i + 1]:
+                    break
+            continue
+
+        if chunk_lines and chunk_tokens + size > tokens_per_chunk:
+            yield text[starts[chunk_lines[0]]:ends[chunk_lines[-1]]]
+
+            # Carry whole trailing lines of the previous chunk as overlap. A
+            # line without tokens of its own continues a token of the line
+            # before, so carrying stops there.
+            carried = []
+            carried_tokens = 0
+            for line in reversed(chunk_lines if overlap > 0 else []):
+                if sizes[line] == 0 or carried_tokens + sizes[line] > overlap or \
+                        carried_tokens + sizes[line] + size > tokens_per_chunk:
+                    break
+                carried.insert(0, line)
+                carried_tokens += sizes[line]
+            chunk_lines, chunk_tokens = carried, carried_tokens
+
+        chunk_lines.append(i)
+        chunk_tokens += size
+
+    if chunk_lines:
+        yield text[starts[chunk_lines[0]]:ends[chunk_lines[-1]]]
+
+
+def text_chunks_by_lines(text, encoder, tokens_per_chunk=4096, overlap=0):
     """
     Split a long text into chunks by linebreaks, while keeping the chunks under a given size.
 
@@ -35,50 +172,402 @@ def text_chunks_by_lines(text, encoder, tokens_per_chunk=4096):
         text (str): The text to split into chunks.
         encoder (Encoder): The encoder used to encode the text.
         tokens_per_chunk (int): The maximum number of tokens per chunk.
+        overlap (int): The maximum number of tokens of whole lines repeated between chunks.
+
+    Returns:
+        list: A list of text chunks. See `iter_text_chunks_by_lines`.
     """
-    lines = text.split("\n")
-    chunks = []
-    chunk = ""
-    num_tokens = 0
-    for line in lines:
-        line_len = len(encoder.encode(line))
-        if num_tokens + line_len > tokens_per_chunk:
-            chunks.append(chunk)
-            chunk = ""
-            num_tokens = 0
-        chunk += line + "\n"
-        num_tokens += line_len
-
-    chunks.append(chunk)
-    return chunks
+    return list(iter_text_chunks_by_lines(text, encoder, tokens_per_chunk, overlap))
+
 
-def truncate_text(text, encoder, max_tokens=4096):
+def truncate_text(text, encoder, max_tokens=4096, chars_per_token=4):
     """
     Truncate a long text to fit within a specified token limit.
 
+    Only a prefix of about `max_tokens * chars_per_token` characters is
+    encoded, doubling it until it holds more than `max_tokens` tokens, so the
+    cost does not grow with the length of the article.
+
     Args:
         text (str): The text to truncate.
         encoder (Encoder): The encoder used to encode the text.
         max_tokens (int): The maximum number of tokens allowed.
+        chars_per_token (int): Initial guess of characters per token.
 
     Returns:
         str: The truncated text.
     """
-    tokens = encoder.encode(text)
-    if len(tokens) < max_tokens:
-        return text
-    
-    tokens = tokens[:max_tokens]
-    return encoder.decode(tokens)
+    return _truncate(text, encoder, max_tokens, chars_per_token)[0]
+
+
+def _truncate(text, encoder, max_tokens, chars_per_token=4):
+    """Truncate a text, also returning its token count when it fits untruncated."""
+    limit = max_tokens * chars_per_token + PREFIX_MARGIN
+    while True:
+        if len(text) <= limit:
+            tokens = encoder.encode(text)
+            if len(tokens) < max_tokens:
+                return text, len(tokens)
+            return encoder.decode(tokens[:max_tokens]), None
+
+        tokens = encoder.encode(text[:limit])
+        if len(tokens) > max_tokens:
+            truncated = encoder.decode(tokens[:max_tokens])
+            if len(truncated) <= limit - PREFIX_MARGIN:
+                return truncated, None
+        limit *= 2
+
+
+class TokenCountCache:
+    """
+    On-disk cache of token counts keyed by a hash of the encoding name and text.
+
+    Lets repeated runs over the same corpus skip encoding texts whose length
+    is already known.
+    """
+
+    def __init__(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS token_counts (key TEXT PRIMARY KEY, tokens INTEGER)")
+        self.connection.commit()
+
+    @staticmethod
+    def key(encoder, text):
+        name = getattr(encoder, "name", "")
+        return hashlib.sha1(f"{name}\0{text}".encode("utf-8")).hexdigest()
+
+    def get_many(self, keys):
+        counts = {}
+        keys = list(keys)
+        for i in range(0, len(keys), 500):
+            batch = keys[i:i + 500]
+            query = "SELECT key, tokens FROM token_counts WHERE key IN ({})".format(
+                ",".join("?" * len(batch)))
+            counts.update(self.connection.execute(query, batch).fetchall())
+        return counts
+
+    def put_many(self, counts):
+        self.connection.executemany(
+            "INSERT OR REPLACE INTO token_counts (key, tokens) VALUES (?, ?)",
+            list(counts.items()),
+        )
+        self.connection.commit()
+
+    def close(self):
+        self.connection.close()
+
+
+def count_tokens(texts, encoder, num_threads=8, cache=None):
+    """
+    Count the tokens of many texts with tiktoken's batch encoder.
+
+    Args:
+        texts (list): The texts to count.
+        encoder (Encoder): The encoder used to encode the texts.
+        num_threads (int): Threads used by the batch encoder.
+        cache (TokenCountCache): Optional on-disk cache of known counts.
+
+    Returns:
+        list: The number of tokens of each text.
+    """
+    texts = list(texts)
+    keys = [TokenCountCache.key(encoder, text) for text in texts] if cache else []
+    known = cache.get_many(set(keys)) if cache else {}
+
+    missing = [i for i in range(len(texts)) if not cache or keys[i] not in known]
+    if hasattr(encoder, "encode_batch"):
+        encoded = encoder.encode_batch([texts[i] for i in missing], num_threads=num_threads)
+    else:
+        encoded = [encoder.encode(texts[i]) for i in missing]
+
+    counts = [known.get(key) for key in keys] if cache else [None] * len(texts)
+    for i, tokens in zip(missing, encoded):
+        counts[i] = len(tokens)
+
+    if cache and missing:
+        cache.put_many({keys[i]: counts[i] for i in missing})
+    return counts
+
+
+def batch_truncate_text(texts, encoder, max_tokens=4096, num_threads=8, cache=None,
+                        chars_per_token=4):
+    """
+    Truncate many texts to a token limit in parallel.
+
+    Texts of up to about `max_tokens * chars_per_token` characters are
+    counted with `count_tokens`, in one batch through the encoder's batch
+    path, and returned untouched when they fit; with a cache, the counts
+    already known are not encoded again. The longer texts, and the short
+    ones over the limit, are truncated with `truncate_text` across a thread
+    pool (tiktoken releases the GIL while encoding).
+
+    Args:
+        texts (list): The texts to truncate.
+        encoder (Encoder): The encoder used to encode the texts.
+        max_tokens (int): The maximum number of tokens allowed.
+        num_threads (int): Threads used for counting and truncating.
+        cache (TokenCountCache): Optional on-disk cache of known counts.
+        chars_per_token (int): Guess of characters per token.
+
+    Returns:
+        list: The truncated texts, in order.
+    """
+    texts = list(texts)
+    limit = max_tokens * chars_per_token + PREFIX_MARGIN
+    short = [i for i, text in enumerate(texts) if len(text) <= limit]
+    counts = count_tokens(
+        [texts[i] for i in short], encoder, num_threads=num_threads, cache=cache)
+    fits = {i for i, count in zip(short, counts) if count < max_tokens}
+
+    results = list(texts)
+    pending = [i for i in range(len(texts)) if i not in fits]
+    if not pending:
+        return results
+
+    def truncate(i):
+        return _truncate(texts[i], encoder, max_tokens, chars_per_token)[0]
+
+    with ThreadPoolExecutor(max_workers=num_threads) as executor:
+        for i, truncated in zip(pending, executor.map(truncate, pending)):
+            results[i] = truncated
+    return results
+
+
+# Keywords the fast path understands; any other keyword disables it.
+FAST_PATH_KEYWORDS = {
+    "type", "enum", "properties", "required", "items", "minimum", "maximum",
+    "additionalProperties", "description", "title", "$schema",
+}
+
+FAST_PATH_TYPES = {
+    "string": lambda v: isinstance(v, str),
+    "number": lambda v: isinstance(v, (int, float)) and not isinstance(v, bool),
+    "integer": lambda v: isinstance(v, int) and not isinstance(v, bool),
+    "boolean": lambda v: isinstance(v, bool),
+    "null": lambda v: v is None,
+    "array": lambda v: isinstance(v, list),
+    "object": lambda v: isinstance(v, dict),
+}
+
+
+def compile_fast_check(schema):
+    """
+    Compile a simple schema into a plain Python predicate.
+
+    The predicate returning True guarantees the instance is valid; returning
+    False only means the full validator has to decide. Returns None when the
+    schema uses keywords outside `FAST_PATH_KEYWORDS`.
+    """
+    if not isinstance(schema, dict) or set(schema) - FAST_PATH_KEYWORDS:
+        return None
+
+    checks = []
+
+    types = schema.get("type")
+    if types is not None:
+        types = [types] if isinstance(types, str) else types
+        if any(t not in FAST_PATH_TYPES for t in types):
+            return None
+        type_checks = [FAST_PATH_TYPES[t] for t in types]
+        checks.append(lambda v: any(check(v) for check in type_checks))
+
+    if "enum" in schema:
+        if not all(isinstance(option, str) for option in schema["enum"]):
+            return None
+        options = set(schema["enum"])
+        checks.append(lambda v: isinstance(v, str) and v in options)
+
+    for keyword, compare in (
+        ("minimum", lambda v, bound: v >= bound),
+        ("maximum", lambda v, bound: v <= bound),
+    ):
+        if keyword in schema:
+            bound = schema[keyword]
+            checks.append(
+                lambda v, bound=bound, compare=compare: not FAST_PATH_TYPES["number"](v)
+                or compare(v, bound))
+
+    if "items" in schema:
+        item_check = compile_fast_check(schema["items"])
+        if item_check is None:
+            return None
+        checks.append(lambda v: not isinstance(v, list) or all(item_check(i) for i in v))
+
+    properties = {}
+    for name, subschema in (schema.get("properties") or {}).items():
+        properties[name] = compile_fast_check(subschema)
+        if properties[name] is None:
+            return None
+    required = list(schema.get("required") or [])
+    additional = schema.get("additionalProperties", True)
+    if not isinstance(additional, bool):
+        return None
+
+    if properties or required or not additional:
+        def check_object(v):
+            if not isinstance(v, dict):
+                return True
+            if any(name not in v for name in required):
+                return False
+            if not additional and any(name not in properties for name in v):
+                return False
+            return all(
+                check(v[name]) for name, check in properties.items() if name in v)
+        checks.append(check_object)
+
+    return lambda v: all(check(v) for check in checks)
+
+
+class SchemaValidator:
+    """
+    A JSON schema compiled once with the Draft validator class it declares.
+
+    Simple schemas additionally get a plain Python fast path that accepts
+    valid instances without going through jsonschema.
+    """
+
+    def __init__(self, schema):
+        validator_class = validator_for(schema)
+        validator_class.check_schema(schema)
+        self.schema = schema
+        self.validator = validator_class(schema)
+        self.fast_check = compile_fast_check(schema)
+
+    def is_valid(self, instance):
+        if self.fast_check is not None and self.fast_check(instance):
+            return True
+        return self.validator.is_valid(instance)
+
+    def errors(self, instance):
+        """Return every validation error as a dict with its path, message and keyword."""
+        if self.fast_check is not None and self.fast_check(instance):
+            return []
+        return [
+            {
+                "path": "/" + "/".join(str(p) for p in error.absolute_path),
+                "message": error.message,
+                "validator": error.validator,
+            }
+            for error in sorted(
+                self.validator.iter_errors(instance), key=lambda e: list(e.absolute_path))
+        ]
+
+
+# Compiled validators keyed by the id of the schema object, which is kept
+# alive alongside, and by the schema's canonical JSON for equal copies.
+_validators_by_id = {}
+_validators_by_json = {}
+
+
+def get_validator(schema):
+    """Return the shared compiled validator for a schema, compiling it on first use."""
+    entry = _validators_by_id.get(id(schema))
+    if entry is not None and entry[0] is schema:
+        return entry[1]
+
+    key = json.dumps(schema, sort_keys=True)
+    validator = _validators_by_json.get(key)
+    if validator is None:
+        validator = _validators_by_json[key] = SchemaValidator(schema)
+    _validators_by_id[id(schema)] = (schema, validator)
+    return validator
+
+
+def schema_errors(json_data, schema):
+    """
+    Validate the parsed JSON data against the defined schema and return the errors.
+
+    Returns:
+        list: A list of {"path", "message", "validator"} dicts, empty when valid.
+    """
+    return get_validator(schema).errors(json_data)
 
 
 def validate_json_with_schema(json_data: dict, schema: dict) -> bool:
     """
     Validate the parsed JSON data against the defined schema.
     """
-    try:
-        validate(instance=json_data, schema=schema)
-        return True
-    except ValidationError as e:
-        print(f"Validation Error: {e.message}")
-        return False
+    return get_validator(schema).is_valid(json_data)
+
+
+def validation_details(parser, parsed_data):
+    """Describe why parsed data failed validation, if the parser can tell."""
+    if not hasattr(parser, "validation_errors"):
+        return ""
+    return "; ".join(
+        f"{error['path']}: {error['message']}"
+        for error in parser.validation_errors(parsed_data)
+    )
+
+
+# Keywords kept when converting a schema for strict structured outputs. Range
+# and format constraints are dropped there and still checked by validation.
+STRICT_SCHEMA_KEYWORDS = {
+    "type", "properties", "items", "required", "enum", "const",
+    "description", "anyOf", "additionalProperties",
+}
+
+
+def strict_json_schema(schema):
+    """
+    Convert a JSON schema to the subset accepted by strict structured outputs.
+
+    Every object gets `additionalProperties: false` and lists all of its
+    properties as required; properties that were optional become nullable
+    instead, as strict mode requires.
+    """
+    if isinstance(schema, list):
+        return [strict_json_schema(s) for s in schema]
+    if not isinstance(schema, dict):
+        return schema
+
+    strict = {
+        key: strict_json_schema(value)
+        for key, value in schema.items()
+        if key in STRICT_SCHEMA_KEYWORDS and key not in ("properties", "required")
+    }
+
+    if "properties" in schema:
+        required = set(schema.get("required", []))
+        properties = {}
+        for name, prop in schema["properties"].items():
+            prop = strict_json_schema(prop)
+            if name not in required:
+                prop = {"anyOf": [prop, {"type": "null"}]}
+            properties[name] = prop
+        strict["properties"] = properties
+        strict["required"] = list(properties)
+
+    if strict.get("type") == "object" or "properties" in strict:
+        strict["additionalProperties"] = False
+    return strict
+
+
+def drop_null_optionals(data, schema):
+    """
+    Remove the null values of optional properties from structured output data.
+
+    `strict_json_schema` makes optional properties required and nullable,
+    so a strict output holds a null where the original schema expects the
+    property to be absent. Dropping them lets the data be validated against
+    the original schema. Properties and array items are followed.
+    """
+    if not isinstance(schema, dict):
+        return data
+
+    if isinstance(data, dict) and "properties" in schema:
+        required = set(schema.get("required", []))
+        properties = schema["properties"]
+        return {
+            key: drop_null_optionals(value, properties.get(key))
+            for key, value in data.items()
+            if value is not None or key in required or key not in properties
+        }
+
+    if isinstance(data, list) and isinstance(schema.get("items"), dict):
+        return [drop_null_optionals(value, schema["items"]) for value in data]
+    return data
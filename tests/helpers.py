@@ -0,0 +1,10 @@
+class ListParser:
+    """Output parser that keeps the collated results and messages in memory."""
+
+    def __init__(self):
+        self.results = {}
+        self.messages = []
+
+    def collate_output(self, item, messages, parsed_data):
+        self.results[item["id"]] = parsed_data
+        self.messages.append({"doc_id": item["id"], **messages})
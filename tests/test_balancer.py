@@ -0,0 +1,74 @@
+import logging
+
+from statements.balancer import PowerOfTwoBalancer
+
+
+def tripped_balancer(endpoints, broken):
+    """Balancer whose `broken` endpoint has tripped and finished its cooldown."""
+    balancer = PowerOfTwoBalancer(failure_threshold=1, cooldown=30.0)
+    for endpoint in endpoints:
+        balancer.state(endpoint)
+    balancer.on_start(broken)
+    balancer.on_failure(broken)
+    state = balancer.state(broken)
+    assert state.state == "open"
+    state.opened_at -= state.cooldown + 1.0
+    return balancer
+
+
+def test_failed_endpoint_is_not_chosen_while_open(caplog):
+    balancer = PowerOfTwoBalancer(failure_threshold=1, cooldown=30.0)
+    balancer.on_start("a")
+    with caplog.at_level(logging.WARNING, logger="statements.balancer"):
+        balancer.on_failure("a")
+    assert caplog.messages == ["Circuit opened for a for 30 seconds."]
+    assert all(balancer.choose(["a", "b"]) == "b" for _ in range(50))
+
+
+def test_concurrent_choices_claim_a_single_probe():
+    balancer = tripped_balancer(["a", "b"], "a")
+    # No request has started yet, as when they all wait on the rate limiter.
+    choices = [balancer.choose(["a", "b"]) for _ in range(200)]
+    assert choices.count("a") == 1
+
+
+def test_cancelled_probe_releases_the_endpoint():
+    balancer = tripped_balancer(["a", "b"], "a")
+    while balancer.choose(["a", "b"]) != "a":
+        pass
+    balancer.on_start("a")
+    balancer.on_cancel("a")  # e.g. a 429 or a lost hedge
+
+    state = balancer.state("a")
+    assert state.state == "half_open"
+    assert not state.probing
+    choices = [balancer.choose(["a", "b"]) for _ in range(200)]
+    assert choices.count("a") == 1
+
+
+def test_probe_success_closes_and_failure_reopens():
+    balancer = tripped_balancer(["a", "b"], "a")
+    while balancer.choose(["a", "b"]) != "a":
+        pass
+    balancer.on_start("a")
+    balancer.on_success("a", 0.1)
+    assert balancer.state("a").state == "closed"
+
+    balancer = tripped_balancer(["a", "b"], "a")
+    cooldown = balancer.state("a").cooldown
+    while balancer.choose(["a", "b"]) != "a":
+        pass
+    balancer.on_start("a")
+    balancer.on_failure("a")
+    assert balancer.state("a").state == "open"
+    assert balancer.state("a").cooldown == 2 * cooldown
+
+
+def test_stale_probe_claim_expires():
+    balancer = tripped_balancer(["a", "b"], "a")
+    while balancer.choose(["a", "b"]) != "a":
+        pass
+    # The request was dropped before being sent, so it never settles.
+    state = balancer.state("a")
+    state.probe_started -= state.cooldown + 1.0
+    assert any(balancer.choose(["a", "b"]) == "a" for _ in range(200))
@@ -0,0 +1,122 @@
+import json
+import asyncio
+
+import httpx
+import pytest
+
+from statements.chat_client import ChatClient, ChatModel
+from statements.chunking import Chunker
+from statements.extractor import Extractor
+
+
+class BatchServer:
+    """In-memory `/v1/files` and `/v1/batches` endpoints for an httpx MockTransport."""
+
+    def __init__(self):
+        self.files = {}
+        self.batches = {}
+        self.interrupted = False
+
+    def handle(self, request):
+        path = request.url.path
+        if path == "/v1/files":
+            lines = [line for line in request.content.decode().splitlines()
+                     if line.startswith('{"custom_id"')]
+            return self.add_file("\n".join(lines))
+        if path == "/v1/batches":
+            body = json.loads(request.content)
+            batch_id = f"batch-{len(self.batches)}"
+            self.batches[batch_id] = {
+                "id": batch_id, "status": "in_progress", "input_file_id": body["input_file_id"]}
+            return httpx.Response(200, json=self.batches[batch_id])
+        if path.startswith("/v1/batches/"):
+            if self.interrupted:
+                raise httpx.ConnectError("interrupted")
+            return httpx.Response(200, json=self.complete(path.rsplit("/", 1)[-1]))
+        if path.endswith("/content"):
+            return httpx.Response(200, text=self.files[path.split("/")[3]])
+        return httpx.Response(404)
+
+    def add_file(self, content):
+        file_id = f"file-{len(self.files)}"
+        self.files[file_id] = content
+        return httpx.Response(200, json={"id": file_id})
+
+    def complete(self, batch_id):
+        batch = self.batches[batch_id]
+        if batch["status"] != "completed":
+            output = []
+            for line in self.files[batch["input_file_id"]].splitlines():
+                request = json.loads(line)
+                content = request["body"]["messages"][-1]["content"]
+                output.append(json.dumps({"custom_id": request["custom_id"], "response": {
+                    "status_code": 200,
+                    "body": {"choices": [{"message": {"role": "assistant", "content": content}}]},
+                }}))
+            batch["output_file_id"] = json.loads(self.add_file("\n".join(output)).content)["id"]
+            batch["status"] = "completed"
+        return batch
+
+
+class EchoTemplate:
+    def format(self, item):
+        return f"record {item['id']}"
+
+
+class EchoParser:
+    def __init__(self):
+        self.results = {}
+        self.messages = []
+
+    def parse(self, raw_output):
+        return {"echo": raw_output}
+
+    def validate_output(self, parsed_data):
+        return True
+
+    def collate_output(self, item, messages, parsed_data):
+        self.results[item["id"]] = parsed_data
+        self.messages.append({"doc_id": item["id"], **messages})
+
+
+def make_extractor(server, **kwargs):
+    client = ChatClient()
+    client.client = httpx.AsyncClient(transport=httpx.MockTransport(server.handle))
+    return Extractor(
+        model=ChatModel("test-model", ["http://batch.test"], api_key="test"),
+        dataset=[{"id": i, "text": "x"} for i in range(7)],
+        client=client,
+        prompt_template=EchoTemplate(),
+        output_parser=EchoParser(),
+        **kwargs,
+    )
+
+
+async def run_batch(extractor, batch_dir):
+    try:
+        await extractor.run_batch(batch_dir, batch_size=3, poll_interval=0)
+    finally:
+        await extractor.close()
+
+
+def test_interrupted_run_resumes_without_resubmitting(tmp_path):
+    batch_dir = str(tmp_path / "batches")
+    server = BatchServer()
+    server.interrupted = True
+    with pytest.raises(httpx.ConnectError):
+        asyncio.run(run_batch(make_extractor(server), batch_dir))
+    assert len(server.batches) == 3
+
+    server.interrupted = False
+    extractor = make_extractor(server)
+    asyncio.run(run_batch(extractor, batch_dir))
+
+    assert len(server.batches) == 3  # Nothing submitted again
+    assert extractor.parser.results == {i: {"echo": f"record {i}"} for i in range(7)}
+    assert not (tmp_path / "batches" / "batches.json").exists()
+
+
+def test_chunked_extraction_is_rejected(tmp_path):
+    extractor = make_extractor(BatchServer(), chunker=Chunker(encoder=None))
+    with pytest.raises(ValueError, match="Chunked"):
+        asyncio.run(run_batch(extractor, str(tmp_path / "batches")))
@@ -0,0 +1,38 @@
+import asyncio
+import sqlite3
+import threading
+
+from statements.cache import ResponseCache
+
+
+def accessed_times(path):
+    with sqlite3.connect(path) as connection:
+        return dict(connection.execute("SELECT key, accessed FROM responses"))
+
+
+def test_lookups_run_off_the_loop_and_do_not_write(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = ResponseCache(path)
+    threads = set()
+    get = cache.get
+
+    def recording_get(key):
+        threads.add(threading.get_ident())
+        return get(key)
+
+    cache.get = recording_get
+
+    async def run():
+        await cache.store("a", "model", {"choices": []})
+        before = accessed_times(path)
+        assert await cache.lookup("a") == {"choices": []}
+        assert await cache.lookup("b") is None
+        assert accessed_times(path) == before
+        return before
+
+    before = asyncio.run(run())
+    assert threads and threading.get_ident() not in threads
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+    cache.close()  # Saves the access time of the hit
+    assert accessed_times(path)["a"] > before["a"]
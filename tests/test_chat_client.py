@@ -0,0 +1,59 @@
+import asyncio
+
+import httpx
+import pytest
+
+from statements.chat_client import ChatClient, DeepSeekChatModel, OpenAIChatModel
+from statements.exceptions import BadResponseException
+
+
+def test_backoff_shim_forwards_to_the_limiters():
+    client = ChatClient()
+    first = client.limiters.get(("openai", "gpt-4o-mini", "https://a"))
+    second = client.limiters.get(("openai", "gpt-4o-mini", "https://b"))
+
+    with pytest.warns(DeprecationWarning):
+        client.set_backoff(4.0)
+    assert first.backoff == second.backoff == 4.0
+
+    second.set_backoff(8.0)
+    with pytest.warns(DeprecationWarning):
+        assert client.backoff == 8.0
+
+    with pytest.warns(DeprecationWarning):
+        client.backoff = 100.0
+    assert first.backoff == first.max_backoff
+
+    asyncio.run(client.close())
+
+
+def test_rate_limits_are_scoped_by_provider_model_and_endpoint():
+    requests = []
+
+    def handle(request):
+        requests.append(request)
+        if len(requests) == 1:
+            return httpx.Response(429, headers={"retry-after": "30"})
+        return httpx.Response(200, json={"choices": [{"message": {"content": "ok"}}]})
+
+    client = ChatClient()
+    client.client = httpx.AsyncClient(transport=httpx.MockTransport(handle))
+    endpoint = "http://a"
+
+    async def run():
+        # Only the first request is throttled; the others must not wait for it.
+        with pytest.raises(BadResponseException):
+            await client.chat_completions(
+                "hi", model=OpenAIChatModel("throttled", [endpoint], "test"))
+        await client.chat_completions("hi", model=OpenAIChatModel("other", [endpoint], "test"))
+        await client.chat_completions(
+            "hi", model=DeepSeekChatModel("throttled", [endpoint], "test"))
+        await client.close()
+
+    asyncio.run(run())
+    limiters = client.limiters.snapshot()
+    assert set(limiters) == {
+        "openai/throttled/http://a", "openai/other/http://a", "deepseek/throttled/http://a"}
+    assert limiters["openai/throttled/http://a"]["blocked_for"] > 20
+    assert limiters["openai/other/http://a"]["blocked_for"] == 0.0
+    assert limiters["deepseek/throttled/http://a"]["blocked_for"] == 0.0
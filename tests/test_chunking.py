@@ -0,0 +1,51 @@
+import random
+
+import pytest
+
+from statements.utils import text_chunks_by_lines
+
+tiktoken = pytest.importorskip("tiktoken")
+
+
+@pytest.fixture(scope="module")
+def encoder():
+    """Small byte-level BPE with merges across linebreaks and inside a multibyte character."""
+    ranks = {bytes([i]): i for i in range(256)}
+    merges = [b"th", b"he", b"in", b" t", b"the", b" the", b"\n\n", b".\n", "é".encode()]
+    for rank, merge in enumerate(merges, start=256):
+        ranks[merge] = rank
+    pattern = r"""'s|'t|'re|'ve|'m|'ll|'d| ?\p{L}+| ?\p{N}+| ?[^\s\p{L}\p{N}]+|\s+(?!\S)|\s+"""
+    return tiktoken.Encoding(
+        name="test", pat_str=pattern, mergeable_ranks=ranks, special_tokens={})
+
+
+WORDS = ["the", "then", "in", "é", "中文", "a.", "x", "\n", "\n\n", "\n\n\n", " "]
+
+
+def random_texts(count=300):
+    for seed in range(count):
+        rng = random.Random(seed)
+        yield "".join(rng.choice(WORDS) + rng.choice([" ", ""])
+                      for _ in range(rng.randint(1, 300)))
+
+
+@pytest.mark.parametrize("tokens_per_chunk", [4, 7, 20])
+def test_chunks_without_overlap_rebuild_the_text(encoder, tokens_per_chunk):
+    for text in random_texts():
+        assert "".join(text_chunks_by_lines(text, encoder, tokens_per_chunk)) == text
+
+
+@pytest.mark.parametrize("tokens_per_chunk,overlap", [(4, 0), (7, 0), (20, 0), (20, 5)])
+def test_chunks_fit_the_limit_once_encoded(encoder, tokens_per_chunk, overlap):
+    for text in random_texts():
+        for chunk in text_chunks_by_lines(text, encoder, tokens_per_chunk, overlap):
+            assert len(encoder.encode(chunk)) <= tokens_per_chunk
+
+
+def test_overlap_repeats_whole_lines(encoder):
+    text = "".join(f"line {i}\n" for i in range(20))
+    chunks = text_chunks_by_lines(text, encoder, tokens_per_chunk=30, overlap=8)
+    assert len(chunks) > 1
+    for previous, chunk in zip(chunks, chunks[1:]):
+        first_line = chunk.splitlines(keepends=True)[0]
+        assert previous.endswith(first_line)
@@ -0,0 +1,48 @@
+import math
+
+import pytest
+
+from statements.classification import LabelClassifier, softmax
+
+
+def completion(content, logprobs):
+    return {"choices": [{"message": {"content": content}, "logprobs": {"content": logprobs}}]}
+
+
+def top(*pairs):
+    return [{"token": token, "logprob": logprob} for token, logprob in pairs]
+
+
+def test_missing_label_gets_the_lowest_seen_logprob():
+    classifier = LabelClassifier(["Left", "Center", "Right"], label_values=["left", "center", "right"])
+    entry = {"token": "A", "logprob": -0.1,
+             "top_logprobs": top(("A", -0.1), (" A", -3.0), ("B", -2.5), ("The", -6.0))}
+    result = classifier.parse(completion("A", [entry]))
+
+    left = math.log(math.exp(-0.1) + math.exp(-3.0))
+    assert result["logit_scores"] == pytest.approx({"Left": left, "Center": -2.5, "Right": -6.0})
+    expected = softmax([left, -2.5, -6.0])
+    assert list(result["softmax_probabilities"].values()) == pytest.approx(expected.tolist())
+    assert sum(result["softmax_probabilities"].values()) == pytest.approx(1.0)
+    assert result["label"] == "left"
+    assert result["reasoning"] == ""
+
+
+def test_answer_is_read_after_the_marker_with_reasoning():
+    classifier = LabelClassifier(["Left", "Right"], reasoning=True)
+    logprobs = top(("It", -0.2), (" leans", -0.3), (" right", -0.1), (".\n", -0.1),
+                   ("Answer", -0.01), (":", -0.01))
+    logprobs.append({"token": " B", "logprob": -0.05,
+                     "top_logprobs": top((" B", -0.05), (" Left", -4.0))})
+    result = classifier.parse(completion("It leans right.\nAnswer: B", logprobs))
+
+    assert result["logit_scores"] == {"Left": -4.0, "Right": -0.05}
+    assert result["label"] == "Right"
+    assert result["reasoning"] == "It leans right."
+
+
+def test_no_answer_key_among_the_top_tokens_is_an_error():
+    classifier = LabelClassifier(["Left", "Right"])
+    entry = {"token": "The", "logprob": -0.1, "top_logprobs": top(("The", -0.1), ("I", -2.0))}
+    with pytest.raises(ValueError):
+        classifier.parse(completion("The", [entry]))
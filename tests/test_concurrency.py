@@ -0,0 +1,73 @@
+import asyncio
+
+import pytest
+
+from statements import concurrency
+from statements.concurrency import AdaptiveConcurrency
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(concurrency.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_limit_grows_by_one_per_window_of_successes():
+    limiter = AdaptiveConcurrency(max_limit=64, initial=4)
+    for _ in range(4):
+        limiter.on_success(0.1)
+    assert 4.9 < limiter.limit < 5.0
+    for _ in range(100):
+        limiter.on_success(0.1)
+    assert limiter.limit > 15
+
+
+def test_429s_cut_the_limit_once_per_round_trip(clock):
+    limiter = AdaptiveConcurrency(max_limit=64, initial=32)
+    limiter.on_success(2.0)
+    start = limiter.limit
+
+    limiter.on_rate_limited()
+    assert limiter.limit == pytest.approx(start / 2)
+    limiter.on_rate_limited()  # Same burst
+    assert limiter.limit == pytest.approx(start / 2)
+
+    clock[0] += 2.5
+    limiter.on_rate_limited()
+    assert limiter.limit == pytest.approx(start / 4)
+    for _ in range(10):
+        clock[0] += 2.5
+        limiter.on_failure()
+    assert limiter.limit == limiter.min_limit
+
+
+def test_rising_latency_shrinks_the_limit(clock):
+    limiter = AdaptiveConcurrency(max_limit=64, initial=10, alpha=1.0)
+    limiter.on_success(0.1)
+    clock[0] += 1.0
+    limiter.on_success(0.5)  # Five times the baseline
+    assert limiter.limit == pytest.approx((10 + 0.1) * 0.9)
+
+
+def test_rpm_budget_caps_the_limit():
+    limiter = AdaptiveConcurrency(max_limit=64, initial=32, rpm=600)
+    limiter.on_success(0.5)
+    # 10 requests per second at 0.5 seconds each keep 5 in flight.
+    assert limiter.limit == pytest.approx(5.0)
+
+
+def test_acquire_waits_for_a_free_slot():
+    limiter = AdaptiveConcurrency(max_limit=2, initial=2)
+
+    async def run():
+        await limiter.acquire()
+        await limiter.acquire()
+        waiting = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0.01)
+        assert not waiting.done()
+        await limiter.release()
+        await asyncio.wait_for(waiting, 1.0)
+        assert limiter.in_flight == 2
+
+    asyncio.run(run())
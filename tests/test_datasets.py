@@ -0,0 +1,61 @@
+import json
+import asyncio
+
+import pytest
+
+from statements.datasets import read_records
+from statements.sharding import shard_of
+
+
+RECORDS = [{"id": i, "text": f"article {i}"} for i in range(25)]
+
+
+@pytest.fixture(params=["csv", "jsonl"])
+def data_file(request, tmp_path):
+    path = tmp_path / f"records.{request.param}"
+    if request.param == "csv":
+        lines = ["id,text"] + [f"{r['id']},{r['text']}" for r in RECORDS]
+    else:
+        lines = [json.dumps(r) for r in RECORDS] + [""]  # Blank lines are skipped
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    return str(path)
+
+
+@pytest.mark.parametrize("start, end", [(0, None), (0, 25), (3, 17), (7, 8), (10, 10), (20, 40)])
+def test_window_across_chunks(data_file, start, end):
+    reader = read_records(data_file, chunksize=4, start=start, end=end)
+    assert list(reader) == RECORDS[start:end]
+
+
+def test_shards_partition_the_window(data_file):
+    shards = [
+        list(read_records(data_file, chunksize=4, start=5, end=20, shard=(shard, 3)))
+        for shard in range(3)
+    ]
+    assert sorted((r for shard in shards for r in shard), key=lambda r: r["id"]) == RECORDS[5:20]
+    for shard, records in enumerate(shards):
+        assert all(shard_of(r["id"], 3) == shard for r in records)
+
+
+def test_transform_runs_after_sharding_and_async_iteration_matches(data_file):
+    seen = []
+
+    def transform(record):
+        seen.append(record["id"])
+        return {**record, "text": record["text"].upper()}
+
+    reader = read_records(data_file, chunksize=4, end=12, shard=(0, 2), transform=transform)
+
+    async def collect():
+        return [record async for record in reader]
+
+    records = asyncio.run(collect())
+    assert records == list(reader)
+    assert [r["id"] for r in records] == seen[:len(records)]
+    assert all(shard_of(i, 2) == 0 for i in seen)
+    assert all(r["text"] == f"ARTICLE {r['id']}" for r in records)
+
+
+def test_unknown_format_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        read_records(str(tmp_path / "records.txt"))
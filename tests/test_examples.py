@@ -0,0 +1,12 @@
+import importlib
+
+import pytest
+
+
+@pytest.mark.parametrize("name", [
+    "examples.label_ideologies",
+    "examples.label_ideologies_sharded",
+    "examples.replay_ideologies",
+])
+def test_example_scripts_import(name):
+    importlib.import_module(name)
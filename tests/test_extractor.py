@@ -0,0 +1,54 @@
+import pickle
+
+from statements.chat_client import ChatClient, ChatModel
+from statements.extractor import Extractor
+from statements.postprocess import stateless_parser
+from statements.sinks import ResultSink
+from tests.helpers import ListParser
+
+
+class ListSink(ResultSink):
+    def __init__(self):
+        self.rows = []
+
+    def write(self, doc_id, result, messages):
+        self.rows.append(doc_id)
+
+
+def make_extractor(parser, sink):
+    return Extractor(
+        model=ChatModel("test-model", ["http://localhost:1"], api_key="test"),
+        dataset=[],
+        client=ChatClient(),
+        prompt_template=None,
+        output_parser=parser,
+        sink=sink,
+        postprocess="thread",
+    )
+
+
+def test_records_reach_the_sink_as_they_complete():
+    parser, sink = ListParser(), ListSink()
+    parser.results["restored"] = {}
+    parser.messages.append({"doc_id": "restored"})
+    extractor = make_extractor(parser, sink)
+    extractor.order = []
+
+    for idx in (2, 0, 3, 1):
+        extractor.finish(idx, ({"id": f"r{idx}"}, {"input": idx}, {"idx": idx}))
+        # Nothing waits behind the oldest record still in progress.
+        assert sink.rows[-1] == f"r{idx}"
+
+    extractor.sort_output()
+    assert list(parser.results) == ["restored", "r0", "r1", "r2", "r3"]
+    assert [m["doc_id"] for m in parser.messages] == ["restored", "r0", "r1", "r2", "r3"]
+
+
+def test_worker_parser_copy_leaves_the_collated_output_behind():
+    parser = ListParser()
+    parser.results.update({i: {"value": i} for i in range(1000)})
+    parser.messages.extend({"doc_id": i} for i in range(1000))
+
+    clone = pickle.loads(pickle.dumps(stateless_parser(parser)))
+    assert clone.results == {} and clone.messages == []
+    assert len(parser.results) == 1000
@@ -0,0 +1,41 @@
+from statements.hedging import HedgePolicy
+from statements.metrics import Metrics
+
+
+def observed(latencies):
+    metrics = Metrics()
+    for latency in latencies:
+        metrics.observe("request_latency", latency)
+    return metrics
+
+
+def test_no_hedging_before_enough_samples():
+    policy = HedgePolicy(min_samples=50)
+    assert policy.delay(observed([1.0] * 49)) is None
+
+
+def test_delay_is_the_latency_percentile_refreshed_periodically():
+    policy = HedgePolicy(percentile=95, min_delay=0.5, refresh=10)
+    metrics = observed([i / 10 for i in range(1, 101)])  # 0.1 to 10 seconds
+    assert policy.delay(metrics) == 9.5
+
+    for latency in [30.0] * 100:
+        metrics.observe("request_latency", latency)
+    assert all(policy.delay(metrics) == 9.5 for _ in range(9))
+    assert policy.delay(metrics) == 30.0
+
+
+def test_delay_is_at_least_min_delay():
+    policy = HedgePolicy(min_delay=2.0)
+    assert policy.delay(observed([0.1] * 100)) == 2.0
+
+
+def test_hedges_are_capped_at_the_budget():
+    policy = HedgePolicy(max_rate=0.05, min_samples=1)
+    metrics = observed([1.0])
+    allowed = 0
+    for _ in range(200):
+        policy.delay(metrics)
+        allowed += policy.allow()
+    assert allowed == 10
+    assert policy.hedges == 10
@@ -0,0 +1,76 @@
+import time
+
+import pytest
+
+from statements.exceptions import MarkdownParseException
+from statements.markdown_parser import Field, MarkdownParser
+
+
+PARSER = MarkdownParser([
+    Field("bias", "Potential Bias", kind="group", repeated=True, required=False, children=[
+        Field("text", "Bias"),
+        Field("favoring", "Bias Favoring", kind="label"),
+    ]),
+    Field("scores", "Logit Scores", kind="group", children=[
+        Field("left", "Left", kind="number"),
+        Field("right", "Right", kind="number", nullable=True),
+    ]),
+    Field("share", "Left Share", kind="percent"),
+    Field("label", "Categorical Label", kind="label"),
+], preamble="reasoning")
+
+OUTPUT = """Reasoning:
+The article quotes both campaigns.
+
+---
+
+- **Potential Bias**:
+  - **Bias**: Emphasis on one candidate.
+    It continues on the next line.
+  - **Bias Favoring**: **Left**
+- **Logit Scores**:
+  - **Left**: -1.5
+      - __Right__ : NA
+- Left Share: 42.5%
+- **Categorical Label:** center
+"""
+
+
+def test_parse_nested_fields():
+    assert PARSER.parse(OUTPUT) == {
+        "reasoning": "Reasoning:\nThe article quotes both campaigns.",
+        "bias": [{
+            "text": "Emphasis on one candidate.\nIt continues on the next line.",
+            "favoring": "left",
+        }],
+        "scores": {"left": -1.5, "right": None},
+        "share": 0.425,
+        "label": "center",
+    }
+
+
+def test_parse_reports_failed_fields():
+    text = OUTPUT.replace("-1.5", "unknown").replace("- **Categorical Label:** center\n", "")
+    with pytest.raises(MarkdownParseException) as error:
+        PARSER.parse(text)
+    assert error.value.fields == ["scores.left", "label"]
+
+
+def test_is_complete_waits_for_every_required_field():
+    lines = OUTPUT.splitlines(keepends=True)
+    assert not PARSER.is_complete("".join(lines[:-1]))
+    assert not PARSER.is_complete(OUTPUT.rstrip("\n"))  # Last line may still grow
+    assert PARSER.is_complete(OUTPUT)
+
+
+@pytest.mark.parametrize("line", [
+    "a" + " " * 5000 + "b",
+    "a" + " " * 5000 + ".:",
+    " " * 5000 + ".",
+    "Left" + " \t" * 2500 + "- x",
+    "word " * 2000 + "(see: below)",
+], ids=["spaces", "spaces-colon", "indent", "mixed-whitespace", "prose-colon"])
+def test_long_lines_that_are_not_labels_parse_in_linear_time(line):
+    started = time.perf_counter()
+    PARSER.scan(OUTPUT + line + "\n")
+    assert time.perf_counter() - started < 0.5
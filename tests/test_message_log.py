@@ -0,0 +1,80 @@
+import json
+import threading
+
+from statements.message_log import MessageLog, read_message_log
+
+
+INSTRUCTIONS = "".join(f"Instruction {i}: label the article.\n" for i in range(20))
+
+
+def entry(doc_id, prompt):
+    return {"doc_id": doc_id, "input": prompt, "output": {"choices": []}}
+
+
+def test_string_prompts_share_a_stored_prefix(tmp_path):
+    path = str(tmp_path / "messages.jsonl.gz")
+    log = MessageLog(path, frame_size=2)
+    entries = [entry(i, f"{INSTRUCTIONS}Article {i}: text {i}") for i in range(5)]
+    compacted = [log.compact(e) for e in entries]
+    for e in compacted:
+        log.write(e)
+    log.close()
+
+    assert compacted[0]["input"] == entries[0]["input"]  # Nothing to compare with yet
+    assert all(e["input"]["suffix"].startswith("Article") for e in compacted[1:])
+    assert [log.expand(e) for e in compacted] == entries
+    assert list(read_message_log(path)) == entries
+
+
+def test_system_messages_are_stored_once(tmp_path):
+    path = str(tmp_path / "messages.jsonl")
+    log = MessageLog(path)
+    for i in range(3):
+        log.write(log.compact(entry(i, [
+            {"role": "system", "content": INSTRUCTIONS},
+            {"role": "user", "content": f"Article {i}"},
+        ])))
+    log.close()
+
+    with open(path, encoding="utf-8") as f:
+        lines = [json.loads(line) for line in f]
+    assert sum("template" in line for line in lines) == 1
+    assert [e["input"][0]["content"] for e in read_message_log(path)] == [INSTRUCTIONS] * 3
+
+
+def test_reopened_log_expands_restored_entries(tmp_path):
+    path = str(tmp_path / "messages.jsonl.gz")
+    log = MessageLog(path)
+    first, second = (log.compact(entry(i, f"{INSTRUCTIONS}Article {i}")) for i in range(2))
+    log.write(first)
+    log.write(second)
+    # The new template is flushed with its first record, before any sink row refers to it.
+    assert log.buffer == []
+    log.close()
+
+    resumed = MessageLog(path)
+    assert resumed.expand(second)["input"] == f"{INSTRUCTIONS}Article 1"
+    compacted = resumed.compact(entry(2, f"{INSTRUCTIONS}Article 2"))
+    assert compacted["input"]["template"] == second["input"]["template"]
+    resumed.write(compacted)
+    resumed.close()
+    assert sum(1 for _ in read_message_log(path)) == 3
+
+
+def test_frames_are_written_off_the_calling_thread(tmp_path, monkeypatch):
+    threads = set()
+    write_frame = MessageLog.write_frame
+
+    def recording_write_frame(self, data):
+        threads.add(threading.get_ident())
+        write_frame(self, data)
+
+    monkeypatch.setattr(MessageLog, "write_frame", recording_write_frame)
+    path = str(tmp_path / "messages.jsonl.gz")
+    log = MessageLog(path, frame_size=5)
+    for i in range(20):
+        log.write(log.compact(entry(i, f"prompt {i}")))
+    log.close()
+
+    assert threads and threading.get_ident() not in threads
+    assert [e["doc_id"] for e in read_message_log(path)] == list(range(20))
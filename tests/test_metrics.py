@@ -0,0 +1,50 @@
+import json
+
+import pytest
+
+from statements.metrics import Metrics
+
+
+def make_metrics():
+    metrics = Metrics(prices={"m": {"prompt": 1.0, "completion": 2.0, "cached": 0.5}})
+    metrics.increment("requests", 3)
+    metrics.set_gauge("in_flight", 2)
+    metrics.observe("request_latency", 0.2, buckets=(0.1, 1.0))
+    metrics.observe("request_latency", 0.5)
+    metrics.observe("request_latency", 5.0)
+    metrics.record_usage("m", 1000, 500, cached_tokens=400)
+    return metrics
+
+
+def test_prometheus_text_output():
+    assert make_metrics().to_prometheus().splitlines() == [
+        "# TYPE statements_requests_total counter",
+        "statements_requests_total 3",
+        "# TYPE statements_in_flight gauge",
+        "statements_in_flight 2",
+        "# TYPE statements_request_latency_seconds histogram",
+        'statements_request_latency_seconds_bucket{le="0.1"} 0',
+        'statements_request_latency_seconds_bucket{le="1.0"} 2',
+        'statements_request_latency_seconds_bucket{le="+Inf"} 3',
+        "statements_request_latency_seconds_sum 5.7",
+        "statements_request_latency_seconds_count 3",
+        "# TYPE statements_tokens_total counter",
+        'statements_tokens_total{model="m",kind="prompt"} 1000',
+        'statements_tokens_total{model="m",kind="completion"} 500',
+        'statements_tokens_total{model="m",kind="cached"} 400',
+        "# TYPE statements_cost_usd_total counter",
+        'statements_cost_usd_total{model="m"} 0.0018',
+    ]
+
+
+def test_export_writes_json_and_prometheus_files(tmp_path):
+    metrics = make_metrics()
+    metrics.export(str(tmp_path))
+
+    with open(tmp_path / "metrics.json", encoding="utf-8") as f:
+        snapshot = json.load(f)
+    assert snapshot["counters"] == {"requests": 3}
+    assert snapshot["histograms"]["request_latency"]["p50"] == 0.5
+    assert snapshot["models"]["m"]["cost_usd"] == pytest.approx(0.0018)
+    assert (tmp_path / "metrics.prom").read_text(encoding="utf-8") == metrics.to_prometheus()
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["metrics.json", "metrics.prom"]
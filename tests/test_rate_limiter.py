@@ -0,0 +1,62 @@
+import pytest
+
+from statements import rate_limiter
+from statements.rate_limiter import TokenBucket, parse_duration
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(rate_limiter.time, "monotonic", clock)
+    return clock
+
+
+@pytest.mark.parametrize("value, seconds", [
+    ("1m30s", 90.0),
+    ("250ms", 0.25),
+    ("6m0s", 360.0),
+    ("1h2m3.5s", 3723.5),
+    ("20", 20.0),
+    ("0.5", 0.5),
+])
+def test_parse_duration(value, seconds):
+    assert parse_duration(value) == pytest.approx(seconds)
+
+
+@pytest.mark.parametrize("value", [None, "", "soon", "1x"])
+def test_parse_duration_rejects_unknown_values(value):
+    assert parse_duration(value) is None
+
+
+def test_bucket_refills_at_its_rate_up_to_capacity(clock):
+    bucket = TokenBucket(rate=2.0, capacity=10.0)
+    assert bucket.reserve(10) == 0.0
+    assert bucket.level == 0.0
+
+    clock.now += 2.0
+    bucket.refill()
+    assert bucket.level == pytest.approx(4.0)
+
+    clock.now += 100.0
+    bucket.refill()
+    assert bucket.level == 10.0
+
+
+def test_reservations_past_empty_wait_in_order(clock):
+    bucket = TokenBucket(rate=2.0, capacity=10.0)
+    bucket.reserve(10)
+    assert bucket.reserve(4) == pytest.approx(2.0)
+    assert bucket.reserve(4) == pytest.approx(4.0)
+
+    clock.now += 4.0
+    assert bucket.reserve(0) == 0.0  # Both reservations are covered
+    # At most a full bucket is waited for.
+    assert bucket.reserve(50) == pytest.approx(5.0)
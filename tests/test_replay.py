@@ -0,0 +1,49 @@
+import json
+
+from statements.chunking import FieldReducer
+from statements.replay import replay_messages
+
+
+class ScoreParser:
+    def __init__(self):
+        self.results = {}
+        self.messages = []
+
+    def parse(self, raw_output):
+        return {"score": float(raw_output)}
+
+    def validate_output(self, parsed_data):
+        return 0 <= parsed_data["score"] <= 1
+
+    def collate_output(self, item, messages, parsed_data):
+        self.results[item["id"]] = parsed_data
+        self.messages.append({"doc_id": item["id"], **messages})
+
+
+def completion(content):
+    return {"choices": [{"message": {"role": "assistant", "content": content}}]}
+
+
+def write_records(path, records):
+    with open(path, "w", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record) + "\n")
+
+
+def test_chunked_records_are_parsed_per_chunk_and_reduced(tmp_path):
+    path = str(tmp_path / "run_messages_1.jsonl")
+    write_records(path, [
+        {"doc_id": 1, "input": "prompt", "output": completion("0.5")},
+        {"doc_id": 2, "input": ["chunk 0", "chunk 1"],
+         "output": [completion("0.2"), completion("0.6")]},
+        {"doc_id": 3, "input": ["chunk 0", "chunk 1"],
+         "output": [completion("0.2"), completion("7")]},
+    ])
+
+    reducer = FieldReducer({"score": lambda values: sum(values) / len(values)})
+    parser, failures = replay_messages(path, ScoreParser, num_processes=1, reducer=reducer)
+
+    assert parser.results == {1: {"score": 0.5}, 2: {"score": 0.4}}
+    assert parser.messages[1]["output"] == [completion("0.2"), completion("0.6")]
+    assert [(f["doc_id"], f["stage"]) for f in failures] == [(3, "validate")]
+    assert failures[0]["error"].startswith("Chunk 1:")
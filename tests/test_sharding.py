@@ -0,0 +1,82 @@
+import os
+import sys
+import json
+import subprocess
+from collections import Counter
+
+from statements.sharding import merge_shards, shard_of, shard_records
+from statements.sinks import JsonlResultSink, SqliteResultSink
+
+
+def read_jsonl(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_merge_deduplicates_and_orders_by_doc_id(tmp_path):
+    first = JsonlResultSink(str(tmp_path / "a.jsonl"))
+    first.write(10, {"id": 10}, [{"doc_id": 10}])
+    first.write(2, {"id": 2, "try": 1}, [{"doc_id": 2, "try": 1}])
+    first.write("b", {"id": "b"}, [])
+    first.write(3, {"id": 3}, [])
+    first.close()
+
+    second = SqliteResultSink(str(tmp_path / "b.sqlite"))
+    second.write(2, {"id": 2, "try": 2}, [{"doc_id": 2, "try": 2}])  # Replaces the first try
+    second.write(3, None, [])  # A failed retry keeps the earlier result
+    second.write(1, {"id": 1}, [{"doc_id": 1}])
+    second.write("a", None, [])
+    second.close()
+
+    results_file = str(tmp_path / "merged" / "results.jsonl")
+    messages_file = str(tmp_path / "merged" / "messages.jsonl")
+    counts = merge_shards(
+        [str(tmp_path / "a.jsonl"), str(tmp_path / "b.sqlite")], results_file, messages_file)
+
+    assert counts == (6, 2)
+    assert read_jsonl(results_file) == [
+        {"id": 1}, {"id": 2, "try": 2}, {"id": 3}, {"id": 10}, {"id": "b"}]
+    assert read_jsonl(messages_file) == [
+        {"doc_id": 1}, {"doc_id": 2, "try": 2}, {"doc_id": 10}]
+
+
+def test_merge_does_not_depend_on_shard_order(tmp_path):
+    paths = []
+    for shard, ids in enumerate([[5, 1], [4, 2, 3]]):
+        sink = JsonlResultSink(str(tmp_path / f"shard-{shard}.jsonl"))
+        for doc_id in ids:
+            sink.write(doc_id, {"id": doc_id}, [])
+        sink.close()
+        paths.append(sink.path)
+
+    merge_shards(paths, str(tmp_path / "forward.jsonl"))
+    merge_shards(paths[::-1], str(tmp_path / "backward.jsonl"))
+    assert read_jsonl(tmp_path / "forward.jsonl") == read_jsonl(tmp_path / "backward.jsonl") \
+        == [{"id": i} for i in range(1, 6)]
+
+
+SRC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+SHARD_SCRIPT = (
+    "from statements.sharding import shard_of; "
+    "print([shard_of(i, 8) for i in [0, 1, 42, 'abc', 'doc-17']])"
+)
+
+
+def test_shard_of_is_stable_across_processes():
+    # Pinned values: a change of hash would reshuffle resumed sharded runs.
+    assert [shard_of(i, 8) for i in [0, 1, 42, "abc", "doc-17"]] == [5, 6, 2, 1, 3]
+    for seed in ("1", "2"):
+        env = {**os.environ, "PYTHONHASHSEED": seed, "PYTHONPATH": SRC}
+        output = subprocess.run(
+            [sys.executable, "-c", SHARD_SCRIPT], env=env, check=True,
+            capture_output=True, text=True).stdout
+        assert output.strip() == "[5, 6, 2, 1, 3]"
+
+
+def test_shards_partition_the_records_evenly():
+    records = [{"id": i} for i in range(4000)]
+    shards = [list(shard_records(records, shard, 4)) for shard in range(4)]
+    assert sorted(r["id"] for shard in shards for r in shard) == list(range(4000))
+    assert all(900 < len(shard) < 1100 for shard in shards)
+    assert Counter(shard_of(str(i), 4) for i in range(4000)) \
+        == Counter(shard_of(i, 4) for i in range(4000))  # Ids are hashed as strings
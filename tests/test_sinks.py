@@ -0,0 +1,114 @@
+import os
+import asyncio
+import threading
+
+import pytest
+
+from statements.chat_client import ChatClient, ChatModel
+from statements.extractor import Extractor
+from statements.sinks import JsonlResultSink, SqliteResultSink, open_sink
+from tests.helpers import ListParser
+
+
+@pytest.fixture(params=["checkpoint.jsonl", "checkpoint.sqlite"])
+def sink_path(request, tmp_path):
+    return str(tmp_path / request.param)
+
+
+def test_open_sink_picks_the_format_from_the_extension(tmp_path):
+    assert isinstance(open_sink(str(tmp_path / "a.jsonl")), JsonlResultSink)
+    sink = open_sink(str(tmp_path / "a.db"))
+    assert isinstance(sink, SqliteResultSink)
+    sink.close()
+
+
+def test_records_survive_reopening(sink_path):
+    sink = open_sink(sink_path)
+    sink.write(1, {"label": "left"}, [{"doc_id": 1}])
+    sink.write("b", None, [])
+    sink.close()
+
+    sink = open_sink(sink_path)
+    assert sink.completed_ids() == {1, "b"}
+    assert list(sink.records()) == [
+        {"doc_id": 1, "result": {"label": "left"}, "messages": [{"doc_id": 1}]},
+        {"doc_id": "b", "result": None, "messages": []},
+    ]
+    sink.close()
+
+
+def test_torn_jsonl_line_is_skipped(tmp_path):
+    path = str(tmp_path / "checkpoint.jsonl")
+    sink = JsonlResultSink(path)
+    sink.write(1, {}, [])
+    sink.close()
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"doc_id": 2, "res')
+
+    assert JsonlResultSink(path).completed_ids() == {1}
+
+
+def run_extraction(sink_path, failing=()):
+    sent = []
+
+    async def send_message(prompt_vars, history=None):
+        sent.append(prompt_vars["id"])
+        if prompt_vars["id"] in failing:
+            raise RuntimeError("interrupted")
+        return f"prompt {prompt_vars['id']}", {"choices": []}, {"value": prompt_vars["id"]}
+
+    parser = ListParser()
+    extractor = Extractor(
+        model=ChatModel("test-model", ["http://localhost:1"], api_key="test"),
+        dataset=[{"id": i} for i in range(6)],
+        client=ChatClient(),
+        prompt_template=None,
+        output_parser=parser,
+        num_workers=2,
+        sink=open_sink(sink_path),
+        resume=True,
+    )
+    extractor.send_message = send_message
+
+    async def run():
+        try:
+            await extractor.run()
+        finally:
+            await extractor.close()
+
+    asyncio.run(run())
+    return parser, sent
+
+
+def test_resumed_run_only_sends_the_missing_records(sink_path):
+    parser, sent = run_extraction(sink_path, failing={2, 4})
+    assert sorted(sent) == list(range(6))
+    assert sorted(parser.results) == [0, 1, 3, 5]
+
+    parser, sent = run_extraction(sink_path)
+    assert sorted(sent) == [2, 4]
+    assert sorted(parser.results) == list(range(6))
+    assert sorted(m["doc_id"] for m in parser.messages) == list(range(6))
+
+    sink = open_sink(sink_path)
+    assert sink.completed_ids() == set(range(6))
+    sink.close()
+
+
+def test_periodic_fsyncs_run_off_the_calling_thread(tmp_path, monkeypatch):
+    threads = set()
+    fsync = os.fsync
+
+    def recording_fsync(fd):
+        threads.add(threading.get_ident())
+        fsync(fd)
+
+    monkeypatch.setattr(os, "fsync", recording_fsync)
+    path = str(tmp_path / "checkpoint.jsonl")
+    sink = JsonlResultSink(path, fsync_every=10)
+    for i in range(100):
+        sink.write(i, {}, [])
+    sink.close()
+
+    assert threads and threading.get_ident() not in threads
+    assert JsonlResultSink(path).completed_ids() == set(range(100))
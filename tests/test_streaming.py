@@ -0,0 +1,50 @@
+import asyncio
+
+from benchmarks.mock_server import MockProfile, MockServer
+from statements.chat_client import ChatClient, ChatModel
+
+
+def stream(stop_when=None):
+    async def run():
+        server = await MockServer(MockProfile(latency="fixed", tokens="long", seed=1)).start()
+        client = ChatClient()
+        try:
+            res = await client.chat_completions(
+                "Label this article.",
+                model=ChatModel("mock", [server.url], api_key="test"),
+                stream=True,
+                stop_when=stop_when,
+            )
+        finally:
+            await client.close()
+            await server.close()
+        return res, client.metrics
+
+    return asyncio.run(run())
+
+
+def test_stream_assembles_the_full_completion():
+    res, metrics = stream()
+    choice = res["choices"][0]
+    assert choice["finish_reason"] == "stop"
+    assert "**Categorical Label**" in choice["message"]["content"]
+    assert "estimated" not in res["usage"]
+    assert metrics.histograms["time_to_first_token"].count == 1
+    assert metrics.histograms["inter_token_latency"].count > 0
+
+
+def test_stream_stops_once_the_condition_holds():
+    seen = []
+
+    def stop_when(text):
+        seen.append(text)
+        return "**Logit Scores**" in text
+
+    res, metrics = stream(stop_when)
+    choice = res["choices"][0]
+    assert choice["finish_reason"] == "early_stop"
+    assert "**Logit Scores**" in choice["message"]["content"]
+    assert "**Categorical Label**" not in choice["message"]["content"]
+    assert seen[-1] == choice["message"]["content"]
+    assert res["usage"]["estimated"]
+    assert metrics.counters["early_stops"] == 1
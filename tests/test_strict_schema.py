@@ -0,0 +1,75 @@
+import json
+
+from statements.chat_client import ChatModel, DeepSeekChatModel, LocalChatModel, OpenAIChatModel
+from statements.postprocess import parse_response
+from statements.utils import drop_null_optionals, strict_json_schema, validate_json_with_schema
+
+
+SCHEMA = {
+    "type": "object",
+    "properties": {
+        "label": {"type": "string", "enum": ["left", "right"]},
+        "confidence": {"type": "number", "minimum": 0, "maximum": 1},
+        "quotes": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "text": {"type": "string"},
+                    "speaker": {"type": "string"},
+                },
+                "required": ["text"],
+            },
+        },
+    },
+    "required": ["label"],
+}
+
+
+class SchemaParser:
+    schema = SCHEMA
+
+    def validate_output(self, parsed_data):
+        return validate_json_with_schema(parsed_data, self.schema)
+
+
+def completion(data):
+    return {"choices": [{"message": {"content": json.dumps(data)}}]}
+
+
+def test_strict_schema_requires_every_property_and_makes_optional_ones_nullable():
+    strict = strict_json_schema(SCHEMA)
+    assert strict["required"] == ["label", "confidence", "quotes"]
+    assert strict["additionalProperties"] is False
+    assert strict["properties"]["label"] == {"type": "string", "enum": ["left", "right"]}
+    assert {"type": "null"} in strict["properties"]["confidence"]["anyOf"]
+    item = strict["properties"]["quotes"]["anyOf"][0]["items"]
+    assert item["required"] == ["text", "speaker"]
+    # Range constraints are left to validation.
+    assert "minimum" not in strict["properties"]["confidence"]["anyOf"][0]
+
+
+def test_strict_output_with_null_optionals_validates():
+    data = {
+        "label": "left",
+        "confidence": None,
+        "quotes": [{"text": "We will win.", "speaker": None}],
+    }
+    assert validate_json_with_schema(data, strict_json_schema(SCHEMA))
+    assert not validate_json_with_schema(data, SCHEMA)
+
+    parsed = parse_response(SchemaParser(), completion(data), structured_output=True)
+    assert parsed == {"label": "left", "quotes": [{"text": "We will win."}]}
+
+
+def test_required_nulls_are_kept_and_still_fail():
+    data = {"label": None, "confidence": 0.5, "quotes": None}
+    assert drop_null_optionals(data, SCHEMA) == {"label": None, "confidence": 0.5}
+    assert not SchemaParser().validate_output(drop_null_optionals(data, SCHEMA))
+
+
+def test_only_enforcing_providers_skip_format_retries():
+    assert not ChatModel("custom", ["http://localhost:1"]).guarantees_schema
+    assert not DeepSeekChatModel("deepseek-chat", api_key="test").guarantees_schema
+    assert OpenAIChatModel("gpt-4o-mini", api_key="test").guarantees_schema
+    assert LocalChatModel("local").guarantees_schema
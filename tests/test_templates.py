@@ -0,0 +1,47 @@
+import itertools
+
+import pytest
+
+from statements.templates import PrefixCachedPromptTemplate
+
+
+TEMPLATE = """You label the ideology of news articles.
+Today is {today}.
+
+Answer with a label.
+
+Title: {title}
+Article: {text}
+"""
+
+
+def test_system_prefix_is_identical_for_every_record():
+    calls = itertools.count()
+    template = PrefixCachedPromptTemplate(
+        TEMPLATE, ["title", "text"], static_values={"today": lambda: f"day {next(calls)}"})
+
+    first = template.format_messages({"title": "A", "text": "One.", "id": 1})
+    second = template.format_messages({"title": "B", "text": "Two.", "id": 2})
+
+    assert first[0] == second[0] == {
+        "role": "system",
+        "content": "You label the ideology of news articles.\nToday is day 0.\n\nAnswer with a label.",
+    }
+    assert first[1]["content"] == "Title: A\nArticle: One."
+    assert second[1]["content"] == "Title: B\nArticle: Two."
+    assert template.format({"title": "A", "text": "One."}) \
+        == f"{first[0]['content']}\n\n{first[1]['content']}"
+
+
+def test_split_marker_moves_static_text_into_the_user_message():
+    template = PrefixCachedPromptTemplate(
+        TEMPLATE, ["title", "text"], static_values={"today": "Monday"},
+        split_marker="Answer")
+    messages = template.format_messages({"title": "A", "text": "One."})
+    assert messages[0]["content"] == "You label the ideology of news articles.\nToday is Monday."
+    assert messages[1]["content"].startswith("Answer with a label.\n\nTitle: A")
+
+
+def test_record_variables_before_the_split_are_rejected():
+    with pytest.raises(ValueError):
+        PrefixCachedPromptTemplate(TEMPLATE, ["today", "title", "text"], split_marker="Title")
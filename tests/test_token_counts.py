@@ -0,0 +1,39 @@
+from statements.utils import TokenCountCache, batch_truncate_text
+
+
+class CharEncoder:
+    """Toy encoder with one token per character, recording what it encodes."""
+
+    name = "chars"
+
+    def __init__(self):
+        self.encoded = []
+
+    def encode(self, text):
+        self.encoded.append(text)
+        return list(text)
+
+    def encode_batch(self, texts, num_threads=8):
+        return [self.encode(text) for text in texts]
+
+    def decode(self, tokens):
+        return "".join(tokens)
+
+
+def test_cached_short_texts_skip_encoding(tmp_path):
+    texts = ["short", "tiny", "x" * 50]
+    path = str(tmp_path / "token_counts.sqlite")
+
+    encoder = CharEncoder()
+    cache = TokenCountCache(path)
+    assert batch_truncate_text(texts, encoder, max_tokens=10, cache=cache, chars_per_token=1) \
+        == ["short", "tiny", "x" * 10]
+    cache.close()
+    assert "short" in encoder.encoded and "tiny" in encoder.encoded
+
+    encoder = CharEncoder()
+    cache = TokenCountCache(path)
+    assert batch_truncate_text(texts, encoder, max_tokens=10, cache=cache, chars_per_token=1) \
+        == ["short", "tiny", "x" * 10]
+    cache.close()
+    assert "short" not in encoder.encoded and "tiny" not in encoder.encoded
@@ -0,0 +1,20 @@
+import time
+
+from statements.tracing import SamplingProfiler
+
+
+def test_profiler_without_samples_has_no_top_functions():
+    assert SamplingProfiler().top() == []
+
+
+def test_profiler_reports_the_busy_function():
+    profiler = SamplingProfiler(interval=0.001)
+    profiler.start()
+    deadline = time.perf_counter() + 0.2
+    while time.perf_counter() < deadline:
+        pass
+    profiler.stop()
+
+    top = profiler.top()
+    assert top and abs(sum(share for _, share in top) - 1.0) < 1e-9
+    assert top[0][0].startswith("test_profiler_reports_the_busy_function")